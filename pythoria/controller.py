@@ -13,6 +13,9 @@ from .dungeon import Dungeon
 from .dungeonview import ScrollingView
 from .player import Player
 from .random_dungeon import DungeonGenerator
+from .travel import Travel, Explore
+
+STEPS_PER_FRAME = 10 # Steps of the player per frame when travelling or exploring
 
 class DirectionForCommand():
     def __init__(self, controller, command):
@@ -68,6 +71,14 @@ class GameEventHandler():
         elif event.type == KEYDOWN and event.key == K_c:
             self.controller.event_handler.append(DirectionForCommand(self.controller, self.dungeon.close_door))
             self.controller.msgbox.add("Donnez la direction de la porte à fermer. [ESC] pour annuler.")
+        elif event.type == KEYDOWN and event.key == K_x:
+            self.controller.start(Explore(self.dungeon))
+        elif event.type == KEYDOWN and event.key == K_F3 and self.controller.profiler is not None:
+            self.controller.profiler.toggle(self.controller)
+        elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+            cell = self.controller.view.cell_at_pixel(event.pos)
+            if cell is not None:
+                self.controller.start(Travel(self.dungeon, cell))
 
 
 class Controller():
@@ -78,26 +89,81 @@ class Controller():
     It responds to pygame events for user inputs (key presses). It delegates
     this task to an Event Handler. A stack of Event Handler can be created. 
     Only the top one (last in the list) will process the events.
+    A command moving the player on its own (see pythoria.travel) is run by
+    update, steps_per_frame steps per frame. A key press interrupts it.
+    With deferred, the events of the dungeon and the message box are queued
+    and delivered by update, once per frame.
+    With a profiler (see pythoria.instrument), F3 toggles the timings.
     """
-    def __init__(self, dungeon, msgbox, view):
+    def __init__(self, dungeon, msgbox, view, steps_per_frame=STEPS_PER_FRAME, deferred=False,
+                 profiler=None):
         self.dungeon = dungeon
-        self._connections = [dungeon.bind("Door Close", self.on_door_moves),
-                             dungeon.bind("Door Open", self.on_door_moves)]
+        self._connections = [dungeon.bind("Door Close", self.on_doors_moved, batch=True),
+                             dungeon.bind("Door Open", self.on_doors_moved, batch=True)]
         self.player = self.dungeon.player
         self.msgbox = msgbox
         self.view = view
         self.event_handler = [GameEventHandler(self)]
+        self.steps_per_frame = steps_per_frame
+        self.profiler = profiler
+        self.command = None
+        dungeon.deferred = msgbox.deferred = deferred
         
     def process_event(self, event):
         """Process the events from the pygame events loop"""
-        
+        if self.command is not None and event.type == KEYDOWN:
+            self.command = None
+            self.msgbox.add("Déplacement interrompu.")
+            return
         self.event_handler[-1].process_event(event)
     
-    def on_door_moves(self):
-        self.player.fov = self.dungeon.get_field_of_vision(self.player.x,
-                                                           self.player.y,
-                                                           5)
-        self.dungeon.reveal(self.player.fov)
+    @property
+    def busy(self):
+        """True while a command moves the player on its own"""
+        return self.command is not None
+    
+    @property
+    def idle(self):
+        """
+        True when nothing changes until the next input event: no running
+        command, no deferred event and no view to draw
+        """
+        return not (self.busy or self.dungeon.pending or self.msgbox.pending or self.view.dirty)
+    
+    def start(self, command):
+        """Run a Travel or Explore command, from the next frame on"""
+        self.command = command
+        self.update(0) # Tells at once why a command cannot start
+    
+    def update(self, steps=None):
+        """
+        Advance the running command by steps, steps_per_frame by default,
+        then deliver the deferred events.
+        """
+        if self.command is not None and \
+           not self.command.step(self.steps_per_frame if steps is None else steps):
+            if self.command.message:
+                self.msgbox.add(self.command.message)
+            self.command = None
+        self.dungeon.dispatch()
+        self.msgbox.dispatch()
+    
+    def on_doors_moved(self, doors):
+        """
+        Update the field of vision of the player after the doors at the
+        (x, y) positions moved. It is patched for a single door, and computed
+        again for more.
+        """
+        old_fov = self.player.fov
+        if len(doors) == 1:
+            (x, y), = doors
+            self.player.fov = self.dungeon.update_field_of_vision(old_fov,
+                                                                  self.player.x,
+                                                                  self.player.y,
+                                                                  5, x, y)
+        else:
+            self.player.fov = self.dungeon.get_field_of_vision(self.player.x, self.player.y, 5)
+        self.dungeon.reveal(self.player.fov - old_fov)
         
 if __name__ == '__main__':
     """
@@ -105,7 +171,7 @@ if __name__ == '__main__':
     """
     win = pygcurse.PygcurseWindow(80, 30)
     win.font = pygame.font.Font(pygame.font.match_font('consolas'), 18)
-    level1 = Dungeon.generate(35, 20, 10)
+    level1 = Dungeon.generate(35, 20, 10, fov='shadowcast')
     player = Player()
     level1.add_player(player)
     msgbox = MessageBox()
@@ -114,26 +180,15 @@ if __name__ == '__main__':
         win,
         {
             ScrollingView(level1):         (0  ,   0),
-            HUDView(player):               (700,   0),
+            HUDView(player, level1):       (700,   0),
             MessageBoxView(msgbox, 80, 5): (0  , 460)
         }
     )
 
     controller = Controller(level1, msgbox,  view)
     win.autoupdate = False
-    mainClock = pygame.time.Clock()
-    running = True
-    
-    while running:
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                running = False
-            else:
-                controller.process_event(event)
-
-        controller.view.draw()
-        win.blittowindow()
-        mainClock.tick(30)
+    from .main import run
+    run(controller, win)
 
     pygame.quit()
     sys.exit()
@@ -4,27 +4,86 @@
 import itertools
 import os.path
 
-from .library import get_line, get_circle
+from . import fov
+from .fov import FOVCache
+from . import mapformat
+from .pathfinding import Pathfinder
+from .library import get_circle, line_offsets
 from .tile import *
 from .events import EventDispatcher
 from .random_dungeon import DungeonGenerator
+from .storage import TileGrid, CompactGrid
 
         
 class Dungeon(EventDispatcher):
     """
     The Dungeon object contains all the information regarding the dungeon
+    
+    With compact=True, the map is stored in a CompactGrid: a few bytes per
+    cell instead of one Tile object per cell. Accessing a cell then returns a
+    TileProxy which behaves like a Tile. Maps larger than the memory are
+    opened with open_chunked.
+    
+    fov is the field of vision algorithm used by get_field_of_vision: a name
+    from pythoria.fov.ALGORITHMS or an algorithm object.
+    
+    With fov_cache_size > 0, field of vision results are kept in an LRU
+    FOVCache of that size (see the fov_cache attribute for its counters).
+    
+    revision is incremented by every Dungeon method changing what can be
+    displayed (cells, visibility, player position), so views can skip
+    drawing when it did not change.
+    
+    With deferred set (see EventDispatcher), the door, tile and player
+    events queued during a frame are coalesced. "Cells Revealed" is posted,
+    without arguments, when cells become visible.
     """
-    def __init__(self, width=None, height=None, dungeon_map=None):
+    COALESCIBLE = frozenset(("Door Open", "Door Close", "Tile Changed", "Player Moved",
+                             "Cells Revealed"))
+
+    def __init__(self, width=None, height=None, dungeon_map=None, compact=False,
+                 fov='raycast', fov_cache_size=0):
         super().__init__()
         self.width = width
         self.height = height
+        self.compact = compact
+        self.fov_algorithm = fov
+        self.fov_cache = FOVCache(fov_cache_size) if fov_cache_size else None
         self._map = None
         self.player = None
+        self.player_pos = None
+        self.revision = 0
+        self._pathfinder = None
         
         if dungeon_map:
             self._parse_text(dungeon_map)
         elif width is not None and height is not None:
-            self._map = [[Tile() for col in range(width)] for row in range(height)]
+            self._map = self._new_grid()
+    
+    @property
+    def pathfinder(self):
+        """
+        The Pathfinder of the dungeon (see pythoria.pathfinding), created
+        the first time it is needed. Its costs are updated at once when a
+        cell changes, not when the events are delivered.
+        """
+        if self._pathfinder is None:
+            self._pathfinder = Pathfinder(self, listen=False)
+        return self._pathfinder
+    
+    def _set_fov_algorithm(self, algorithm):
+        self._fov_algorithm = fov.get_algorithm(algorithm)
+    
+    fov_algorithm = property(lambda self: self._fov_algorithm, _set_fov_algorithm, doc="""
+                    Field of vision algorithm. Can be set with a name or an
+                    algorithm object.
+                    """)
+    
+    def _new_grid(self):
+        """Return an empty map using the storage selected for this Dungeon"""
+        if self.compact:
+            return CompactGrid(self.width, self.height)
+        return TileGrid.empty(self.width, self.height)
             
     def _parse_text(self, dungeon_map):
         """
@@ -33,6 +92,7 @@ class Dungeon(EventDispatcher):
         # for walls
         + for doors
         P for player position
+        Other characters can be declared with pythoria.tile.register_glyph.
         """
         for idx, line in enumerate(dungeon_map):
             if len(line) < self.width:
@@ -40,27 +100,27 @@ class Dungeon(EventDispatcher):
         if len(dungeon_map) < self.height:
             dungeon_map.extend([' ' * self.width for _ in range(self.height - len(dungeon_map))])
         
-        self._map = []
+        if self.compact:
+            self._map = CompactGrid(self.width, self.height)
+        else:
+            self._map = TileGrid()
         for row_idx, row in enumerate(dungeon_map):
             row_tiles = []
             for col_idx, col in enumerate(row):
-                if col == '#':
-                    row_tiles.append(Tile('#', block_light=True, blocking=True))
-                elif col == ' ':
-                    row_tiles.append(Tile())
-                elif col == 'P':
-                    row_tiles.append(Tile())
-                    self.player_pos = row_idx, col_idx
-                elif col == '+':
-                    row_tiles.append(Door('+'))
-                elif col == "'":
-                    row_tiles.append(Door("'"))
-                else:
+                try:
+                    row_tiles.append(make_tile(col))
+                except KeyError:
                     raise ValueError("Character '{0}' unrecognized at row {1} col {2}".format(col, row_idx, col_idx))
-            self._map.append(row_tiles)
+                if col == PLAYER_GLYPH:
+                    self.player_pos = col_idx, row_idx
+            if self.compact:
+                if row_idx < self.height:
+                    self._map.put_row(row_idx, row_tiles[:self.width])
+            else:
+                self._map.append(row_tiles)
             
     @classmethod
-    def load_from_file(cls, filename):
+    def load_from_file(cls, filename, **options):
         """
         Load a dungeon saved in a text file.
         Format: first line gives number of rows and columns to consider from the
@@ -69,31 +129,70 @@ class Dungeon(EventDispatcher):
         If given width or height is greater than actual text, white spaces added
         to fulfill width and height criteria.
         Wall: #
+        Files with the .pmap extension are binary maps (see pythoria.mapformat).
+        options are passed to the Dungeon constructor.
+        """
+        curr_dir = os.path.dirname(__file__)
+        grid, player_pos = mapformat.read_map(os.path.join(curr_dir, filename))
+        return cls.from_grid(grid, player_pos, **options)
+    
+    @classmethod
+    def from_grid(cls, grid, player_pos=None, **options):
+        """
+        Create a dungeon using the map of a CompactGrid.
+        options are passed to the Dungeon constructor.
+        """
+        dungeon = cls(**options)
+        dungeon.width, dungeon.height = grid.width, grid.height
+        dungeon._map = grid if dungeon.compact else mapformat.to_tiles(grid)
+        dungeon.player_pos = player_pos
+        return dungeon
+    
+    @classmethod
+    def open_chunked(cls, filename, writable=False, chunk_size=64, max_chunks=64, **options):
+        """
+        Open a binary map without loading it: its cells are paged in by chunks
+        of chunk_size x chunk_size cells, with at most max_chunks chunks in
+        memory. If writable, the changes are written back to the file. The
+        map is stored in a ChunkedGrid, see pythoria.storage.
+        options are passed to the Dungeon constructor.
         """
         curr_dir = os.path.dirname(__file__)
-        with open(os.path.join(curr_dir, filename), 'r', encoding='utf-8') as f:
-            size = f.readline()
-            width, height = map(int, size.strip().split(' '))
-            dungeon_map = f.read().split('\n')
-            dungeon_map = list(map(list, dungeon_map))
-        return cls(width, height, dungeon_map)
+        grid, player_pos = mapformat.open_chunked(os.path.join(curr_dir, filename),
+                                                  writable, chunk_size, max_chunks)
+        options['compact'] = True
+        return cls.from_grid(grid, player_pos, **options)
+    
+    def save(self, filename):
+        """Save the map as a text file, or a binary map with the .pmap extension"""
+        grid = self._map
+        if not isinstance(grid, CompactGrid):
+            grid = CompactGrid.from_tiles(grid)
+        mapformat.write_map(filename, grid, self.player_pos)
     
     @classmethod
-    def generate(cls, width, height, room_amount):
-        """Generate a random dungeon"""
-        dungeon = cls(width, height)
-        dg = DungeonGenerator()
-        dg.generate_dungeon(width, height, room_amount)
-        dungeon._map = dg.dungeon
+    def generate(cls, width, height, room_amount, seed=None, **options):
+        """
+        Generate a random dungeon. The same seed gives the same dungeon.
+        options are passed to the Dungeon constructor.
+        """
+        dungeon = cls(**options)
+        dungeon.width, dungeon.height = width, height
+        dg = DungeonGenerator(seed=seed)
+        dg.generate_cells(width, height, room_amount)
+        dungeon._map = dg.to_compact_grid() if dungeon.compact else dg.to_tiles()
         dungeon.player_pos = dg.place_player()
         return dungeon 
     
     def add_player(self, player):
         """Add the player in the dungeon"""
         self.player = player
-        self.player.pos = self.player_pos
+        if self.player_pos is not None:
+            self.player.pos = self.player_pos
         self.player.fov = self.get_field_of_vision(player.x, player.y, 5)
         self.reveal(self.player.fov)
+        self.revision += 1
+        self.post("Player Moved")
     
     def move_player(self, dir_x, dir_y):
         """Move the player in the given direction"""
@@ -107,6 +206,38 @@ class Dungeon(EventDispatcher):
                                                        self.player.y,
                                                        5)
             self.reveal(self.player.fov)
+            self.revision += 1
+            self.post("Player Moved")
+    
+    def walk_player(self, path, max_steps=None, stop_on_sighting=True):
+        """
+        Move the player along path, (x, y) cells each adjacent to the
+        previous one, like successive move_player calls. The cells seen on
+        the way are revealed and "Player Moved" is posted only once, at the
+        end. A closed door on the way is opened and walked through.
+        The walk stops at a blocking cell, after max_steps steps and, with
+        stop_on_sighting, after a step showing cells never seen before.
+        Return the number of steps done and whether new cells were seen.
+        """
+        player = self.player
+        seen = set()
+        steps, sighted = 0, False
+        for x, y in path[:max_steps]:
+            if self.collide(x, y) and not (self.open_door(x, y) and not self.collide(x, y)):
+                break
+            player.x, player.y = x, y
+            player.fov = self.get_field_of_vision(x, y, 5)
+            steps += 1
+            new = [cell for cell in player.fov if cell not in seen]
+            seen.update(new)
+            if any(not self[cell].visible for cell in new):
+                sighted = True
+                if stop_on_sighting:
+                    break
+        if steps:
+            self.reveal(seen)
+            self.post("Player Moved")
+        return steps, sighted
     
     def __iter__(self):
         """Iterate over the rows of the dungeon"""
@@ -124,7 +255,7 @@ class Dungeon(EventDispatcher):
         x, y = key
         if not self._within_bounds(x, y):
             raise IndexError
-        return self._map[y][x]
+        return self._map.tile_at(x, y)
     
     def __setitem__(self, key, tile):
         """Set the Tile at position [x, y]"""
@@ -133,38 +264,90 @@ class Dungeon(EventDispatcher):
             raise IndexError
         if not isinstance(tile, Tile):
             raise TypeError("Tried to assign an object of type {0}. Expecting type Tile". format(type(tile)))
-        self._map[y][x] = tile
+        was_opaque = self._map.is_opaque(x, y)
+        self._map.put(x, y, tile)
+        self.revision += 1
+        if bool(tile.block_light) != bool(was_opaque):
+            self.opacity_changed(x, y)
+        if self._pathfinder is not None:
+            self._pathfinder.on_cell_changed(x, y)
+        self.post("Tile Changed", x, y)
     
     def collide(self, x, y):
         """Check if the Tile at position (x, y) is blocking."""
-        return self[x, y].blocking
+        if not self._within_bounds(x, y):
+            raise IndexError
+        return self._map.is_blocking(x, y)
     
     def reveal(self, cells):
         """
         Turn on the visibility in the given cells
         """
+        revealed = False
         for tile_x, tile_y in cells:
             self[tile_x, tile_y].visible = True
+            revealed = True
+        self.revision += 1
+        if revealed:
+            self.post("Cells Revealed")
     
-    def get_field_of_vision(self, x, y, radius):
+    def get_field_of_vision(self, x, y, radius, algorithm=None):
         """
-        Returns a list of tile coordinates in the field of vision.
-        We first get a bounding circle around our position. Then we raycast lines
-        going from the position (x, y) to the bounding circle. If we hit a block_light Tile,
-        we make it visible and stop to look further on that ray.
+        Returns a set of tile coordinates in the field of vision.
+        The computation is delegated to the FOV algorithm of the Dungeon, unless
+        another algorithm (name or object, see pythoria.fov) is given.
         """
-        points = set()
-        border = self._get_bounding_circle(x, y, radius)
-        for border_x, border_y in border:
-            for tile_x, tile_y in get_line(x, y, border_x, border_y):
-                points.add( (tile_x, tile_y) )
-                if not self[tile_x, tile_y].block_light:
-                    # To remove artifacts, check surrounding cells for a wall
-                    points.update(self._reveal_adjacent_walls(tile_x, tile_y, x, y, radius, points))
-                else:
-                    break
+        if algorithm is None:
+            algorithm = self.fov_algorithm
+        else:
+            algorithm = fov.get_algorithm(algorithm)
+        if self.fov_cache is None:
+            return algorithm.compute(self, x, y, radius)
+        key = (x, y, radius, algorithm)
+        points = self.fov_cache.get(key)
+        if points is None:
+            points = frozenset(algorithm.compute(self, x, y, radius))
+            self.fov_cache.put(key, points)
         return points
     
+    def get_fields_of_vision(self, viewers, use_numpy=None):
+        """
+        Returns the stacked visibility masks of many viewers given as
+        (x, y, radius). See pythoria.fov.batch_fields_of_vision for the layout.
+        """
+        return fov.batch_fields_of_vision(self, viewers, use_numpy)
+    
+    def update_field_of_vision(self, points, x, y, radius, cell_x, cell_y, algorithm=None):
+        """
+        Returns the field of vision from (x, y) after the opacity of the cell
+        (cell_x, cell_y) changed. points is the field of vision before the change.
+        If the algorithm can patch the previous result, only the part of the
+        field of vision behind the cell is computed again.
+        """
+        if max(abs(cell_x - x), abs(cell_y - y)) > radius:
+            return points # Too far to change anything
+        if algorithm is None:
+            algorithm = self.fov_algorithm
+        else:
+            algorithm = fov.get_algorithm(algorithm)
+        update = getattr(algorithm, 'update', None)
+        if update is None:
+            return self.get_field_of_vision(x, y, radius, algorithm)
+        points = update(self, points, x, y, radius, cell_x, cell_y)
+        if self.fov_cache is not None:
+            points = frozenset(points)
+            self.fov_cache.put((x, y, radius, algorithm), points)
+        return points
+    
+    def opacity_changed(self, x, y):
+        """
+        Must be called when the block_light attribute of the Tile at (x, y)
+        changed. Dungeon methods do it already; only direct modifications of
+        a Tile need it.
+        """
+        if self.fov_cache is not None:
+            self.fov_cache.invalidate_cell(x, y)
+    
     def _reveal_adjacent_walls(self, x, y, pos_x, pos_y, radius, points_visited):
         """
         In order to remove artifacts in the field of view, we show all Tiles
@@ -186,6 +369,8 @@ class Dungeon(EventDispatcher):
                     continue
                 if (x + offset_x, y + offset_y) in points_visited:
                     continue
+                if not self._within_bounds(x + offset_x, y + offset_y):
+                    continue
                 if (x + offset_x - pos_x)**2 + (y + offset_y - pos_y)**2 > (radius+0.5)**2:
                     continue
                 if not self[x + offset_x, y + offset_y].block_light:
@@ -225,9 +410,8 @@ class Dungeon(EventDispatcher):
     
     def _free_line_of_sight(self, x0, y0, x1, y1):
         "Check if the line is free of cells blocking the light."
-        line = get_line(x0, y0, x1, y1)
-        for cell in line:
-            if self[cell].block_light:
+        for offset_x, offset_y in line_offsets(x1 - x0, y1 - y0):
+            if self._map.is_opaque(x0 + offset_x, y0 + offset_y):
                 return False
         return True
     
@@ -262,9 +446,9 @@ class Dungeon(EventDispatcher):
         
     def reveal_all(self):
         """Reveal the whole map"""
-        for row in self:
-            for tile in row:
-                tile.visible=True
+        self._map.reveal_all()
+        self.revision += 1
+        self.post("Cells Revealed")
         
     def get_neighbour_cells(self, x, y):
         """Returns the cells adjacent to the position (x, y)"""
@@ -274,10 +458,15 @@ class Dungeon(EventDispatcher):
         """
         Open a Door Tile at position x, y
         Return True if this operation is succefull. False otherwise.
+        The posted "Door Open" event carries the door position.
         """
         cell = self[x, y]
         if cell.open():
-            self.post("Door Open")
+            self.revision += 1
+            self.opacity_changed(x, y)
+            if self._pathfinder is not None:
+                self._pathfinder.on_cell_changed(x, y)
+            self.post("Door Open", x, y)
             return True
         return False
     
@@ -285,10 +474,15 @@ class Dungeon(EventDispatcher):
         """
         Close a Door Tile at position x, y
         Return True if this operation is succefull. False otherwise.
+        The posted "Door Close" event carries the door position.
         """
         cell = self[x, y]
         if cell.close():
-            self.post("Door Close")
+            self.revision += 1
+            self.opacity_changed(x, y)
+            if self._pathfinder is not None:
+                self._pathfinder.on_cell_changed(x, y)
+            self.post("Door Close", x, y)
             return True
         return False
 
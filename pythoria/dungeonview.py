@@ -3,6 +3,7 @@
 
 import pygcurse, pygame
 from .dungeon import Dungeon
+from .library import clamp, viewport_origin
 
 pygame.font.init()
 
@@ -10,49 +11,79 @@ PLAYER = '\N{WHITE SMILING FACE}' # Unicode for a smile
 
 
 class DungeonView(pygcurse.PygcurseSurface):
+    """
+    Draws a part of the dungeon.
+    The view remembers the appearance (character, background color, tint) it
+    gave to each of its cells, and only repaints the cells whose appearance
+    changed. Nothing is done at all when neither the Dungeon revision nor the
+    drawn area changed since the last draw.
+    """
     font = pygame.font.Font(pygame.font.match_font('consolas'), 18)
+    SEEN_BGCOLOR = (30, 30, 30)
+    FOV_TINT = (30, 30, 0)
+    NO_TINT = (0, 0, 0)
 
     def __init__(self, dungeon, width, height):
         self.dungeon = dungeon
         super(DungeonView, self).__init__(width, height, DungeonView.font)
         self.autoupdate = False
+        self.invalidate()
+    
+    def invalidate(self):
+        """Forget what was drawn: the next draw repaints every cell."""
+        self._shown = {}
+        self._drawn_state = None
         
     def draw(self, left=0, top=0, width=None, height=None):
         """
         Draw the dungeon and the player.
         left, top define where in the dungeon to start to draw and
         width, height define how much to draw from the (left, top) position.
+        Returns True if some cells were repainted.
         """
-        self.setscreencolors()
-        self.cursor = (0, 0)
+        state = (left, top, width, height, self.dungeon.revision)
+        if state == self._drawn_state:
+            return False
+        self._drawn_state = state
+        if not self._shown:
+            self.setscreencolors()
+            self.cursor = (0, 0)
         bottom = height and top + height # None if no height given
         right = width and left + width
         
+        player = self.dungeon.player
+        fov = player.fov if player else ()
+        changed = False
         for y, line in enumerate(self.dungeon[top:bottom]):
             for x, tile in enumerate(line[left:right]):
                 if tile.visible:
-                    self.putchar(tile.value, bgcolor=(30, 30, 30), x=x, y=y)
+                    lit = not tile.block_light and (x + left, y + top) in fov
+                    look = (tile.value, self.SEEN_BGCOLOR, self.FOV_TINT if lit else self.NO_TINT)
                 else:
-                    self.putchar(' ', x=x, y=y)
+                    look = (' ', None, self.NO_TINT)
+                if player and (x + left, y + top) == player.pos:
+                    look = (PLAYER,) + look[1:]
+                if self._shown.get((x, y)) != look:
+                    self._paint(x, y, look)
+                    changed = True
         
-        if self.dungeon.player:
-            for light_x, light_y in self.dungeon.player.fov:
-                if not self.dungeon[light_x, light_y].block_light:
-                    self.settint(30, 30, 0, (light_x-left, light_y-top, 1, 1))
-            self.putchar(PLAYER, x=self.dungeon.player.x-left, y=self.dungeon.player.y-top)
-        
-        self.update()
-
-
-def clamp(value, min_, max_):
-    """Clamps value between min and max"""
-    return min(max(value, min_), max_)
+        if changed:
+            self.update()
+        return changed
+    
+    def _paint(self, x, y, look):
+        "Set the cell (x, y) of the surface to the given appearance"
+        char, bgcolor, tint = look
+        self.putchar(char, x=x, y=y, bgcolor=bgcolor or tuple(self.bgcolor))
+        self.settint(*tint, region=(x, y, 1, 1))
+        self._shown[x, y] = look
 
 
 class ScrollingView:
     """
     A view that manipulates a DungeonView to center the view on the player.
     The view is constraint in the limits of the dungeon itself.
+    It becomes dirty when the player moves, the map changes or cells are revealed.
     """
     def __init__(self, dungeon):
         self.width, self.height = 15, 15
@@ -62,19 +93,33 @@ class ScrollingView:
         self.dungeon_width = dungeon.width
         self.dungeon_height = dungeon.height
         self.player = dungeon.player
+        self.dirty = True
+        self._connections = [dungeon.bind(event_type, self.on_dungeon_change, batch=True)
+                             for event_type in ("Player Moved", "Door Open", "Door Close",
+                                                "Tile Changed", "Cells Revealed")]
+    
+    def on_dungeon_change(self, *args):
+        self.dirty = True
     
     def draw(self):
         """
         Calculate first the top left position of the DungeonView and
         draw DungeonView.
         """
-        self.left = clamp(self.player.x - self.width // 2,
-                          0, 
-                          max(0, self.dungeon_width - self.width))
-        self.top = clamp(self.player.y - self.height // 2,
-                         0,
-                         max(0, self.dungeon_height - self.height))
+        self.left, self.top = viewport_origin(self.player.x, self.player.y,
+                                              self.width, self.height,
+                                              self.dungeon_width, self.dungeon_height)
         self.dungeon_view.draw(self.left, self.top, self.width, self.height)
+        self.dirty = False
+        
+    def cell_at_pixel(self, pos):
+        """The (x, y) dungeon cell at the pixel pos of the view, or None"""
+        if not hasattr(self, 'left'):
+            return None # Not drawn yet
+        x, y = self.dungeon_view.getcoordinatesatpixel(pos)
+        if x is None or y is None:
+            return None
+        return self.left + x, self.top + y
         
     def blitto(self, *args, **kwargs):
         """
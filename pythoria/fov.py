@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Field of vision algorithms.
+
+An algorithm is an object with a compute(dungeon, x, y, radius) method
+returning the set of (x, y) positions seen from (x, y). The Dungeon selects
+one by name (see ALGORITHMS) or accepts any object with that method.
+Algorithms able to patch a previous result after the opacity of one cell
+changed also provide update(dungeon, points, x, y, radius, cell_x, cell_y).
+"""
+
+import collections
+import functools
+
+from .library import line_offsets, ray_table
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['RaycastFOV', 'ShadowcastFOV', 'ALGORITHMS', 'get_algorithm', 'FOVCache',
+           'batch_fields_of_vision', 'mask_points']
+
+
+class RaycastFOV:
+    """
+    Reference algorithm.
+    We first get a bounding circle around our position. Then we raycast lines
+    going from the position (x, y) to the bounding circle. If we hit a block_light Tile,
+    we make it visible and stop to look further on that ray.
+    The circle and the rays come from the precomputed tables of the library,
+    translated to (x, y). Rays to circle points outside of the map are cast
+    to the point clamped in the map.
+    """
+    name = 'raycast'
+
+    def compute(self, dungeon, x, y, radius):
+        points = set()
+        width, height = dungeon.width, dungeon.height
+        is_opaque = dungeon._map.is_opaque
+        for (offset_x, offset_y), path in ray_table(radius):
+            border_x, border_y = x + offset_x, y + offset_y
+            if not (0 <= border_x < width and 0 <= border_y < height):
+                border_x, border_y = dungeon._clamp_in_map(border_x, border_y)
+                path = line_offsets(border_x - x, border_y - y)
+            for path_x, path_y in path:
+                tile_x, tile_y = x + path_x, y + path_y
+                points.add( (tile_x, tile_y) )
+                if not is_opaque(tile_x, tile_y):
+                    # To remove artifacts, check surrounding cells for a wall
+                    points.update(dungeon._reveal_adjacent_walls(tile_x, tile_y, x, y, radius, points))
+                else:
+                    break
+        return points
+
+
+class ShadowcastFOV:
+    """
+    Recursive shadowcasting.
+    The circle is split in 8 octants. Each octant is scanned row by row going
+    away from the viewer, keeping track of the slopes still lit. An opaque cell
+    narrows the lit slopes for the following rows, so every cell is visited
+    at most once per octant.
+    Adapted from: http://www.roguebasin.com/index.php?title=FOV_using_recursive_shadowcasting
+    """
+    name = 'shadowcast'
+
+    # Transformations (xx, xy, yx, yy) from octant coordinates to map coordinates
+    OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+               (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+    def compute(self, dungeon, x, y, radius):
+        points = {(x, y)}
+        for octant in self.OCTANTS:
+            self._cast_octant(dungeon, x, y, radius, octant, points)
+        return points
+
+    def update(self, dungeon, points, x, y, radius, cell_x, cell_y):
+        """
+        Return the field of vision after the opacity of the cell (cell_x, cell_y)
+        changed, points being the field of vision before the change.
+        Only the cells of the octants containing the cell which overlap the
+        slopes it subtends can change: that window is cast again. The cells of
+        the window seen before and not anymore are checked one by one, as
+        they may be seen through their slopes out of the window, or from the
+        other octant when they lie on an edge.
+        """
+        offset_x, offset_y = cell_x - x, cell_y - y
+        windows = {} # Octant -> start and end slopes of the cell
+        for octant in self.OCTANTS:
+            if self._in_octant(octant, offset_x, offset_y):
+                l_slope, r_slope = self._slopes(*self._to_octant(octant, offset_x, offset_y))
+                windows[octant] = min(1.0, l_slope), max(0.0, r_slope)
+        if not windows:
+            return points
+
+        is_opaque, width, height = dungeon._map.is_opaque, dungeon.width, dungeon.height
+        radius_sq = (radius + 0.5)**2
+        recast = set()
+        for octant, (start, end) in windows.items():
+            self._cast(is_opaque, width, height, x, y, 1, start, end,
+                       radius, radius_sq, octant, recast)
+        updated = set(recast)
+        for point in points:
+            dx, dy = point[0] - x, point[1] - y
+            inside = [octant for octant, window in windows.items()
+                      if self._in_window(octant, window, dx, dy)]
+            if not inside:
+                updated.add(point)
+            elif point not in recast:
+                # The cell may still be seen through its slopes out of the
+                # windows, or from another octant: cast its own slopes only
+                for octant in self.OCTANTS:
+                    if not self._in_octant(octant, dx, dy):
+                        continue
+                    l_slope, r_slope = self._slopes(*self._to_octant(octant, dx, dy))
+                    seen = set()
+                    self._cast(is_opaque, width, height, x, y, 1, min(1.0, l_slope),
+                               max(0.0, r_slope), radius, radius_sq, octant, seen)
+                    if point in seen:
+                        updated.add(point)
+                        break
+        return updated
+
+    @staticmethod
+    def _to_octant(octant, offset_x, offset_y):
+        "Coordinates in the octant of an offset from the viewer"
+        xx, xy, yx, yy = octant
+        # The transformations are their own transposed inverse
+        return offset_x * xx + offset_y * yx, offset_x * xy + offset_y * yy
+
+    @staticmethod
+    def _slopes(dx, dy):
+        "Slopes of the left and right extremities of the cell (dx, dy) of an octant"
+        return (dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5)
+
+    @classmethod
+    def _in_octant(cls, octant, offset_x, offset_y):
+        "Check if the offset from the viewer lies in the octant"
+        dx, dy = cls._to_octant(octant, offset_x, offset_y)
+        return dy < 0 and -dy >= -dx >= 0
+
+    @classmethod
+    def _in_window(cls, octant, window, offset_x, offset_y):
+        "Check if the offset lies in the octant, and overlaps the (start, end) slopes"
+        if not cls._in_octant(octant, offset_x, offset_y):
+            return False
+        l_slope, r_slope = cls._slopes(*cls._to_octant(octant, offset_x, offset_y))
+        start, end = window
+        return r_slope <= start and l_slope >= end
+
+    def _cast_octant(self, dungeon, x, y, radius, octant, points):
+        "Add to points the cells visible in one octant"
+        self._cast(dungeon._map.is_opaque, dungeon.width, dungeon.height,
+                   x, y, 1, 1.0, 0.0, radius, (radius + 0.5)**2, octant, points)
+
+    def _cast(self, is_opaque, width, height, cx, cy, row, start, end,
+              radius, radius_sq, octant, points):
+        """
+        Scan the rows of an octant from row up to radius, between the slopes
+        start and end (start > end). Recurse when an opaque cell splits the
+        lit area.
+        """
+        if start < end:
+            return
+        xx, xy, yx, yy = octant
+        new_start = start
+        for j in range(row, radius + 1):
+            dx, dy = -j - 1, -j
+            blocked = False
+            while dx <= 0:
+                dx += 1
+                # Slopes of the left and right extremities of the cell
+                l_slope = (dx - 0.5) / (dy + 0.5)
+                r_slope = (dx + 0.5) / (dy - 0.5)
+                if start < r_slope:
+                    continue
+                if end > l_slope:
+                    break
+                map_x = cx + dx * xx + dy * xy
+                map_y = cy + dx * yx + dy * yy
+                if 0 <= map_x < width and 0 <= map_y < height:
+                    opaque = is_opaque(map_x, map_y)
+                    if dx * dx + dy * dy <= radius_sq:
+                        points.add( (map_x, map_y) )
+                else:
+                    opaque = True # Outside of the map, nothing to see
+                if blocked:
+                    if opaque:
+                        new_start = r_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                        if start < end:
+                            return # The opaque cells shadow the rest of the slopes
+                elif opaque and j < radius:
+                    blocked = True
+                    self._cast(is_opaque, width, height, cx, cy, j + 1, start,
+                               l_slope, radius, radius_sq, octant, points)
+                    new_start = r_slope
+            if blocked:
+                break
+
+
+ALGORITHMS = {
+    RaycastFOV.name: RaycastFOV(),
+    ShadowcastFOV.name: ShadowcastFOV(),
+}
+
+
+def get_algorithm(algorithm):
+    """Return the FOV algorithm registered under that name, or algorithm itself."""
+    if isinstance(algorithm, str):
+        try:
+            return ALGORITHMS[algorithm]
+        except KeyError:
+            raise ValueError("Unknown field of vision algorithm '{0}'".format(algorithm))
+    return algorithm
+
+
+class FOVCache:
+    """
+    Bounded LRU cache of field of vision results.
+    Entries are keyed on (x, y, radius, algorithm). When the opacity of a
+    cell changes, only the entries whose vision circle contains the cell are
+    dropped. The keys are indexed by squares of BUCKET_SIZE cells around
+    the viewer, so that only the entries near the cell are looked at.
+    The hits, misses, evictions and invalidations counters help to choose
+    the capacity.
+    """
+    BUCKET_SIZE = 16
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._entries = collections.OrderedDict()
+        self._buckets = {} # (x // BUCKET_SIZE, y // BUCKET_SIZE) -> set of keys
+        self._max_radius = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached points for key, or None"""
+        points = self._entries.get(key)
+        if points is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return points
+
+    def put(self, key, points):
+        """Store the points for key, evicting the least recently used entry if full"""
+        if key not in self._entries:
+            bucket = key[0] // self.BUCKET_SIZE, key[1] // self.BUCKET_SIZE
+            self._buckets.setdefault(bucket, set()).add(key)
+            self._max_radius = max(self._max_radius, key[2])
+        self._entries[key] = points
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._forget(self._entries.popitem(last=False)[0])
+            self.evictions += 1
+
+    def _forget(self, key):
+        "Remove a key dropped from the entries from its bucket"
+        bucket = key[0] // self.BUCKET_SIZE, key[1] // self.BUCKET_SIZE
+        keys = self._buckets[bucket]
+        keys.discard(key)
+        if not keys:
+            del self._buckets[bucket]
+
+    def invalidate_cell(self, x, y):
+        """Drop the entries whose vision may depend on the cell (x, y)"""
+        reach, size = self._max_radius + 1, self.BUCKET_SIZE
+        stale = []
+        for bucket_y in range((y - reach) // size, (y + reach) // size + 1):
+            for bucket_x in range((x - reach) // size, (x + reach) // size + 1):
+                for key in self._buckets.get((bucket_x, bucket_y), ()):
+                    if (x - key[0])**2 + (y - key[1])**2 <= (key[2] + 1)**2:
+                        stale.append(key)
+        for key in stale:
+            del self._entries[key]
+            self._forget(key)
+        self.invalidations += len(stale)
+
+    def clear(self):
+        """Drop all the entries. Counters are kept."""
+        self._entries.clear()
+        self._buckets.clear()
+        self._max_radius = 0
+
+    def stats(self):
+        """Return the counters in a dict"""
+        return {'size': len(self._entries), 'capacity': self.capacity,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'invalidations': self.invalidations}
+
+
+@functools.lru_cache(maxsize=None)
+def _disc_cells(radius):
+    """
+    Cells within radius of the viewer as (dx, dy, squared distance, path)
+    where path holds the relative Bresenham points strictly between the
+    viewer and the cell.
+    """
+    limit = (radius + 0.5)**2
+    cells = []
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if dx * dx + dy * dy <= limit:
+                cells.append((dx, dy, dx * dx + dy * dy, line_offsets(dx, dy)[1:-1]))
+    return tuple(cells)
+
+
+def batch_fields_of_vision(dungeon, viewers, use_numpy=None):
+    """
+    Compute the fields of vision of many viewers at once.
+    viewers is a sequence of (x, y, radius). A cell is seen if it is within
+    the radius and the Bresenham line from the viewer to the cell crosses no
+    cell blocking the light before reaching it.
+    Each viewer gets a mask of (2R+1) x (2R+1) cells centred on it, R being the
+    largest radius: the cell (x + dx, y + dy) is at row dy + R, column dx + R.
+    With NumPy (use_numpy None or True) the result is a boolean array of
+    shape (len(viewers), 2R+1, 2R+1) computed with vectorized gathers over the
+    opacity grid. Without NumPy (use_numpy False) it is a list of int bitsets,
+    bit (dy + R) * (2R+1) + dx + R being set for seen cells.
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    viewers = [tuple(map(int, viewer)) for viewer in viewers]
+    radius = max((viewer[2] for viewer in viewers), default=0)
+    if use_numpy:
+        return _batch_numpy(dungeon, viewers, radius)
+    return _batch_bitsets(dungeon, viewers, radius)
+
+
+def _step_allowed(dx, dy, step_x, step_y):
+    """
+    Check if a seen floor at (dx, dy) from the viewer reveals its neighbour
+    (dx + step_x, dy + step_y): the step must go away from the viewer, as in
+    Dungeon._reveal_adjacent_walls.
+    """
+    return (dx or dy) and (step_x in (0, (dx > 0) - (dx < 0)) or not dx) \
+                      and (step_y in (0, (dy > 0) - (dy < 0)) or not dy)
+
+
+def _inner_neighbours(dx, dy):
+    "Offsets of the neighbours of the cell (dx, dy) which can reveal it"
+    return [(dx - step_x, dy - step_y) for step_x, step_y in NEIGHBOUR_STEPS
+            if _step_allowed(dx - step_x, dy - step_y, step_x, step_y)]
+
+
+GATHER_SIZE = 1 << 20 # Cells of the ray paths looked up at once by _batch_numpy
+
+NEIGHBOUR_STEPS = [(step_x, step_y) for step_x in (-1, 0, 1) for step_y in (-1, 0, 1)
+                   if step_x or step_y]
+
+
+def _batch_bitsets(dungeon, viewers, radius):
+    "Pure Python version of batch_fields_of_vision"
+    side = 2 * radius + 1
+    cells = _disc_cells(radius)
+    width, height = dungeon.width, dungeon.height
+    is_opaque = dungeon._map.is_opaque
+    masks = []
+    for x, y, viewer_radius in viewers:
+        limit = (viewer_radius + 0.5)**2
+        seen, floors, hidden_walls = set(), set(), []
+        for dx, dy, dist, path in cells:
+            if dist > limit or not (0 <= x + dx < width and 0 <= y + dy < height):
+                continue
+            opaque = is_opaque(x + dx, y + dy)
+            for path_x, path_y in path:
+                if is_opaque(x + path_x, y + path_y):
+                    if opaque:
+                        hidden_walls.append((dx, dy))
+                    break
+            else:
+                seen.add((dx, dy))
+                if not opaque:
+                    floors.add((dx, dy))
+        # Walls next to a seen floor are seen too, to remove artifacts
+        for dx, dy in hidden_walls:
+            if not floors.isdisjoint(_inner_neighbours(dx, dy)):
+                seen.add((dx, dy))
+        bits = 0
+        for dx, dy in seen:
+            bits |= 1 << ((dy + radius) * side + dx + radius)
+        masks.append(bits)
+    return masks
+
+
+def _opacity_window(dungeon, left, top, right, bottom):
+    "Boolean NumPy array of the block_light attribute in a window of the map"
+    grid = dungeon._map
+    if hasattr(grid, 'as_array'):
+        return grid.as_array('block_light')[top:bottom, left:right] != 0
+    window = numpy.zeros((bottom - top, right - left), dtype=bool)
+    for y in range(top, bottom):
+        for x in range(left, right):
+            window[y - top, x - left] = grid.is_opaque(x, y)
+    return window
+
+
+def _batch_numpy(dungeon, viewers, radius, chunk_size=256):
+    """
+    NumPy version of batch_fields_of_vision. The viewers are processed by
+    chunks of chunk_size close viewers, sorted by position, each chunk only
+    loading the window of the map it sees: the memory used besides the
+    result is bounded, however far apart the viewers are. The chunks are
+    made smaller for a large radius, so that the ray paths of a chunk have
+    at most GATHER_SIZE cells.
+    """
+    side = 2 * radius + 1
+    masks = numpy.zeros((len(viewers), side, side), dtype=bool)
+    if not viewers:
+        return masks
+    cells = _disc_cells(radius)
+    positions = numpy.array(viewers, dtype=numpy.int64)
+
+    path_length = max(1, max(len(cell[3]) for cell in cells))
+    path_x = numpy.zeros((len(cells), path_length), dtype=numpy.int64)
+    path_y = numpy.zeros((len(cells), path_length), dtype=numpy.int64)
+    padding = numpy.ones((len(cells), path_length), dtype=bool)
+    for idx, (dx, dy, dist, path) in enumerate(cells):
+        for step, (step_x, step_y) in enumerate(path):
+            path_x[idx, step], path_y[idx, step] = step_x, step_y
+            padding[idx, step] = False
+    cell_dx = numpy.array([cell[0] for cell in cells])
+    cell_dy = numpy.array([cell[1] for cell in cells])
+    cell_dist = numpy.array([cell[2] for cell in cells])
+    chunk_size = max(1, min(chunk_size, GATHER_SIZE // (len(cells) * path_length)))
+
+    order = numpy.lexsort((positions[:, 0], positions[:, 1]))
+    for start in range(0, len(viewers), chunk_size):
+        indices = order[start:start + chunk_size]
+        chunk_positions = positions[indices]
+        # Window of the map seen by the viewers of the chunk, padded with
+        # opaque cells outside of the map
+        left = chunk_positions[:, 0].min() - radius
+        top = chunk_positions[:, 1].min() - radius
+        right = chunk_positions[:, 0].max() + radius + 1
+        bottom = chunk_positions[:, 1].max() + radius + 1
+        window_width = right - left
+        opaque = numpy.ones((bottom - top, window_width), dtype=bool)
+        inside = numpy.zeros_like(opaque)
+        map_left, map_top = max(left, 0), max(top, 0)
+        map_right, map_bottom = min(right, dungeon.width), min(bottom, dungeon.height)
+        if map_left < map_right and map_top < map_bottom:
+            area = (slice(map_top - top, map_bottom - top),
+                    slice(map_left - left, map_right - left))
+            opaque[area] = _opacity_window(dungeon, map_left, map_top, map_right, map_bottom)
+            inside[area] = True
+        # A last transparent cell is the target of the padding of short paths
+        opaque = numpy.append(opaque.ravel(), False)
+        inside = inside.ravel()
+        sentinel = opaque.size - 1
+
+        base = (chunk_positions[:, 1] - top) * window_width + chunk_positions[:, 0] - left
+        limits = (chunk_positions[:, 2] + 0.5)**2
+        path_offsets = path_y * window_width + path_x
+        gather = numpy.where(padding, sentinel, base[:, None, None] + path_offsets)
+        blocked = opaque[gather].any(axis=2)
+        targets = base[:, None] + cell_dy * window_width + cell_dx
+        in_range = inside[targets] & (cell_dist[None, :] <= limits[:, None])
+        target_opaque = opaque[targets]
+        chunk = numpy.zeros((len(indices), side, side), dtype=bool)
+        chunk[:, cell_dy + radius, cell_dx + radius] = in_range & ~blocked
+        # Walls next to a seen floor are seen too, to remove artifacts
+        floors = numpy.zeros_like(chunk)
+        floors[:, cell_dy + radius, cell_dx + radius] = in_range & ~blocked & ~target_opaque
+        hidden_walls = numpy.zeros_like(chunk)
+        hidden_walls[:, cell_dy + radius, cell_dx + radius] = in_range & blocked & target_opaque
+        revealed = numpy.zeros_like(chunk)
+        for (step_x, step_y), allowed in _neighbour_steps(radius):
+            source = (slice(max(-step_y, 0), side + min(-step_y, 0)),
+                      slice(max(-step_x, 0), side + min(-step_x, 0)))
+            target = (slice(max(step_y, 0), side + min(step_y, 0)),
+                      slice(max(step_x, 0), side + min(step_x, 0)))
+            revealed[(slice(None),) + target] |= floors[(slice(None),) + source] & allowed[source]
+        chunk |= hidden_walls & revealed
+        masks[indices] = chunk
+    return masks
+
+
+@functools.lru_cache(maxsize=None)
+def _neighbour_steps(radius):
+    """
+    For each step (step_x, step_y) to a neighbour cell, the (2R+1) x (2R+1)
+    boolean array of the floors which reveal their neighbour in that
+    direction. See _step_allowed.
+    """
+    side = 2 * radius + 1
+    steps = []
+    for step_x, step_y in NEIGHBOUR_STEPS:
+        allowed = numpy.zeros((side, side), dtype=bool)
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                allowed[dy + radius, dx + radius] = _step_allowed(dx, dy, step_x, step_y)
+        steps.append(((step_x, step_y), allowed))
+    return tuple(steps)
+
+
+def mask_points(mask, x, y, radius):
+    """
+    Return the set of map positions seen in one mask of
+    batch_fields_of_vision. (x, y) is the viewer position and radius the
+    largest radius of the batch.
+    """
+    side = 2 * radius + 1
+    if isinstance(mask, int):
+        points = set()
+        while mask:
+            bit = mask & -mask
+            index = bit.bit_length() - 1
+            points.add((x + index % side - radius, y + index // side - radius))
+            mask ^= bit
+        return points
+    rows, cols = numpy.nonzero(mask)
+    return {(x + int(col) - radius, y + int(row) - radius) for row, col in zip(rows, cols)}
+
+
+def main():
+    """Compare the timings of the FOV algorithms on the big map"""
+    import timeit
+    from .dungeon import Dungeon
+
+    level = Dungeon.load_from_file('map/bigmap.txt')
+    open_level = Dungeon(100, 100)
+    positions = [(x, y) for y in range(level.height) for x in range(level.width)
+                 if not level.collide(x, y)]
+    print('Milliseconds per call, raycast / shadowcast')
+    print('{0:>6} {1:>21} {2:>21}'.format('radius', 'bigmap.txt', 'empty 100x100'))
+    for radius in (5, 10, 15, 20, 30, 40):
+        timings = []
+        for name in ('raycast', 'shadowcast'):
+            timings.append(timeit.timeit(
+                lambda: [level.get_field_of_vision(x, y, radius, name) for x, y in positions[::10]],
+                number=1) / len(positions[::10]))
+        for name in ('raycast', 'shadowcast'):
+            timings.append(timeit.timeit(
+                lambda: open_level.get_field_of_vision(50, 50, radius, name), number=1))
+        print('{0:>6} {1:>10.3f}/{2:<10.3f} {3:>10.3f}/{4:<10.3f}'.format(
+            radius, *(t * 1000 for t in timings)))
+
+    print()
+    print('Milliseconds for a batch of viewers on bigmap.txt')
+    compact_level = Dungeon.load_from_file('map/bigmap.txt', compact=True)
+    batches = [('raycast loop', lambda viewers: [compact_level.get_field_of_vision(x, y, radius, 'raycast')
+                                                 for x, y, radius in viewers]),
+               ('shadowcast loop', lambda viewers: [compact_level.get_field_of_vision(x, y, radius, 'shadowcast')
+                                                    for x, y, radius in viewers]),
+               ('batch bitsets', lambda viewers: compact_level.get_fields_of_vision(viewers, use_numpy=False))]
+    if numpy is not None:
+        batches.append(('batch numpy', lambda viewers: compact_level.get_fields_of_vision(viewers)))
+    print('{0:>8} {1:>7} '.format('viewers', 'radius') + ' '.join('{0:>16}'.format(name) for name, _ in batches))
+    for count in (10, 100, 1000):
+        for radius in (5, 8):
+            viewers = [positions[idx % len(positions)] + (radius,) for idx in range(0, 7 * count, 7)]
+            timings = [timeit.timeit(lambda: batch(viewers), number=1) for _, batch in batches]
+            print('{0:>8} {1:>7} '.format(count, radius) + ' '.join('{0:>16.2f}'.format(t * 1000) for t in timings))
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,42 @@
 import pygcurse, pygame
 
 class GameView:
+    """
+    Gathers the views displayed in the window, with their position.
+    A view with a dirty attribute is only drawn and blitted when it is True.
+    Views without that attribute are drawn every time.
+    """
     def __init__(self, win, views):
         self.win = win
         self.views = views
 
+    @property
+    def dirty(self):
+        """True if at least one view needs to be drawn"""
+        return any(getattr(view, 'dirty', True) for view in self.views)
+
     def draw(self):
+        """
+        Draw the dirty views and blit them on the window surface.
+        Returns True if something was blitted.
+        """
+        drawn = False
         for view, coords in self.views.items():
-            view.draw()
-            view.blitto(self.win.surface, dest=coords)
+            if getattr(view, 'dirty', True):
+                view.draw()
+                view.blitto(self.win.surface, dest=coords)
+                drawn = True
+        return drawn
+
+    def cell_at_pixel(self, pos):
+        """
+        The (x, y) dungeon cell drawn at the pixel pos of the window, or
+        None. Views showing the dungeon have a cell_at_pixel method too.
+        """
+        for view, (left, top) in self.views.items():
+            cell_at_pixel = getattr(view, 'cell_at_pixel', None)
+            if cell_at_pixel is not None:
+                cell = cell_at_pixel((pos[0] - left, pos[1] - top))
+                if cell is not None:
+                    return cell
+        return None
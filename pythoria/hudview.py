@@ -6,12 +6,45 @@ import pygcurse, pygame
 pygame.font.init()
 
 class HUDView(pygcurse.PygcurseSurface):
+    """
+    Shows the player information.
+    If the dungeon is given, the view is only dirty after the player moved.
+    Otherwise nothing tells when the player moves, so it is always dirty.
+    With a profiler (see pythoria.instrument), the percentiles of its
+    timings are shown below while it is enabled, refreshed every refresh
+    seconds.
+    """
     font = pygame.font.Font(pygame.font.match_font('consolas'), 18)
 
-    def __init__(self, player):
+    def __init__(self, player, dungeon=None, profiler=None, refresh=0.5):
         self.player = player
         super(HUDView, self).__init__(30, 30, HUDView.font)
         self.autoupdate = False
+        self.profiler = profiler
+        self.refresh = refresh
+        self._dirty = True
+        self._drawn_at = None
+        self._connections = []
+        if dungeon is not None:
+            self._connections.append(dungeon.bind("Player Moved", self.on_player_moved))
+
+    def _get_dirty(self):
+        profiler = self.profiler
+        if profiler is not None:
+            if profiler.enabled and (self._drawn_at is None or
+                                     profiler.clock() - self._drawn_at >= self.refresh):
+                return True # The overlay must be refreshed
+            if not profiler.enabled and self._drawn_at is not None:
+                return True # The overlay must be erased
+        return self._dirty
+
+    def _set_dirty(self, dirty):
+        self._dirty = dirty
+
+    dirty = property(_get_dirty, _set_dirty)
+
+    def on_player_moved(self):
+        self.dirty = True
 
     def draw(self):
         self.setscreencolors(clear=True)
@@ -19,4 +52,13 @@ class HUDView(pygcurse.PygcurseSurface):
         self.putchars("Player")
         self.putchars("x={:<4}".format(self.player.x), x=2, y=1)
         self.putchars("y={:<4}".format(self.player.y), x=2, y=2)
+        profiler = self.profiler
+        if profiler is not None and profiler.enabled:
+            self.putchars("ms              p50  p95  p99", x=0, y=4)
+            for y, line in enumerate(profiler.report(), 5):
+                self.putchars(line, x=0, y=y)
+            self._drawn_at = profiler.clock()
+        else:
+            self._drawn_at = None
         self.update()
+        self.dirty = not self._connections
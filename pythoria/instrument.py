@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Timing instrumentation of the game.
+
+A Profiler measures the time spent in some methods of given objects: when
+enabled, the methods are shadowed by timing wrappers set on the objects
+themselves; when disabled, the wrappers are removed and the original methods
+are called directly again, so there is no overhead at all.
+The last window durations of each measure are kept, and summed up as
+percentiles for the HUDView overlay.
+"""
+
+import collections
+import time
+
+__all__ = ['Profiler']
+
+
+class Profiler:
+    """
+    Rolling timings, in seconds, of named measures. clock is the monotonic
+    clock used, time.perf_counter by default.
+    """
+    def __init__(self, window=300, clock=time.perf_counter):
+        self.window = window
+        self.clock = clock
+        self.samples = collections.OrderedDict()
+        self.enabled = False
+        self._wrapped = [] # (object, method name, instance attribute) shadowed by a wrapper
+
+    def record(self, name, duration):
+        """Add a duration to the measure name"""
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = collections.deque(maxlen=self.window)
+        samples.append(duration)
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        """The percentiles of the durations of the measure name, nearest rank"""
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return tuple(0.0 for point in points)
+        last = len(samples) - 1
+        return tuple(samples[min(last, max(0, -(-point * len(samples) // 100) - 1))]
+                     for point in points)
+
+    def instrument(self, obj, method_name, name=None):
+        """Time the calls of the method method_name of obj, as the measure name"""
+        method = getattr(obj, method_name)
+        clock = self.clock
+        name = name or method_name
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = collections.deque(maxlen=self.window)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                samples.append(clock() - start)
+        self._wrapped.append((obj, method_name, vars(obj).get(method_name)))
+        setattr(obj, method_name, timed)
+
+    def enable(self, controller):
+        """
+        Time the controller event processing, the player moves and fields of
+        vision, the drawing of each view and the blitting of the window.
+        """
+        if self.enabled:
+            return
+        self.enabled = True
+        self.instrument(controller, 'process_event')
+        self.instrument(controller.dungeon, 'move_player')
+        self.instrument(controller.dungeon, 'get_field_of_vision', 'field_of_vision')
+        for view in controller.view.views:
+            self.instrument(view, 'draw', type(view).__name__)
+        self.instrument(controller.view.win, 'blittowindow')
+
+    def disable(self):
+        """Remove the timing wrappers, the samples are kept"""
+        for obj, method_name, original in reversed(self._wrapped):
+            if original is None:
+                delattr(obj, method_name) # The class method is visible again
+            else:
+                setattr(obj, method_name, original)
+        self._wrapped = []
+        self.enabled = False
+
+    def toggle(self, controller):
+        """Enable or disable the profiler. Return True if enabled."""
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable(controller)
+        return self.enabled
+
+    def report(self):
+        """Lines of the percentiles of each measure, in milliseconds"""
+        return ['{0:<15.15}{1:>5.1f}{2:>5.1f}{3:>5.1f}'.format(
+                name, *(duration * 1000 for duration in self.percentiles(name)))
+                for name in self.samples]
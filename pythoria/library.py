@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import functools
+
 def get_line(x1, y1, x2, y2):
     points = []
     issteep = abs(y2-y1) > abs(x2-x1)
@@ -60,6 +62,80 @@ def get_circle(x0, y0, radius):
             radius_error += 2 * (y - x + 1)
     return points
 
+def iter_line(x1, y1, x2, y2):
+    """
+    Lazy version of get_line: yields the same points in the same order, so
+    the caller can stop at the first interesting cell without building the
+    whole line.
+    The position of each point is computed directly from its index on the
+    line, which allows to walk the line from either end.
+    """
+    issteep = abs(y2-y1) > abs(x2-x1)
+    if issteep:
+        x1, y1 = y1, x1
+        x2, y2 = y2, x2
+    rev = x1 > x2
+    if rev:
+        x1, x2 = x2, x1
+        y1, y2 = y2, y1
+    deltax = x2 - x1
+    deltay = abs(y2-y1)
+    error = int(deltax / 2)
+    ystep = 1 if y1 < y2 else -1
+    indices = range(deltax, -1, -1) if rev else range(deltax + 1)
+    for i in indices:
+        # Number of y steps done before the i-th point: the error term
+        # error - i * deltay is brought back to >= 0 by adding deltax
+        steps = max(0, -((error - i * deltay) // deltax)) if deltax else 0
+        x, y = x1 + i, y1 + ystep * steps
+        if issteep:
+            yield y, x
+        else:
+            yield x, y
+
+@functools.lru_cache(maxsize=16384)
+def line_offsets(dx, dy):
+    """
+    Bresenham path from (0, 0) to (dx, dy), as a tuple of relative points.
+    Bresenham lines only depend on the difference between their ends, so
+    the path can be translated to any origin.
+    """
+    return tuple(iter_line(0, 0, dx, dy))
+
+@functools.lru_cache(maxsize=None)
+def circle_offsets(radius):
+    """
+    Points of get_circle(0, 0, radius) without the duplicates found where
+    the octants meet, in their original order.
+    """
+    return tuple(dict.fromkeys(get_circle(0, 0, radius)))
+
+@functools.lru_cache(maxsize=None)
+def ray_table(radius):
+    """
+    Tuple of (offset, path) pairs: for each point of circle_offsets(radius),
+    the relative Bresenham path from (0, 0) to it.
+    """
+    return tuple((offset, line_offsets(*offset)) for offset in circle_offsets(radius))
+
+def clamp(value, min_, max_):
+    """Clamps value between min and max"""
+    return min(max(value, min_), max_)
+
+def viewport_origin(center_x, center_y, width, height, map_width, map_height):
+    """
+    Top left position of a width x height viewport centred on
+    (center_x, center_y), constrained in the limits of the map.
+    """
+    left = clamp(center_x - width // 2, 0, max(0, map_width - width))
+    top = clamp(center_y - height // 2, 0, max(0, map_height - height))
+    return left, top
+
+def iter_circle(x0, y0, radius):
+    """Yields the points of the circle at center (x0, y0), without duplicates."""
+    for offset_x, offset_y in circle_offsets(radius):
+        yield offset_x + x0, offset_y + y0
+
 if __name__ == '__main__':
     import pygcurse, pygame
     win = pygcurse.PygcurseWindow(40,30)
@@ -13,42 +13,65 @@ from .dungeonview import ScrollingView
 from .hudview import HUDView
 from .messageboxview import MessageBoxView
 from .controller import Controller
+from .runner import AsyncRunner
+from .instrument import Profiler
+
+IDLE_TIMEOUT = 1000 # Milliseconds to wait for an event when nothing has to be drawn
+
+def run(controller, win, fps=30):
+    """
+    Main loop: process the events, advance the running command of the
+    controller, deliver the deferred events and draw the dirty views.
+    When nothing has to be done and no event is pending, sleep until the
+    next event.
+    """
+    mainClock = pygame.time.Clock()
+    running = True
+    
+    while running:
+        controller.update()
+        if controller.view.draw():
+            win.blittowindow()
+        mainClock.tick(fps)
+
+        events = pygame.event.get()
+        if not events and not controller.view.dirty and not controller.busy:
+            events = [pygame.event.wait(IDLE_TIMEOUT)]
+        for event in events:
+            if event.type == QUIT:
+                running = False
+            elif event.type != NOEVENT:
+                controller.process_event(event)
 
 def main():
     """
     Quick game setup for testing purposes.
+    With the --asyncio option, the game runs in the AsyncRunner loop.
     """
     win = pygcurse.PygcurseWindow(80, 30)
     win.font = pygame.font.Font(pygame.font.match_font('consolas'), 18)
-    level1 = Dungeon.load_from_file('map/bigmap.txt')
+    level1 = Dungeon.load_from_file('map/bigmap.txt', fov='shadowcast')
     player = Player(1, 1)
     level1.add_player(player)
-    msgbox = MessageBox()
+    msgbox = MessageBox(maxlen=100)
+    profiler = Profiler()
 
     view = GameView(
         win,
         {
-            ScrollingView(level1):         (0  ,   0),
-            HUDView(player):               (700,   0),
-            MessageBoxView(msgbox, 80, 5): (0  , 460)
+            ScrollingView(level1):             (0  ,   0),
+            HUDView(player, level1, profiler): (700,   0),
+            MessageBoxView(msgbox, 80, 5):     (0  , 460)
         }
     )
 
-    controller = Controller(level1, msgbox,  view)
+    controller = Controller(level1, msgbox,  view, deferred=True, profiler=profiler)
     win.autoupdate = False
-    mainClock = pygame.time.Clock()
-    running = True
-    
-    while running:
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                running = False
-            else:
-                controller.process_event(event)
-
-        controller.view.draw()
-        win.blittowindow()
-        mainClock.tick(30)
+    if '--asyncio' in sys.argv:
+        AsyncRunner(controller, win).run()
+    else:
+        run(controller, win)
+    msgbox.flush()
 
     pygame.quit()
     sys.exit()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Reading and writing of map files.
+
+Text maps (.txt): the first line gives the width and the height, the
+following lines draw the map with the glyphs registered in pythoria.tile.
+They are parsed in bulk with bytes.translate: one translation table per
+plane of the CompactGrid, no Python work per cell.
+
+Binary maps (.pmap): a header followed by the planes of a CompactGrid.
+    magic       4 bytes   b'PMAP'
+    version     uint16
+    planes      uint16    number of planes stored
+    width       uint32
+    height      uint32
+    player x    int32     -1 without player start position
+    player y    int32
+then width * height bytes per plane, in CompactGrid.PLANES order.
+All numbers are little endian. The file is mapped in memory with mmap, and
+the planes of the grid are views on it (copy on write: the file is never
+modified through the grid).
+open_chunked maps the file without loading it: the cells are paged in by
+chunks (see pythoria.storage.ChunkedGrid).
+
+Run as a script to convert a map from one format to the other:
+    python -m pythoria.mapformat map/bigmap.txt bigmap.pmap
+"""
+
+import mmap
+import os.path
+import struct
+
+from .storage import CompactGrid, TileGrid, ChunkedGrid
+from .tile import TILE_TYPES, PLAYER_GLYPH, make_tile
+
+__all__ = ['read_text', 'parse_text', 'from_glyphs', 'to_text', 'write_text',
+           'read_binary', 'write_binary', 'to_binary', 'from_binary', 'open_chunked',
+           'read_map', 'write_map',
+           'to_tiles', 'convert', 'BINARY_EXTENSION']
+
+BINARY_EXTENSION = '.pmap'
+MAGIC = b'PMAP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIii')
+
+
+def _translation_tables():
+    """
+    Return the glyphs known by the registry and a translation table for
+    each plane of a CompactGrid.
+    """
+    glyph = bytearray(range(256))
+    block_light = bytearray(256)
+    blocking = bytearray(256)
+    known = bytearray()
+    for value, (tile_class, light, block) in TILE_TYPES.items():
+        code = CompactGrid.encode_glyph(value)
+        known.append(code)
+        block_light[code] = 1 if light else 0
+        blocking[code] = 1 if block else 0
+    code = CompactGrid.encode_glyph(PLAYER_GLYPH)
+    known.append(code)
+    glyph[code] = ord(' ')
+    return bytes(known), bytes(glyph), bytes(block_light), bytes(blocking)
+
+
+def _check_glyphs(cells, width):
+    "Raise a ValueError locating the first glyph of the cells bytes not in the registry"
+    known = _translation_tables()[0]
+    unknown = cells.translate(None, known)
+    if unknown:
+        row_idx, col_idx = divmod(cells.index(unknown[:1]), width)
+        raise ValueError("Character '{0}' unrecognized at row {1} col {2}".format(
+                         unknown[:1].decode('latin-1'), row_idx, col_idx))
+
+
+def parse_text(data, width, height):
+    """
+    Parse the latin-1 encoded bytes drawing a map into a CompactGrid.
+    Lines are padded with spaces or cut to fit width and height.
+    Return the grid and the player start position (None if not in the map,
+    the last one if there are several, like Dungeon).
+    """
+    rows = data.split(b'\n')[:height]
+    rows = [row.ljust(width)[:width] for row in rows]
+    rows.extend([b' ' * width] * (height - len(rows)))
+    cells = b''.join(rows)
+
+    _check_glyphs(cells, width)
+
+    player_pos = None
+    index = cells.rfind(PLAYER_GLYPH.encode('latin-1'))
+    if index >= 0:
+        player_pos = index % width, index // width
+    return from_glyphs(cells, width, height), player_pos
+
+
+def from_glyphs(cells, width, height):
+    """
+    Build a CompactGrid from the glyphs of its cells, in row major order.
+    The other planes are set from the registered tile types.
+    """
+    known, glyph, block_light, blocking = _translation_tables()
+    return CompactGrid.from_planes(width, height,
+                                   bytearray(cells.translate(glyph)),
+                                   bytearray(cells.translate(block_light)),
+                                   bytearray(cells.translate(blocking)),
+                                   bytearray(width * height))
+
+
+def read_text(filename):
+    """Read a text map. Return a CompactGrid and the player start position."""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    # Universal newlines, like a file opened in text mode
+    data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    size, _, data = data.partition(b'\n')
+    width, height = map(int, size.strip().split(b' '))
+    if not data.isascii():
+        text = data.decode('utf-8')
+        try:
+            data = text.encode('latin-1')
+        except UnicodeEncodeError as error:
+            row_idx = text.count('\n', 0, error.start)
+            col_idx = error.start - text.rfind('\n', 0, error.start) - 1
+            raise ValueError("Character '{0}' unrecognized at row {1} col {2}".format(
+                             text[error.start], row_idx, col_idx)) from None
+    return parse_text(data, width, height)
+
+
+def to_text(grid, player_pos=None):
+    """Return the text map of the grid, as a str."""
+    glyph = bytearray(grid.glyph)
+    if player_pos is not None:
+        x, y = player_pos
+        glyph[y * grid.width + x] = ord(PLAYER_GLYPH)
+    rows = [glyph[y * grid.width:(y + 1) * grid.width] for y in range(grid.height)]
+    return '{0} {1}\n'.format(grid.width, grid.height) + \
+           b'\n'.join(rows).decode('latin-1') + '\n'
+
+
+def write_text(filename, grid, player_pos=None):
+    """Save the grid as a text map"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(to_text(grid, player_pos))
+
+
+def read_binary(filename):
+    """
+    Map a binary map in memory. Return a CompactGrid whose planes are views
+    on the file, and the player start position.
+    """
+    with open(filename, 'rb') as f:
+        width, height, player_pos = _read_header(f)
+        size = width * height
+        if size == 0:
+            return CompactGrid(width, height), None
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+    offsets = range(HEADER.size, HEADER.size + len(CompactGrid.PLANES) * size, size)
+    grid = CompactGrid.from_planes(width, height,
+                                   *(data[offset:offset + size] for offset in offsets))
+    return grid, player_pos
+
+
+def open_chunked(filename, writable=False, chunk_size=64, max_chunks=64):
+    """
+    Map a binary map in memory, without loading it. Return a ChunkedGrid
+    paging in the chunks from the file, and the player start position.
+    If writable, the changed chunks are written back to the file when
+    evicted, or when the grid is flushed.
+    """
+    with open(filename, 'r+b' if writable else 'rb') as f:
+        width, height, player_pos = _read_header(f)
+        if width * height == 0:
+            raise ValueError("{0} is an empty map".format(filename))
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_COPY)
+    grid = ChunkedGrid(width, height, data, HEADER.size, chunk_size, max_chunks)
+    return grid, player_pos
+
+
+def _read_header(f):
+    "Check the header of the binary map file f. Return its size and player position."
+    return _unpack_header(f.read(HEADER.size), os.fstat(f.fileno()).st_size, f.name)
+
+
+def _unpack_header(header, total_size, name):
+    "Check the header of a binary map of total_size bytes. Return its size and player position."
+    if len(header) < HEADER.size or header[:4] != MAGIC:
+        raise ValueError("{0} is not a binary map".format(name))
+    magic, version, planes, width, height, player_x, player_y = HEADER.unpack(header)
+    if version > VERSION:
+        raise ValueError("Binary map version {0} is not supported".format(version))
+    if planes != len(CompactGrid.PLANES) or total_size < HEADER.size + planes * width * height:
+        raise ValueError("{0} is truncated or corrupted".format(name))
+    return width, height, None if player_x < 0 else (player_x, player_y)
+
+
+def write_binary(filename, grid, player_pos=None):
+    """Save the planes of a CompactGrid as a binary map"""
+    with open(filename, 'wb') as f:
+        f.write(_pack_header(grid, player_pos))
+        for name in CompactGrid.PLANES:
+            f.write(getattr(grid, name))
+
+
+def to_binary(grid, player_pos=None):
+    """Return the binary map of a CompactGrid, as bytes"""
+    return _pack_header(grid, player_pos) + \
+           b''.join(getattr(grid, name) for name in CompactGrid.PLANES)
+
+
+def from_binary(data, name='<bytes>'):
+    """
+    Read a binary map from bytes. Return a CompactGrid with a copy of the
+    planes, and the player start position.
+    """
+    width, height, player_pos = _unpack_header(data[:HEADER.size], len(data), name)
+    size = width * height
+    planes = memoryview(bytearray(data[HEADER.size:HEADER.size + len(CompactGrid.PLANES) * size]))
+    grid = CompactGrid.from_planes(width, height,
+                                   *(planes[offset:offset + size]
+                                     for offset in range(0, len(planes), size or 1)))
+    return grid, player_pos
+
+
+def _pack_header(grid, player_pos):
+    "Return the header of the binary map of the grid"
+    player_x, player_y = (-1, -1) if player_pos is None else player_pos
+    return HEADER.pack(MAGIC, VERSION, len(CompactGrid.PLANES),
+                       grid.width, grid.height, player_x, player_y)
+
+
+def read_map(filename):
+    """Read a text or a binary map, according to the file extension"""
+    if filename.endswith(BINARY_EXTENSION):
+        return read_binary(filename)
+    return read_text(filename)
+
+
+def write_map(filename, grid, player_pos=None):
+    """Write a text or a binary map, according to the file extension"""
+    if filename.endswith(BINARY_EXTENSION):
+        write_binary(filename, grid, player_pos)
+    else:
+        write_text(filename, grid, player_pos)
+
+
+def to_tiles(grid):
+    """
+    Build a TileGrid with the Tile classes registered for the glyphs.
+    Raise a ValueError if a glyph is not registered.
+    """
+    width = grid.width
+    glyph, visible = grid.glyph, grid.visible
+    _check_glyphs(bytes(glyph), width)
+    return TileGrid([make_tile(chr(glyph[index]), bool(visible[index]))
+                     for index in range(y * width, (y + 1) * width)]
+                    for y in range(grid.height))
+
+
+def convert(source, destination):
+    """Convert a map file, the formats are given by the file extensions"""
+    write_map(destination, *read_map(source))
+
+
+def main():
+    """Convert a map, or time the loading of a big map"""
+    import sys
+    import tempfile
+    import timeit
+
+    if len(sys.argv) == 3:
+        convert(sys.argv[1], sys.argv[2])
+        return
+    if len(sys.argv) > 2 or sys.argv[1:] and not sys.argv[1].isdigit():
+        print('Usage: python -m pythoria.mapformat SOURCE DESTINATION')
+        print('       python -m pythoria.mapformat [SIZE]   (benchmark)')
+        return
+
+    size = int(sys.argv[1]) if len(sys.argv) == 2 else 2000
+    base, player_pos = read_text(os.path.join(os.path.dirname(__file__), 'map/bigmap.txt'))
+    rows = to_text(base).split('\n')[1:base.height + 1]
+    rows = [(row * (size // base.width + 1))[:size] for row in rows]
+    rows = (rows * (size // base.height + 1))[:size]
+    with tempfile.TemporaryDirectory() as directory:
+        text_file = os.path.join(directory, 'big.txt')
+        binary_file = os.path.join(directory, 'big' + BINARY_EXTENSION)
+        with open(text_file, 'w') as f:
+            f.write('{0} {0}\n'.format(size) + '\n'.join(rows))
+        convert(text_file, binary_file)
+        print('{0} x {0} map'.format(size))
+        for name, filename in (('text', text_file), ('binary', binary_file)):
+            duration = timeit.timeit(lambda: read_map(filename), number=3) / 3
+            print('{0:>6}: {1:.3f} s'.format(name, duration))
+        grid, player_pos = open_chunked(binary_file, writable=False)
+        rows = grid[0:15]
+        duration = timeit.timeit(lambda: [tile.value for row in rows for tile in row[0:15]],
+                                 number=3) / 3
+        print('chunked, 15x15 window: {0:.3f} s, {1} bytes loaded'.format(duration, grid.nbytes))
+
+if __name__ == '__main__':
+    main()
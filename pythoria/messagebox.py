@@ -1,18 +1,142 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import collections
 import datetime
+import re
 
-class MessageBox(list):
-    def __init__(self, *msgs):
-        super(MessageBox, self).__init__(msgs)
+from .events import EventDispatcher
+
+_UNESCAPED = {'n': '\n', 'r': '\r'} # Escape sequences of the log file
+
+class Message:
+    """
+    A message and the time it was added. The time is only formatted when the
+    message is converted to a string.
+    """
+    __slots__ = ('time', 'text')
+
+    def __init__(self, text, time=None):
+        self.text = text
+        self.time = time
+
+    def __str__(self):
+        if self.time is None:
+            return self.text
+        return self.time.strftime('[%H:%M:%S] ') + self.text
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return '<Message {0!r}>'.format(str(self))
+
+
+class MessageBox(EventDispatcher):
+    """
+    Sequence of messages for the player, kept in the messages deque.
+    Posts a "Message Added" event for each appended message, coalesced
+    when the events are deferred.
+
+    With maxlen, the MessageBox is a ring buffer keeping only the last maxlen
+    messages. add then stores Message objects, formatted lazily. Evicted
+    messages are written to the log_path file, if given, in batches of
+    spill_batch messages. read_log and history read them back lazily.
+    """
+    COALESCIBLE = frozenset(("Message Added",))
+
+    def __init__(self, *msgs, maxlen=None, log_path=None, spill_batch=64):
+        super(MessageBox, self).__init__()
+        if maxlen is not None and maxlen < 1:
+            raise ValueError("maxlen should be at least 1, not {0}".format(maxlen))
+        self.maxlen = maxlen
+        self.log_path = log_path
+        self.spill_batch = spill_batch
+        self.messages = collections.deque(maxlen=maxlen)
+        self._spilled = []
+        for msg in msgs:
+            self._store(msg)
 
     def add(self, msg):
-        date = self._now().strftime('[%H:%M:%S] ')
-        self.append(date + msg)
-    
+        if self.maxlen is None:
+            date = self._now().strftime('[%H:%M:%S] ')
+            self.append(date + msg)
+        else:
+            self.append(Message(msg, self._now()))
+
+    def append(self, msg):
+        self._store(msg)
+        self.post("Message Added")
+
+    def _store(self, msg):
+        "Append a message, spilling the oldest one to the log if the box is full"
+        if self.messages and len(self.messages) == self.maxlen and self.log_path is not None:
+            self._spilled.append(self.messages[0])
+            if len(self._spilled) >= self.spill_batch:
+                self.flush()
+        self.messages.append(msg)
+
+    def flush(self):
+        """Write the evicted messages still in memory to the log file"""
+        if not self._spilled or self.log_path is None:
+            return
+        lines = []
+        for msg in self._spilled:
+            time = getattr(msg, 'time', None)
+            text = getattr(msg, 'text', msg)
+            text = text.replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r')
+            lines.append('{0}\t{1}\n'.format(time.isoformat() if time else '', text))
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(lines))
+        self._spilled = []
+
+    def read_log(self):
+        """Yield the Messages written to the log file, oldest first."""
+        if self.log_path is None:
+            return
+        try:
+            f = open(self.log_path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                time, _, text = line.rstrip('\n').partition('\t')
+                text = re.sub(r'\\(.)', lambda m: _UNESCAPED.get(m.group(1), m.group(1)), text)
+                yield Message(text, datetime.datetime.fromisoformat(time) if time else None)
+
+    def history(self):
+        """Yield all the messages, from the log file to the last one added."""
+        yield from self.read_log()
+        yield from self._spilled
+        yield from self.messages
+
     def _now(self):
         return datetime.datetime.now()
 
+    def __len__(self):
+        return len(self.messages)
+
+    def __getitem__(self, key):
+        """Return the message at index key, or a list of messages for a slice"""
+        if isinstance(key, slice):
+            return [self.messages[index] for index in range(*key.indices(len(self.messages)))]
+        return self.messages[key]
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __eq__(self, other):
+        if not isinstance(other, (MessageBox, list, collections.deque)):
+            return NotImplemented
+        return list(self.messages) == list(other)
+
+    __hash__ = None
+
     def __str__(self):
-        return '\n'.join(self)
+        return '\n'.join(map(str, self.messages))
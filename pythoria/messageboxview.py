@@ -7,6 +7,13 @@ import textwrap
 pygame.font.init()
 
 class MessageBoxView(pygcurse.PygcurseSurface):
+    """
+    Shows the last messages of the MessageBox.
+    The view is dirty when a message is added.
+    The wrapped lines of the displayed messages are cached, keyed on the
+    message object and the wrap width, so only new messages get wrapped. The
+    surface is only rewritten when the displayed lines change.
+    """
     font = pygame.font.Font(pygame.font.match_font('consolas'), 14)
     
     def __init__(self, msgbox, width=80, height=5):
@@ -15,15 +22,36 @@ class MessageBoxView(pygcurse.PygcurseSurface):
         self.width, self.height = width, height
         self.autoupdate = False
         self.msgbox = msgbox
+        self.dirty = True
+        self._connection = msgbox.bind("Message Added", self.on_message_added)
+        self._wrapped = {} # id(msg) -> (msg, width, lines)
+        self._lines = None
+    
+    def on_message_added(self):
+        self.dirty = True
+
+    def wrap(self, msg):
+        """Return the wrapped lines of the message, from the cache if possible"""
+        entry = self._wrapped.get(id(msg))
+        if entry is None or entry[0] is not msg or entry[1] != self.wrapper.width:
+            entry = (msg, self.wrapper.width, self.wrapper.wrap(str(msg)))
+        return entry
 
     def draw(self):
-        self.setscreencolors(clear=True)
-        self.cursor = (0, 0)
-        
+        wrapped = {}
         msgs = []
         for msg in self.msgbox[-self.height:]:
-            splitted_msg = self.wrapper.wrap(msg)
-            msgs.extend(splitted_msg)
-
-        self.write('\n'.join(msgs[-self.height:]))
-        self.update()
+            entry = self.wrap(msg)
+            wrapped[id(msg)] = entry
+            msgs.extend(entry[2])
+        # Only the displayed messages stay in the cache
+        self._wrapped = wrapped
+        
+        lines = msgs[-self.height:]
+        if lines != self._lines:
+            self._lines = lines
+            self.setscreencolors(clear=True)
+            self.cursor = (0, 0)
+            self.write('\n'.join(lines))
+            self.update()
+        self.dirty = False
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pathfinding on the Dungeon grid.
+
+Moves go to the 4 adjacent cells, like Dungeon.move_player. Entering a cell
+costs 1, entering a closed door costs door_cost (the step opening it and the
+step moving in); with door_cost=None, closed doors block like walls.
+
+A Pathfinder finds paths with A*, and builds DistanceField objects: the
+distance of every cell to the closest of a set of sources (multi-source
+Dijkstra). A monster pursuing the player only has to follow the field to
+the player, so a single field serves all of them. Fields are kept in an LRU
+cache, and patched when a door opens or closes instead of being computed
+again.
+"""
+
+import array
+import collections
+import heapq
+
+__all__ = ['Pathfinder', 'DistanceField', 'UNREACHABLE']
+
+UNREACHABLE = 1 << 30 # Distance of the cells which cannot be reached, fits in a C int
+
+
+def _neighbours(index, width, size):
+    "Indices of the cells adjacent to the cell index"
+    x = index % width
+    if x > 0:
+        yield index - 1
+    if x < width - 1:
+        yield index + 1
+    if index >= width:
+        yield index - width
+    if index < size - width:
+        yield index + width
+
+
+class DistanceField:
+    """
+    Distances from every cell to the closest source, in cost of moves.
+    The distance is the cost of the moves from the source to the cell: it
+    counts the cost of the cell, not the one of the source. Cells are
+    indexed by y * width + x in the distances array of C ints (4 bytes per
+    cell instead of a pointer to an int object).
+    """
+    def __init__(self, sources, width, height):
+        self.sources = frozenset(sources)
+        self.width = width
+        self.height = height
+        self.distances = array.array('i', [UNREACHABLE]) * (width * height)
+
+    def distance(self, x, y):
+        """Distance of (x, y) to the closest source, None if unreachable"""
+        distance = self.distances[y * self.width + x]
+        return None if distance == UNREACHABLE else distance
+
+    def next_step(self, x, y):
+        """
+        The adjacent cell to move to from (x, y) to get closer to a source,
+        or None if (x, y) is a source or cannot reach one.
+        """
+        distances, width = self.distances, self.width
+        index = y * width + x
+        best, best_distance = None, distances[index]
+        for neighbour in _neighbours(index, width, len(distances)):
+            if distances[neighbour] < best_distance:
+                best, best_distance = neighbour, distances[neighbour]
+        return None if best is None else (best % width, best // width)
+
+    def path(self, x, y):
+        """The cells to go through from (x, y) to the closest source"""
+        path = []
+        step = self.next_step(x, y)
+        while step is not None:
+            path.append(step)
+            step = self.next_step(*step)
+        return path
+
+
+class Pathfinder:
+    """
+    Paths and distance fields on a Dungeon. The cost of the cells is read
+    once, then kept up to date with the "Door Open", "Door Close" and
+    "Tile Changed" events of the dungeon. With listen=False, the events are
+    not used: the owner calls on_cell_changed itself. Dungeon.pathfinder
+    does it as soon as a cell changes, even when its events are deferred.
+    With cache_size > 0, the distance fields are kept in an LRU cache of
+    that size and updated incrementally. hits, misses and updates count the
+    cache activity.
+    """
+    def __init__(self, dungeon, door_cost=2, cache_size=16, listen=True):
+        self.dungeon = dungeon
+        self.door_cost = door_cost
+        self.cache_size = cache_size
+        self.width, self.height = dungeon.width, dungeon.height
+        self.costs = self._read_costs()
+        self._fields = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self._connections = []
+        if listen:
+            self._connections = [dungeon.bind(event_type, self.on_cells_changed, batch=True)
+                                 for event_type in ("Door Open", "Door Close", "Tile Changed")]
+
+    def _cell_cost(self, tile):
+        "Cost of entering the cell, 0 if impossible"
+        if not tile.blocking:
+            return 1
+        if self.door_cost and tile.value == '+':
+            return self.door_cost
+        return 0
+
+    def _read_costs(self):
+        "The cost of every cell, in a bytearray"
+        grid = self.dungeon._map
+        if hasattr(grid, 'plane'):
+            # CompactGrid or ChunkedGrid: 1 where not blocking, then the doors
+            costs = bytearray(grid.plane('blocking').translate(bytes([1]) + bytes(255)))
+            if self.door_cost:
+                door, glyph = ord('+'), bytes(grid.plane('glyph'))
+                index = glyph.find(door)
+                while index >= 0:
+                    if costs[index] == 0:
+                        costs[index] = self.door_cost
+                    index = glyph.find(door, index + 1)
+            return costs
+        return bytearray(self._cell_cost(tile) for row in self.dungeon for tile in row)
+
+    def cost(self, x, y):
+        """Cost of entering the cell (x, y), 0 if impossible"""
+        return self.costs[y * self.width + x]
+
+    def known_cells(self):
+        """
+        1 for the cells seen by the player, 0 for the others, indexed like
+        costs. The visible plane of a CompactGrid is used directly, the one
+        of a ChunkedGrid is read from its buffer.
+        """
+        grid = self.dungeon._map
+        if hasattr(grid, 'plane'):
+            return grid.plane('visible')
+        return bytes(1 if tile.visible else 0 for row in self.dungeon for tile in row)
+
+    def find_path(self, start, goal, known=None):
+        """
+        A* search from start to goal, (x, y) positions. Return the list of
+        cells to go through, goal included, or None if it cannot be reached.
+        With known (see known_cells), only the known cells are gone through.
+        """
+        width, size, costs = self.width, len(self.costs), self.costs
+        mask = costs if known is None else known
+        goal_x, goal_y = goal
+        start_index, goal_index = start[1] * width + start[0], goal_y * width + goal_x
+        if not costs[goal_index] or not mask[goal_index]:
+            return None
+        came_from = {start_index: None}
+        best = {start_index: 0}
+        todo = [(0, 0, start_index)]
+        while todo:
+            _, distance, index = heapq.heappop(todo)
+            if index == goal_index:
+                break
+            if distance > best[index]:
+                continue # Already reached with a shorter path
+            for neighbour in _neighbours(index, width, size):
+                cost = costs[neighbour]
+                if not cost or not mask[neighbour]:
+                    continue
+                new_distance = distance + cost
+                if new_distance < best.get(neighbour, UNREACHABLE):
+                    best[neighbour] = new_distance
+                    came_from[neighbour] = index
+                    estimate = abs(neighbour % width - goal_x) + abs(neighbour // width - goal_y)
+                    heapq.heappush(todo, (new_distance + estimate, new_distance, neighbour))
+        else:
+            return None
+        return self._path_to(goal_index, came_from)
+
+    def explore_path(self, start, known=None):
+        """
+        Path through the known cells from start to the closest other known
+        cell next to an unknown cell, where the player would see something
+        new.
+        Return None if everything reachable is known.
+        """
+        width, size, costs = self.width, len(self.costs), self.costs
+        if known is None:
+            known = self.known_cells()
+        start_index = start[1] * width + start[0]
+        came_from = {start_index: None}
+        best = {start_index: 0}
+        todo = [(0, start_index)]
+        while todo:
+            distance, index = heapq.heappop(todo)
+            if distance > best[index]:
+                continue
+            neighbours = list(_neighbours(index, width, size))
+            if index != start_index and not all(known[neighbour] for neighbour in neighbours):
+                return self._path_to(index, came_from)
+            for neighbour in neighbours:
+                cost = costs[neighbour]
+                if cost and distance + cost < best.get(neighbour, UNREACHABLE):
+                    best[neighbour] = distance + cost
+                    came_from[neighbour] = index
+                    heapq.heappush(todo, (distance + cost, neighbour))
+        return None
+
+    def _path_to(self, index, came_from):
+        "The cells from the start of a search to index, start excluded"
+        path = []
+        width = self.width
+        while came_from[index] is not None:
+            path.append((index % width, index // width))
+            index = came_from[index]
+        path.reverse()
+        return path
+
+    def distance_field(self, sources):
+        """Return the DistanceField of the (x, y) sources"""
+        key = frozenset(sources)
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            self.hits += 1
+            return field
+        self.misses += 1
+        field = DistanceField(key, self.width, self.height)
+        todo = []
+        for x, y in key:
+            field.distances[y * self.width + x] = 0
+            todo.append((0, y * self.width + x))
+        self._propagate(field, todo)
+        if self.cache_size:
+            self._fields[key] = field
+            if len(self._fields) > self.cache_size:
+                self._fields.popitem(last=False)
+        return field
+
+    def _propagate(self, field, todo):
+        "Dijkstra from the (distance, index) cells of todo, lowering distances"
+        distances, costs = field.distances, self.costs
+        width, size = self.width, len(costs)
+        heapq.heapify(todo)
+        while todo:
+            distance, index = heapq.heappop(todo)
+            if distance > distances[index]:
+                continue
+            for neighbour in _neighbours(index, width, size):
+                cost = costs[neighbour]
+                if cost and distance + cost < distances[neighbour]:
+                    distances[neighbour] = distance + cost
+                    heapq.heappush(todo, (distance + cost, neighbour))
+
+    def on_cells_changed(self, cells):
+        """Update the costs and the cached fields after the (x, y) cells changed"""
+        for x, y in cells:
+            self.on_cell_changed(x, y)
+
+    def on_cell_changed(self, x, y):
+        """Update the cost of the cell (x, y) and the cached fields"""
+        index = y * self.width + x
+        old_cost = self.costs[index]
+        new_cost = self._cell_cost(self.dungeon[x, y])
+        if new_cost == old_cost:
+            return
+        self.costs[index] = new_cost
+        for field in self._fields.values():
+            if new_cost and (not old_cost or new_cost < old_cost):
+                self._lower_cost(field, index)
+            else:
+                self._raise_cost(field, index, old_cost)
+            self.updates += 1
+
+    def _lower_cost(self, field, index):
+        "The cell got cheaper: propagate the distances it can improve"
+        distances = field.distances
+        if distances[index] == 0:
+            return # A source
+        best = min((distances[neighbour] for neighbour in
+                    _neighbours(index, self.width, len(distances))), default=UNREACHABLE)
+        if best + self.costs[index] < distances[index]:
+            distances[index] = best + self.costs[index]
+            self._propagate(field, [(distances[index], index)])
+
+    def _raise_cost(self, field, index, old_cost):
+        """
+        The cell got more expensive or blocked: forget the distances of the
+        cells whose shortest path may go through it, and compute them again
+        from the cells around them.
+        """
+        distances, costs = field.distances, self.costs
+        width, size = self.width, len(costs)
+        if distances[index] == 0 or distances[index] == UNREACHABLE:
+            return
+        # The cells reached from the cell through moves on shortest paths
+        affected = {index}
+        todo = [index]
+        while todo:
+            cell = todo.pop()
+            for neighbour in _neighbours(cell, width, size):
+                if neighbour not in affected and distances[neighbour] and \
+                   distances[neighbour] != UNREACHABLE and \
+                   distances[neighbour] == distances[cell] + costs[neighbour]:
+                    affected.add(neighbour)
+                    todo.append(neighbour)
+        for cell in affected:
+            distances[cell] = UNREACHABLE
+        seeds = []
+        for cell in affected:
+            if not costs[cell]:
+                continue
+            best = min(distances[neighbour] for neighbour in _neighbours(cell, width, size))
+            if best != UNREACHABLE:
+                distances[cell] = best + costs[cell]
+                seeds.append((distances[cell], cell))
+        self._propagate(field, seeds)
+
+
+def main():
+    """Time paths and distance fields on the big map and a generated level"""
+    import timeit
+    from .dungeon import Dungeon
+
+    levels = [('bigmap', Dungeon.load_from_file('map/bigmap.txt', compact=True)),
+              ('500x500', Dungeon.generate(500, 500, 1200, seed=1, compact=True))]
+    for name, level in levels:
+        pathfinder = Pathfinder(level)
+        floor = [index for index, cost in enumerate(pathfinder.costs) if cost == 1]
+        start, goal = floor[0], floor[-1]
+        start, goal = (start % level.width, start // level.width), (goal % level.width, goal // level.width)
+        doors = [(index % level.width, index // level.width)
+                 for index, cost in enumerate(pathfinder.costs) if cost == pathfinder.door_cost]
+        print('{0}: {1} doors'.format(name, len(doors)))
+        number = 10
+        duration = timeit.timeit(lambda: pathfinder.find_path(start, goal), number=number) / number
+        print('  A* {0} -> {1}: {2:.2f} ms'.format(start, goal, duration * 1000))
+        pathfinder.cache_size = 0
+        duration = timeit.timeit(lambda: pathfinder.distance_field([goal]), number=number) / number
+        print('  distance field: {0:.2f} ms'.format(duration * 1000))
+        pathfinder.cache_size = 16
+        pathfinder.distance_field([goal])
+        def toggle():
+            for x, y in doors[:20]:
+                level.open_door(x, y)
+            for x, y in doors[:20]:
+                level.close_door(x, y)
+        duration = timeit.timeit(toggle, number=number) / number / (2 * len(doors[:20]))
+        print('  incremental update per door: {0:.2f} ms'.format(duration * 1000))
+
+if __name__ == '__main__':
+    main()
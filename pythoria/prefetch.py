@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Generation of the next levels in the background.
+
+While a level is played, a LevelPrefetcher generates the following ones in
+worker processes (or threads). A worker returns the binary map of its level
+(see pythoria.random_dungeon.generate_level), the Dungeon is built from it
+when the level is asked for.
+"""
+
+import collections
+import concurrent.futures
+import random
+
+from . import mapformat
+from .dungeon import Dungeon
+from .random_dungeon import generate_level
+
+__all__ = ['LevelPrefetcher']
+
+
+class LevelPrefetcher:
+    """
+    Prepares the next ahead levels of width x height cells with room_amount
+    rooms, in a pool of worker processes, or threads if use_threads.
+    The seed gives the seeds of all the levels: the same seed gives the same
+    levels, prefetched or not.
+    next_level hands over the levels in order. A level not generated yet is
+    waited for if a worker is on it, and generated synchronously otherwise.
+    If a worker process dies, the pool is replaced and the levels it was
+    preparing are generated again.
+    ready and synchronous count the levels handed over in each case.
+    options are passed to the Dungeon constructor.
+    """
+    def __init__(self, width, height, room_amount, seed=None, ahead=2, use_threads=False,
+                 **options):
+        self.width, self.height = width, height
+        self.room_amount = room_amount
+        self.ahead = ahead
+        self.options = options
+        self.random = random.Random(seed)
+        self.ready = 0
+        self.synchronous = 0
+        self._queue = collections.deque() # (seed, future) of the next levels
+        self._executor_class = concurrent.futures.ThreadPoolExecutor if use_threads else \
+                               concurrent.futures.ProcessPoolExecutor
+        self._executor = self._executor_class(ahead) if ahead > 0 else None
+        self.fill()
+
+    def fill(self):
+        """Start the generation of the levels missing in the queue"""
+        while self._executor is not None and len(self._queue) < self.ahead:
+            seed = self.random.getrandbits(32)
+            self._queue.append((seed, self._submit(seed)))
+
+    def _submit(self, seed):
+        "Start the generation of the level of the seed in a worker"
+        return self._executor.submit(generate_level, seed, self.width, self.height,
+                                     self.room_amount)
+
+    def _restart(self):
+        "Replace a broken pool of workers, starting the levels of the queue again"
+        self._executor.shutdown(wait=False)
+        self._executor = self._executor_class(self.ahead)
+        self._queue = collections.deque((seed, self._submit(seed)) for seed, future in self._queue)
+
+    def next_level(self):
+        """Return the Dungeon of the next level"""
+        if self._queue:
+            seed, future = self._queue.popleft()
+        else:
+            seed, future = self.random.getrandbits(32), None
+        data = None
+        if future is not None and not future.cancel():
+            try:
+                data = future.result()
+            except concurrent.futures.process.BrokenProcessPool:
+                self._restart() # A worker died: generate the level here
+            except concurrent.futures.CancelledError:
+                pass
+        if data is None:
+            data = generate_level(seed, self.width, self.height, self.room_amount)
+            self.synchronous += 1
+        else:
+            self.ready += 1
+        self.fill()
+        return Dungeon.from_grid(*mapformat.from_binary(data), **self.options)
+
+    def close(self):
+        """Stop the workers, dropping the levels in preparation"""
+        if self._executor is not None:
+            for seed, future in self._queue:
+                future.cancel()
+            self._queue.clear()
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    """Time level transitions with and without prefetching"""
+    import time
+
+    levels, size, rooms = 5, 300, 600
+    for ahead in (0, 2):
+        with LevelPrefetcher(size, size, rooms, seed=1, ahead=ahead, compact=True) as prefetcher:
+            waits = []
+            for level in range(levels):
+                start = time.perf_counter()
+                prefetcher.next_level()
+                waits.append(time.perf_counter() - start)
+                time.sleep(1.0) # Playing the level
+        print('ahead={0}: transitions {1} ms'.format(
+              ahead, ', '.join('{0:.0f}'.format(wait * 1000) for wait in waits)))
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,21 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import random, operator
-from . import tile
+import random, heapq
+import concurrent.futures
+import functools
+import os
+from . import tile, mapformat
+from .storage import CompactGrid
+from .textview import TextView
 
-#random.seed(14)
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Cell types of the compact generation path: the glyphs of the tiles
+WALL, FLOOR, DOOR = ord('#'), ord(' '), ord('+')
 
 class Room:
     """
@@ -15,8 +26,9 @@ class Room:
         self.y = y
         self.width = width
         self.height = height
-        self.cx = x + width // 2
-        self.cy = y + height // 2
+    
+    cx = property(lambda self: self.x + self.width // 2, doc="Column of the room centre")
+    cy = property(lambda self: self.y + self.height // 2, doc="Row of the room centre")
     
     def collide(self, other):
         return not(self.x > other.x + other.width or other.x > self.x + self.width or \
@@ -25,6 +37,63 @@ class Room:
     def __repr__(self):
         return "<Room {0} {1} {2} {3}>".format(self.x, self.y, self.width, self.height)
 
+class RoomIndex:
+    """
+    Uniform grid of square cells of cell_size, each cell listing the rooms
+    overlapping it. As collide considers the border of a room as part of it,
+    a room covers the cells from (x, y) to (x + width, y + height) included.
+    Rooms must be updated in the index after they move.
+    """
+    def __init__(self, cell_size=8):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._room_cells = {}
+    
+    def _cells_of(self, x0, y0, x1, y1):
+        "Return the keys of the cells covering the box, bounds included"
+        size = self.cell_size
+        return [(cx, cy) for cx in range(x0 // size, x1 // size + 1)
+                         for cy in range(y0 // size, y1 // size + 1)]
+    
+    def add(self, room):
+        "Add the room to the index"
+        keys = self._cells_of(room.x, room.y, room.x + room.width, room.y + room.height)
+        for key in keys:
+            self._cells.setdefault(key, []).append(room)
+        self._room_cells[room] = keys
+    
+    def remove(self, room):
+        "Remove the room from the index"
+        for key in self._room_cells.pop(room):
+            rooms = self._cells[key]
+            rooms.remove(room)
+            if not rooms:
+                del self._cells[key]
+    
+    def update(self, room):
+        "Update the cells of a room which moved"
+        self.remove(room)
+        self.add(room)
+    
+    def __len__(self):
+        return len(self._room_cells)
+    
+    def __contains__(self, room):
+        return room in self._room_cells
+    
+    def query(self, x0, y0, x1, y1):
+        "Return the set of rooms possibly overlapping the box, bounds included"
+        found = set()
+        for key in self._cells_of(x0, y0, x1, y1):
+            found.update(self._cells.get(key, ()))
+        return found
+    
+    def colliding(self, room):
+        "Return the rooms of the index colliding with the room, except itself"
+        return [other for other in self.query(room.x, room.y, room.x + room.width,
+                                              room.y + room.height)
+                if other is not room and other.collide(room)]
+
 class Corridor:
     """
     This defines a corridor between 2 rooms.
@@ -48,6 +117,72 @@ class Corridor:
     def __repr__(self):
         return "({0}--{1})".format(self.room_one, self.room_two)
     
+def nearest_neighbours(points, k):
+    """
+    For each point, find the k closest other points (less if there are not
+    enough points). Points are put in buckets of a uniform grid holding about
+    one point each, and the buckets are searched in growing rings around each
+    point. Return a list of (squared distance, i, j) with i < j.
+    """
+    if len(points) < 2:
+        return []
+    min_x, min_y = min(x for x, y in points), min(y for x, y in points)
+    max_x, max_y = max(x for x, y in points), max(y for x, y in points)
+    size = max(1, int(((max_x - min_x + 1) * (max_y - min_y + 1) / len(points)) ** 0.5))
+    buckets = {}
+    for idx, (x, y) in enumerate(points):
+        buckets.setdefault(((x - min_x) // size, (y - min_y) // size), []).append(idx)
+    max_ring = max(max_x - min_x, max_y - min_y) // size + 1
+    
+    edges = set()
+    for idx, (x, y) in enumerate(points):
+        bx, by = (x - min_x) // size, (y - min_y) // size
+        found = []
+        for ring in range(max_ring + 1):
+            # Points further than the ring cannot be closer than ring * size
+            if len(found) >= k and found[k - 1][0] <= (ring - 1) ** 2 * size ** 2:
+                break
+            for cell in _ring_cells(bx, by, ring):
+                for other in buckets.get(cell, ()):
+                    if other != idx:
+                        other_x, other_y = points[other]
+                        found.append(((x - other_x)**2 + (y - other_y)**2, other))
+            found.sort()
+        for dist, other in found[:k]:
+            edges.add((dist, min(idx, other), max(idx, other)))
+    return sorted(edges)
+
+def _ring_cells(x, y, ring):
+    "The cells of the square ring at distance ring of the cell (x, y)"
+    if ring == 0:
+        return [(x, y)]
+    cells = [(x + i, y - ring) for i in range(-ring, ring + 1)]
+    cells += [(x + i, y + ring) for i in range(-ring, ring + 1)]
+    cells += [(x - ring, y + j) for j in range(-ring + 1, ring)]
+    cells += [(x + ring, y + j) for j in range(-ring + 1, ring)]
+    return cells
+
+def spanning_tree(count, edges):
+    """
+    Kruskal algorithm: return the edges (dist, i, j), sorted by distance,
+    of a minimum spanning forest of the count points, and the other edges.
+    """
+    parent = list(range(count))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    tree, others = [], []
+    for edge in sorted(edges):
+        root_i, root_j = find(edge[1]), find(edge[2])
+        if root_i == root_j:
+            others.append(edge)
+        else:
+            parent[root_i] = root_j
+            tree.append(edge)
+    return tree, others
+
 class DungeonGenerator:
     """
     Helper class which generates a random dungeon
@@ -56,7 +191,9 @@ class DungeonGenerator:
     - Place rooms_amount numbers of rooms randomly. For the moment the width and height
       are constrained between 3 and 7. For each room created, try to move apart the
       existing room for better use of available space.
-    - Construct Corridors connecting rooms close to each other.
+    - Construct Corridors connecting rooms close to each other: the minimum
+      spanning tree of the graph linking each room to its neighbours closest
+      rooms, plus loop_ratio * number of rooms other edges of this graph.
     - Iterate over each pair of rooms for each Corridor.
       Take a random spot in each pair of rooms and find the start and end of corridor.
       Draw the corridor by moving first horizontally and then vertically.
@@ -64,24 +201,70 @@ class DungeonGenerator:
       place a door. If it's next to another door, then erase this door and place a wall instead.
     - Check for lonely doors. Some doors are surrounded by 3 empty spaces. Erase
       those doors.
+    
+    Random numbers come from the random attribute, a random.Random created
+    with the given seed: the same seed generates the same dungeon.
+    
+    generate_cells is a faster path giving the same dungeon as
+    generate_dungeon: the map is a bytearray of cell types (WALL, FLOOR,
+    DOOR) carved with slices, and the Tiles are only built at the end by
+    to_compact_grid or to_tiles.
     """
+    def __init__(self, loop_ratio=0.0, neighbours=6, seed=None):
+        self.loop_ratio = loop_ratio
+        self.neighbours = neighbours
+        self.random = random.Random(seed)
+    
     def generate_dungeon(self, max_width, max_height, rooms_amount):
         "Generate the dungeon map."
-        self.dungeon = [[tile.Tile('#', block_light=True, blocking=True) for _ in range(max_width)] for _ in range(max_height)]
+        self.reset(max_width, max_height)
+        self.create_rooms(rooms_amount)
+        self.create_corridors()
+        self.check_for_lonely_doors()
+    
+    def generate_cells(self, max_width, max_height, rooms_amount):
+        "Generate the dungeon in the cells bytearray."
+        self.reset(max_width, max_height, tiles=False)
+        self.place_rooms(rooms_amount)
+        for room in self.rooms:
+            for y in range(room.y, room.y + room.height):
+                start = y * max_width + room.x
+                self.cells[start:start + room.width] = bytes([FLOOR]) * room.width
+        self.carve_corridors()
+        self.remove_lonely_doors()
+    
+    def reset(self, max_width, max_height, tiles=True):
+        """
+        Start a new dungeon full of walls, without rooms: a list of rows of
+        Tiles in dungeon, or a bytearray of cell types in cells.
+        """
+        if tiles:
+            self.dungeon = [[tile.Tile('#', block_light=True, blocking=True) for _ in range(max_width)] for _ in range(max_height)]
+            self.cells = None
+        else:
+            self.dungeon = None
+            self.cells = bytearray([WALL]) * (max_width * max_height)
         self.rooms = []
+        self.room_index = RoomIndex()
+        self._room_order = {} # Room -> index in self.rooms
+        self._restless = set() # Indices of the rooms which may move apart
         self.corridors = set()
         self.max_width = max_width
         self.max_height = max_height
-
-        self.create_rooms(rooms_amount)
-        self.create_corridors()
-        self.check_for_lonely_doors()
+    
+    def to_compact_grid(self):
+        "Return the generated cells in a CompactGrid"
+        return mapformat.from_glyphs(bytes(self.cells), self.max_width, self.max_height)
+    
+    def to_tiles(self):
+        "Return the generated cells in a TileGrid, one Tile per cell"
+        return mapformat.to_tiles(self.to_compact_grid())
     
     def place_player(self):
         "Find an empty spot in a room for the player starting position."
-        room = random.choice(self.rooms)
-        x = random.randint(room.x, room.x + room.width -1)
-        y = random.randint(room.y, room.y + room.height -1)
+        room = self.random.choice(self.rooms)
+        x = self.random.randint(room.x, room.x + room.width -1)
+        y = self.random.randint(room.y, room.y + room.height -1)
         return x, y
 
     def show_map(self):
@@ -89,11 +272,18 @@ class DungeonGenerator:
         Prints in the console the map using the usual symbols.
         Surrounds the map with row and col indices
         """
+        from .dungeon import Dungeon
+        if self.dungeon is None:
+            grid = self.to_compact_grid()
+        else:
+            grid = CompactGrid.from_tiles(self.dungeon)
+        level = Dungeon.from_grid(grid, compact=True)
+        view = TextView(level, self.max_width, self.max_height, show_hidden=True)
+        view.draw()
         print('   ', end='')
         print(''.join('{0:^3}'.format(i) for i in range(self.max_width)))
-        for i, line in enumerate(self.dungeon):
-            print('{0:^3}'.format(i), end='')
-            print(''.join('{0:^3}'.format(_tile.value) for _tile in line))
+        for i, row in enumerate(view.rows()):
+            print('{0:^3} {1} '.format(i, '  '.join(row)))
             
     def create_rooms(self, rooms_amount):
         """
@@ -101,46 +291,58 @@ class DungeonGenerator:
         After 1000 unsuccesful attempts to place a room, raises a RunTimeError => no more space.
         After each room creation, moves all rooms apart from the dungeon center.
         """
+        self.place_rooms(rooms_amount)
+        
+        # Fill empty tile where the rooms are
+        for room in self.rooms:
+            for line in self.dungeon[room.y:room.y + room.height]:
+                room_tile = tile.Tile()
+                line[room.x:room.x + room.width] = [room_tile for _ in range(room.width)]
+    
+    def place_rooms(self, rooms_amount):
+        "Place the rooms of create_rooms, without carving them."
         min_room_size, max_room_size = 3, 7
         for _ in range(rooms_amount):
             counter = 0
             while True:
-                width, height = random.randint(min_room_size, max_room_size), random.randint(min_room_size, max_room_size)
-                x, y = random.randint(1, self.max_width - width - 1), random.randint(1, self.max_height - height - 1)
+                width, height = self.random.randint(min_room_size, max_room_size), self.random.randint(min_room_size, max_room_size)
+                x, y = self.random.randint(1, self.max_width - width - 1), self.random.randint(1, self.max_height - height - 1)
                 room = Room(x, y, width, height)
                 if not self.room_collides_with_others(room):
                     break
                 counter += 1
                 if counter > 1000:
                     raise RuntimeError("Trying to place a random room but failed to find an empty space after {0} attempts".format(counter))
+            self._room_order[room] = len(self.rooms)
+            self._restless.add(len(self.rooms))
             self.rooms.append(room)
+            self.room_index.add(room)
             self.move_rooms_apart()
         
         self.move_rooms_apart()
-        
-        # Fill empty tile where the rooms are
-        for room in self.rooms:
-            for line in self.dungeon[room.y:room.y + room.height]:
-                room_tile = tile.Tile()
-                line[room.x:room.x + room.width] = [room_tile for _ in range(room.width)]
 
     def room_collides_with_others(self, room):
         "Check if room collides with the other existing rooms"
-        for other_room in self.rooms:
-            if other_room is room:
-                continue
-            if other_room.collide(room):
-                return True
-        return False
+        return bool(self.room_index.colliding(room))
     
     def move_rooms_apart(self):
         """
         Tries to move the room away from dungeon center according to 4 quadrants.
         If room collides with another room, move back to initial position.
+        
+        A room which could not move stays in place until a room next to it
+        moves away, so only these rooms and the ones which moved last time are
+        tried, in the order of self.rooms: the result is the same as trying
+        every room.
         """
         cx = self.max_width // 2
         cy = self.max_height // 2
-        for room in self.rooms:
+        pending = sorted(self._restless)
+        queued = set(pending)
+        self._restless = set()
+        while pending:
+            idx = heapq.heappop(pending)
+            room = self.rooms[idx]
             if room.x - cx <= 0 and room.y - cy <= 0:
                 offset_x = -1
                 offset_y = -1
@@ -154,29 +356,32 @@ class DungeonGenerator:
                 offset_x = 1
                 offset_y = 1
                 
+            old_x, old_y = room.x, room.y
             room.x += offset_x
             room.y += offset_y
             self.constrain_room_in_dungeon(room)
+            if (room.x, room.y) == (old_x, old_y):
+                continue
             if self.room_collides_with_others(room):
-                room.x -= offset_x
-                room.y -= offset_y
+                room.x, room.y = old_x, old_y
+                continue
+            self.room_index.update(room)
+            self._restless.add(idx)
+            # Wake up the rooms which may have been blocked by this one
+            for other_room in self.room_index.query(old_x - 1, old_y - 1,
+                                                    old_x + room.width + 1, old_y + room.height + 1):
+                other_idx = self._room_order[other_room]
+                if other_idx > idx and other_idx not in queued:
+                    heapq.heappush(pending, other_idx)
+                    queued.add(other_idx)
+                elif other_idx < idx:
+                    self._restless.add(other_idx)
         
     def constrain_room_in_dungeon(self, room):
         "Adjust room position to stay 1 square within the dungeon."
         room.x = min(max(room.x, 1), self.max_width - room.width - 1)
         room.y = min(max(room.y, 1), self.max_height - room.height - 1)
     
-    def find_closest(self, room, rooms):
-        "Find the closest room from the iterable rooms."
-        dist_list = []
-        for other_room in rooms:
-            if other_room is room:
-                continue
-            dist = (room.cx - other_room.cx)**2 + (room.cy - other_room.cy)**2
-            dist_list.append( (dist, other_room) )
-        
-        return min(dist_list, key = operator.itemgetter(0))[1]
-    
     def has_two_opposite_adjacent_walls(self, x, y):
         "Check if the position (x, y) has 2 adjacent opposite walls."
         WALL = tile.Tile('#', True, True)
@@ -233,37 +438,149 @@ class DungeonGenerator:
 
         return squares[start:end]
         
-    def create_corridors(self):
-        visited = set()
-        not_visited = set(self.rooms)
-        room = not_visited.pop()
-        while not_visited:
-            other_room = self.find_closest(room, not_visited)
-            self.corridors.add(Corridor(room, other_room))
-            not_visited.remove(other_room)
-            room = other_room
+    def connect_rooms(self):
+        """
+        Return the pairs of rooms to connect with a corridor, so that all
+        the rooms are connected, in O(n log n).
+        """
+        centres = [(room.cx, room.cy) for room in self.rooms]
+        k = self.neighbours
+        tree, others = spanning_tree(len(centres), nearest_neighbours(centres, k))
+        while len(tree) < len(centres) - 1:
+            # Groups of rooms far from each other: look further
+            k *= 2
+            tree, others = spanning_tree(len(centres), nearest_neighbours(centres, k))
+        loops = min(len(others), int(self.loop_ratio * len(centres)))
+        edges = tree + self.random.sample(others, loops)
+        return [(self.rooms[i], self.rooms[j]) for dist, i, j in edges]
+    
+    def corridor_endpoints(self):
+        """
+        Yield the (x_from, y_from, x_to, y_to) ends of the corridors to carve
+        between the rooms of connect_rooms, adding them to self.corridors.
+        Each end is a random cell of its room.
+        """
+        corridors = [] # Carved in a reproducible order, unlike the set
+        for room, other_room in self.connect_rooms():
+            corridor = Corridor(room, other_room)
+            if corridor not in self.corridors:
+                self.corridors.add(corridor)
+                corridors.append(corridor)
         
-        for corridor in self.corridors:
+        for corridor in corridors:
             room = corridor.room_one
             other_room = corridor.room_two
-            x_from = random.randint(room.x, room.x + room.width -1)
-            y_from = random.randint(room.y, room.y + room.height -1)
-            x_to = random.randint(other_room.x, other_room.x + other_room.width -1)
-            y_to = random.randint(other_room.y, other_room.y + other_room.height -1)
-
+            x_from = self.random.randint(room.x, room.x + room.width -1)
+            y_from = self.random.randint(room.y, room.y + room.height -1)
+            x_to = self.random.randint(other_room.x, other_room.x + other_room.width -1)
+            y_to = self.random.randint(other_room.y, other_room.y + other_room.height -1)
+            yield x_from, y_from, x_to, y_to
+    
+    def create_corridors(self):
+        for x_from, y_from, x_to, y_to in self.corridor_endpoints():
             corridor_squares = self.find_corridor(x_from, y_from, x_to, y_to)
         
             # Place empty tiles for the corridor
             for x, y in corridor_squares:
                 self.dungeon[y][x] = tile.Tile()
             
-            # Consider placing doors
-            for x, y in (corridor_squares[0], corridor_squares[-1]):
+            # Consider placing doors. A corridor of 2 squares must not wall
+            # its end next to the door just placed on its other end.
+            ends = (corridor_squares[0], corridor_squares[-1])
+            short = len(corridor_squares) == 2
+            for x, y in ends:
                 if self.has_two_opposite_adjacent_walls(x, y):
                     self.dungeon[y][x] = tile.Door()
-                elif self.has_one_wall_and_one_door_opposite(x, y):
+                elif not short and self.has_one_wall_and_one_door_opposite(x, y):
                     self.dungeon[y][x] = tile.Tile('#', True, True)
 
+    def carve_corridors(self):
+        "create_corridors on the cells bytearray"
+        for x_from, y_from, x_to, y_to in self.corridor_endpoints():
+            ends = self.carve_corridor(x_from, y_from, x_to, y_to)
+            short = len(ends) == 2 and abs(ends[0] - ends[1]) in (1, self.max_width)
+            for index in ends:
+                self.place_door(index, wall=not short)
+    
+    def carve_corridor(self, x_from, y_from, x_to, y_to):
+        """
+        Carve the corridor of find_corridor: the squares moving horizontally
+        from (x_from, y_from) to x_to, then vertically to y_to, between the
+        first and the last wall. Return the cell indices of both ends.
+        """
+        cells, width = self.cells, self.max_width
+        step_x = 1 if x_to >= x_from else -1
+        step_y = 1 if y_to >= y_from else -1
+        # The path as two slices of cells: along the row, then along the column
+        row = y_from * width
+        slices = [slice(row + x_from + step_x, row + x_to + step_x, step_x),
+                  slice((y_from + step_y) * width + x_to, (y_to + step_y) * width + x_to,
+                        step_y * width)]
+        indices = [range(*part.indices(len(cells))) for part in slices]
+        path = cells[slices[0]] + cells[slices[1]]
+        start, end = path.find(WALL), path.rfind(WALL)
+        if start < 0: # In case no walls encountered
+            start, end = 0, len(path) - 1
+        if end < start:
+            return []
+        offset = 0
+        for part, part_indices in zip(slices, indices):
+            low, high = max(start - offset, 0), min(end - offset, len(part_indices) - 1)
+            if low <= high:
+                carved = part_indices[low:high + 1]
+                cells[carved.start:carved.stop:carved.step] = bytes([FLOOR]) * len(carved)
+            offset += len(part_indices)
+        all_indices = list(indices[0]) + list(indices[1])
+        return [all_indices[start], all_indices[end]]
+    
+    def place_door(self, index, wall=True):
+        """
+        At the end of a corridor, place a door between two opposite walls,
+        or, if wall, a wall between an opposite wall and door.
+        """
+        cells, width = self.cells, self.max_width
+        west, east, north, south = cells[index - 1], cells[index + 1], \
+                                   cells[index - width], cells[index + width]
+        if (west == WALL and east == WALL) or (north == WALL and south == WALL):
+            cells[index] = DOOR
+        elif wall and ((west in (WALL, DOOR) and east in (WALL, DOOR) and west != east) or \
+                     (north in (WALL, DOOR) and south in (WALL, DOOR) and north != south)):
+            cells[index] = WALL
+    
+    def remove_lonely_doors(self):
+        """
+        check_for_lonely_doors on the cells bytearray, for all the doors at
+        once. Going through the doors in order, a door before another door
+        is always removed, so a door is removed if the door after it on its
+        row or column exists, or if more than 2 of its neighbours are empty
+        or doors before it.
+        """
+        width, height = self.max_width, self.max_height
+        if numpy is not None:
+            cells = numpy.frombuffer(self.cells, dtype=numpy.uint8).reshape(height, width)
+            padded = numpy.pad(cells, 1, constant_values=WALL)
+            door, floor = padded == DOOR, padded == FLOOR
+            before = floor | door
+            centre = (slice(1, -1), slice(1, -1))
+            removed = door[centre] & (door[1:-1, 2:] | door[2:, 1:-1] |
+                                      (before[1:-1, :-2].astype(numpy.uint8) + before[:-2, 1:-1] +
+                                       floor[2:, 1:-1] + floor[1:-1, 2:] > 2))
+            cells[removed] = FLOOR
+            return
+        cells = self.cells
+        removed = []
+        index = cells.find(DOOR)
+        while index >= 0:
+            neighbours = (cells[index - 1], cells[index - width],
+                          cells[index + width], cells[index + 1])
+            if neighbours[2] == DOOR or neighbours[3] == DOOR or \
+               sum(cell in (FLOOR, DOOR) for cell in neighbours[:2]) + \
+               sum(cell == FLOOR for cell in neighbours[2:]) > 2:
+                removed.append(index)
+            index = cells.find(DOOR, index + 1)
+        for index in removed:
+            cells[index] = FLOOR
+    
     def check_for_lonely_doors(self):
         EMPTY_SPACE = tile.Tile()
         DOOR = tile.Door()
@@ -283,7 +600,62 @@ class DungeonGenerator:
                         self.dungeon[y][x] = tile.Tile()
                         
 
+def generate_level(seed, max_width, max_height, rooms_amount, **options):
+    """
+    Generate a dungeon and return it as a binary map with the player start
+    position (see pythoria.mapformat.from_binary).
+    options are passed to the DungeonGenerator.
+    """
+    dg = DungeonGenerator(seed=seed, **options)
+    dg.generate_cells(max_width, max_height, rooms_amount)
+    player_pos = dg.place_player()
+    return mapformat.to_binary(dg.to_compact_grid(), player_pos)
+
+def generate_levels(seeds, max_width, max_height, rooms_amount, workers=None, **options):
+    """
+    Generate a dungeon for each seed in a pool of workers processes (by
+    default one per CPU). Return the list of their binary maps, in the order
+    of the seeds. A level only depends on its seed, not on the workers.
+    With workers=1, the levels are generated in this process.
+    options are passed to the DungeonGenerator.
+    """
+    seeds = list(seeds)
+    task = functools.partial(generate_level, max_width=max_width, max_height=max_height,
+                             rooms_amount=rooms_amount, **options)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(seeds) < 2:
+        return [task(seed) for seed in seeds]
+    chunksize = max(1, len(seeds) // (4 * workers))
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(task, seeds, chunksize=chunksize))
+
+def benchmark(rooms_amounts=(1000, 2000, 5000, 10000)):
+    "Time the placement and connection of many rooms, with about 100 cells per room"
+    import time
+    for rooms_amount in rooms_amounts:
+        side = int((rooms_amount * 100) ** 0.5)
+        dg = DungeonGenerator()
+        dg.reset(side, side)
+        start = time.perf_counter()
+        dg.create_rooms(rooms_amount)
+        middle = time.perf_counter()
+        dg.create_corridors()
+        print('{0:>6} rooms in {1}x{1}: rooms {2:.2f} s, corridors {3:.2f} s'.format(
+              rooms_amount, side, middle - start, time.perf_counter() - middle))
+
 def main():
+    import sys
+    import time
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+        return
+    if sys.argv[1:] == ['batch']:
+        for workers in (1, None):
+            start = time.perf_counter()
+            levels = generate_levels(range(200), 80, 50, 25, workers)
+            print('200 levels, {0} workers: {1:.2f} s'.format(
+                  workers or os.cpu_count(), time.perf_counter() - start))
+        return
     dg = DungeonGenerator()
     dg.generate_dungeon(35, 40, 10)
     dg.show_map()
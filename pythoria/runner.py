@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+asyncio game loop, an alternative to main.run.
+
+Three tasks share the Controller:
+    input       polls the pygame events and passes them to the controller
+    simulation  calls Controller.update at a fixed rate (tick_rate per
+                second), catching up after a late tick, but never more than
+                max_catch_up ticks in a row
+    render      draws the dirty views at most fps times per second; frames
+                which cannot be drawn in time are dropped, not queued
+When the controller is idle and nothing runs in the background, the input
+task waits for the next event, at most idle_timeout seconds, like main.run.
+Other coroutines (autosave, prefetch of the next level...) are run next to
+them with schedule, or call_every; blocking work is sent to a thread with
+offload, so the input is never stalled.
+"""
+
+import asyncio
+
+import pygame
+from pygame.locals import QUIT, NOEVENT
+
+__all__ = ['AsyncRunner']
+
+
+class AsyncRunner:
+    """
+    Runs the controller until the window is closed or stop is called, or
+    until the controller raises an exception, which is raised again by run.
+    poll returns the pending events, wait(timeout) waits for the next ones
+    and present shows the drawn views; they default to pygame.event.get,
+    pygame.event.wait and win.blittowindow. clock defaults to the time of
+    the asyncio event loop.
+    ticks, frames and dropped_frames count what was done.
+    """
+    def __init__(self, controller, win=None, tick_rate=30, fps=30, max_catch_up=5,
+                 input_interval=0.01, idle_timeout=1.0, poll=None, wait=None, present=None,
+                 clock=None):
+        self.controller = controller
+        self.tick_rate = tick_rate
+        self.fps = fps
+        self.max_catch_up = max_catch_up
+        self.input_interval = input_interval
+        self.idle_timeout = idle_timeout
+        self.poll = poll or pygame.event.get
+        self.wait = wait or (lambda timeout: [pygame.event.wait(int(timeout * 1000))])
+        # win.blittowindow is looked up at each frame, to call the profiler wrapper
+        self.present = present or (lambda: win.blittowindow())
+        self.clock = clock
+        self.running = False
+        self.ticks = 0
+        self.frames = 0
+        self.dropped_frames = 0
+        self._stopped = None
+        self._background = set()
+        self._waiting = [] # Coroutines scheduled before the loop started
+
+    def run(self):
+        """Run the game loop, blocking until it stops"""
+        asyncio.run(self.main())
+
+    async def main(self):
+        """The game loop, as a coroutine"""
+        self.running = True
+        if self.clock is None:
+            self.clock = asyncio.get_running_loop().time
+        self._stopped = asyncio.Event()
+        tasks = [asyncio.ensure_future(coroutine)
+                 for coroutine in (self._input(), self._simulate(), self._render())]
+        waiting, self._waiting = self._waiting, []
+        for coroutine in waiting:
+            self.schedule(coroutine)
+        stopped = asyncio.ensure_future(self._stopped.wait())
+        try:
+            done, pending = await asyncio.wait(tasks + [stopped],
+                                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.running = False
+            for task in tasks + [stopped] + list(self._background):
+                task.cancel()
+            await asyncio.gather(*tasks, stopped, *self._background, return_exceptions=True)
+            self.controller.msgbox.flush()
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                raise task.exception() # The game loop died with this task
+
+    def stop(self):
+        """Stop the game loop"""
+        self.running = False
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def schedule(self, coroutine):
+        """
+        Run a coroutine in the background of the game loop. It is cancelled
+        when the loop stops. Return its task, or None if the loop is not
+        running yet: the coroutine then starts with the loop.
+        """
+        if not self.running:
+            self._waiting.append(coroutine)
+            return None
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+        return task
+
+    def call_every(self, interval, function, *args, in_thread=False):
+        """
+        Call function(*args) every interval seconds in the background, in a
+        worker thread if in_thread. Return the task, like schedule.
+        """
+        async def repeat():
+            while True:
+                await asyncio.sleep(interval)
+                if in_thread:
+                    await self.offload(function, *args)
+                else:
+                    function(*args)
+        return self.schedule(repeat())
+
+    async def offload(self, function, *args):
+        """Run a blocking function(*args) in a worker thread, and return its result"""
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    def _background_done(self, task):
+        "Forget a finished background task, reporting its error"
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.controller.msgbox.add("Erreur en tâche de fond : {0}".format(task.exception()))
+
+    async def _input(self):
+        "Pass the pygame events to the controller"
+        while self.running:
+            events = self.poll()
+            if not events and self.controller.idle and not self._background:
+                events = self.wait(self.idle_timeout)
+            for event in events:
+                if event.type == QUIT:
+                    self.stop()
+                    return
+                elif event.type != NOEVENT:
+                    self.controller.process_event(event)
+            await asyncio.sleep(self.input_interval)
+
+    async def _simulate(self):
+        "Advance the game by fixed ticks"
+        step = 1 / self.tick_rate
+        next_tick = self.clock()
+        while self.running:
+            late_ticks = 0
+            while self.clock() >= next_tick and late_ticks < self.max_catch_up:
+                self.controller.update()
+                self.ticks += 1
+                next_tick += step
+                late_ticks += 1
+            if late_ticks == self.max_catch_up:
+                next_tick = max(next_tick, self.clock()) # Give up the late ticks
+            await asyncio.sleep(max(0, next_tick - self.clock()))
+
+    async def _render(self):
+        "Draw the dirty views, dropping the frames drawn too late"
+        interval = 1 / self.fps
+        next_frame = self.clock()
+        while self.running:
+            drawn = self.controller.view.draw()
+            if drawn:
+                self.present()
+                self.frames += 1
+            next_frame += interval
+            now = self.clock()
+            if now > next_frame:
+                late = int((now - next_frame) / interval) + 1
+                if drawn:
+                    self.dropped_frames += late # Not when late for having been idle
+                next_frame += late * interval
+            await asyncio.sleep(max(0, next_frame - now))
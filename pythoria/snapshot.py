@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Save and restore a game in progress: the map planes (glyphs, so door states,
+and visibility), the player position and field of vision.
+
+A snapshot file is a header followed by a payload, zlib compressed if the
+COMPRESSED flag is set.
+    magic       4 bytes   b'PSAV'
+    version     uint16
+    kind        uint8     FULL or DELTA
+    flags       uint8
+    width       uint32
+    height      uint32
+    revision    uint64    Dungeon.revision
+    player x    int32     -1 without player
+    player y    int32
+    fov         uint32    number of cells in the player field of vision
+    spans       uint32    number of changed spans (DELTA only)
+    base        uint32    crc32 of the planes of the full snapshot
+The payload of a FULL snapshot holds the CompactGrid planes. The payload of
+a DELTA snapshot holds the (index, length) of the spans of cells changed since
+the full snapshot, then the content of these spans for each plane. Both end
+with the cell indices of the player field of vision (uint32).
+
+Monsters and loot are not saved.
+"""
+
+import array
+import struct
+import sys
+import zlib
+
+from .dungeon import Dungeon
+from .player import Player
+from .storage import CompactGrid
+
+__all__ = ['Snapshotter', 'save', 'load', 'FULL', 'DELTA']
+
+MAGIC = b'PSAV'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBIIQiiIII')
+FULL, DELTA = 0, 1
+COMPRESSED = 1
+
+
+def _grid_of(dungeon):
+    "Return the map of the dungeon as a CompactGrid"
+    if isinstance(dungeon._map, CompactGrid):
+        return dungeon._map
+    return CompactGrid.from_tiles(dungeon._map)
+
+def _uint32_array(values):
+    "array of uint32, little endian"
+    values = array.array('I', values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def _player_header(dungeon):
+    "Return the player position and the indices of its field of vision"
+    player = dungeon.player
+    if player is None:
+        return -1, -1, _uint32_array(())
+    fov = getattr(player, 'fov', ())
+    return player.x, player.y, _uint32_array(y * dungeon.width + x for x, y in fov)
+
+
+class Snapshotter:
+    """
+    Writes the snapshots of a dungeon. The planes of the last full snapshot
+    are kept so the following delta snapshots only store the changed cells.
+    """
+    def __init__(self, dungeon):
+        self.dungeon = dungeon
+        self._base = None
+        self._base_id = 0
+
+    def save(self, filename, delta=False, compress=False):
+        """
+        Write a snapshot of the dungeon. A delta snapshot needs a previous
+        full snapshot. Return the kind of snapshot written.
+        """
+        if delta and self._base is None:
+            raise ValueError("A delta snapshot needs a full snapshot first")
+        grid = _grid_of(self.dungeon)
+        if delta:
+            spans, chunks = self._diff(grid)
+            payload = [_uint32_array(value for span in spans for value in span)] + chunks
+            kind, base_id = DELTA, self._base_id
+        else:
+            self._base = [bytes(getattr(grid, name)) for name in grid.PLANES]
+            self._base_id = zlib.crc32(b''.join(self._base))
+            payload, spans = list(self._base), ()
+            kind, base_id = FULL, self._base_id
+        player_x, player_y, fov = _player_header(self.dungeon)
+        payload = b''.join(payload) + fov.tobytes()
+        if compress:
+            payload = zlib.compress(payload, 1)
+        header = HEADER.pack(MAGIC, VERSION, kind, COMPRESSED if compress else 0,
+                             grid.width, grid.height, self.dungeon.revision,
+                             player_x, player_y, len(fov), len(spans), base_id)
+        with open(filename, 'wb') as f:
+            f.write(header)
+            f.write(payload)
+        return kind
+
+    def _diff(self, grid):
+        """
+        Return the spans (index, length) of cells different from the base,
+        and the content of the spans for each plane.
+        Rows are compared as a whole, only the changed ones are scanned.
+        """
+        planes = [getattr(grid, name) for name in grid.PLANES]
+        width = grid.width
+        spans = []
+        for row in range(0, width * grid.height, width):
+            end = row + width
+            changed = [(plane, base) for plane, base in zip(planes, self._base)
+                       if plane[row:end] != base[row:end]]
+            if not changed:
+                continue
+            left = min(next(x for x in range(row, end) if plane[x] != base[x])
+                       for plane, base in changed)
+            right = max(next(x for x in range(end - 1, row - 1, -1) if plane[x] != base[x])
+                        for plane, base in changed)
+            spans.append((left, right + 1 - left))
+        chunks = [b''.join(plane[index:index + length] for index, length in spans)
+                  for plane in planes]
+        return spans, chunks
+
+
+def save(dungeon, filename, compress=False):
+    """Write a full snapshot of the dungeon"""
+    Snapshotter(dungeon).save(filename, compress=compress)
+
+
+def _read(filename):
+    "Return the header fields and the uncompressed payload of a snapshot"
+    with open(filename, 'rb') as f:
+        header = f.read(HEADER.size)
+        payload = f.read()
+    if len(header) < HEADER.size or header[:4] != MAGIC:
+        raise ValueError("{0} is not a snapshot".format(filename))
+    fields = HEADER.unpack(header)
+    if fields[1] > VERSION:
+        raise ValueError("Snapshot version {0} is not supported".format(fields[1]))
+    if fields[3] & COMPRESSED:
+        payload = zlib.decompress(payload)
+    return fields, bytearray(payload)
+
+
+def load(filename, base=None, **options):
+    """
+    Restore the Dungeon and its Player saved in a snapshot.
+    A delta snapshot is applied on the full snapshot given in base.
+    options are passed to the Dungeon constructor.
+    """
+    fields, payload = _read(filename)
+    kind, width, height = fields[2], fields[4], fields[5]
+    revision, player_x, player_y, fov_count, span_count, base_id = fields[6:]
+    size = width * height
+    if kind == DELTA:
+        if base is None:
+            raise ValueError("{0} is a delta snapshot, its full snapshot is needed".format(filename))
+        base_fields, planes = _read(base)
+        if base_fields[2] != FULL or base_fields[-1] != base_id:
+            raise ValueError("{0} is not the full snapshot of {1}".format(base, filename))
+        spans = array.array('I', payload[:8 * span_count])
+        if sys.byteorder == 'big':
+            spans.byteswap()
+        position = 8 * span_count
+        for plane_offset in range(0, len(CompactGrid.PLANES) * size, size):
+            for index, length in zip(spans[::2], spans[1::2]):
+                start = plane_offset + index
+                planes[start:start + length] = payload[position:position + length]
+                position += length
+        fov = payload[position:]
+    else:
+        planes = payload
+        fov = payload[len(CompactGrid.PLANES) * size:]
+    view = memoryview(planes)
+    grid = CompactGrid.from_planes(width, height,
+                                   *(view[offset:offset + size]
+                                     for offset in range(0, len(CompactGrid.PLANES) * size, size)))
+    dungeon = Dungeon.from_grid(grid, **options)
+    dungeon.revision = revision
+    if player_x >= 0:
+        fov = array.array('I', fov[:4 * fov_count])
+        if sys.byteorder == 'big':
+            fov.byteswap()
+        player = dungeon.player = Player(player_x, player_y)
+        player.fov = {(index % width, index // width) for index in fov}
+    return dungeon
+
+
+def main():
+    """Time full and delta snapshots of a big random level"""
+    import os.path
+    import tempfile
+    import timeit
+
+    level = Dungeon.generate(500, 500, 400, compact=True)
+    level.add_player(Player())
+    snapshots = Snapshotter(level)
+    with tempfile.TemporaryDirectory() as directory:
+        full = os.path.join(directory, 'full.psav')
+        delta = os.path.join(directory, 'delta.psav')
+        for compress in (False, True):
+            duration = timeit.timeit(lambda: snapshots.save(full, compress=compress), number=5) / 5
+            print('full save{0}: {1:.2f} ms, {2} bytes'.format(
+                  ' (zlib)' if compress else '', duration * 1000, os.path.getsize(full)))
+            duration = timeit.timeit(lambda: load(full, compact=True), number=5) / 5
+            print('full load{0}: {1:.2f} ms'.format(' (zlib)' if compress else '', duration * 1000))
+        for step in range(20):
+            level.move_player(1, 0)
+            level.move_player(0, 1)
+        duration = timeit.timeit(lambda: snapshots.save(delta, delta=True), number=5) / 5
+        print('delta save: {0:.2f} ms, {1} bytes'.format(duration * 1000, os.path.getsize(delta)))
+        duration = timeit.timeit(lambda: load(delta, full, compact=True), number=5) / 5
+        print('delta load: {0:.2f} ms'.format(duration * 1000))
+
+if __name__ == '__main__':
+    main()
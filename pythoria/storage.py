@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Storage backends for the Dungeon map.
+
+TileGrid is the historical layout: a list of rows, each row being a list of
+Tile objects. CompactGrid keeps the same information in parallel typed planes
+(one byte per cell and per attribute) and hands out lightweight TileProxy
+objects on access, so the rest of the code can keep using the Tile API.
+ChunkedGrid splits a CompactGrid into square chunks paged in from a buffer,
+usually a memory mapped file, for maps larger than the memory.
+"""
+
+import collections
+
+from .tile import Tile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['TileGrid', 'CompactGrid', 'TileProxy', 'ChunkedGrid', 'ChunkedTileProxy']
+
+
+class TileGrid(list):
+    """
+    List of rows of Tile objects. Each cell owns its Tile instance.
+    """
+    @classmethod
+    def empty(cls, width, height):
+        """Create a grid filled with empty Tiles"""
+        return cls([Tile() for col in range(width)] for row in range(height))
+
+    def tile_at(self, x, y):
+        """Return the Tile at position (x, y)"""
+        return self[y][x]
+
+    def put(self, x, y, tile):
+        """Store the Tile at position (x, y)"""
+        self[y][x] = tile
+
+    def is_opaque(self, x, y):
+        """Check if the cell at (x, y) blocks the light"""
+        return self[y][x].block_light
+
+    def is_blocking(self, x, y):
+        """Check if the cell at (x, y) blocks movement"""
+        return self[y][x].blocking
+
+    def reveal_all(self):
+        """Turn on the visibility of every cell"""
+        for row in self:
+            for tile in row:
+                tile.visible = True
+
+
+class TileProxy(Tile):
+    """
+    A Tile-compatible view on one cell of a CompactGrid.
+    Reading or writing its attributes reads or writes the grid planes.
+    Proxies are cheap and created on demand; two proxies on the same cell
+    see the same data.
+    """
+    __slots__ = ('_grid', '_index')
+
+    def __init__(self, grid, index):
+        self._grid = grid
+        self._index = index
+
+    def _get_value(self):
+        return chr(self._grid.glyph[self._index])
+
+    def _set_value(self, value):
+        self._grid.glyph[self._index] = self._grid.encode_glyph(value)
+
+    value = property(_get_value, _set_value)
+
+    def _plane_property(name):
+        "Helper function to build a boolean property backed by a plane"
+        def getter(self):
+            return bool(getattr(self._grid, name)[self._index])
+        def setter(self, flag):
+            getattr(self._grid, name)[self._index] = 1 if flag else 0
+        return property(getter, setter)
+
+    block_light = _plane_property('block_light')
+    blocking = _plane_property('blocking')
+    visible = _plane_property('visible')
+    del _plane_property
+
+    def _set_monster(self, monster):
+        if monster is None:
+            self._grid.monsters.pop(self._index, None)
+        else:
+            self._grid.monsters[self._index] = monster
+
+    monster = property(lambda self: self._grid.monsters.get(self._index),
+                       _set_monster)
+
+    def _set_loot(self, loot):
+        if loot:
+            self._grid.loot[self._index] = list(loot)
+        else:
+            self._grid.loot.pop(self._index, None)
+
+    loot = property(lambda self: self._grid.loot.get(self._index, ()),
+                    _set_loot, doc="""
+                    Items lying on the cell. Only cells with loot use memory
+                    for it: change it with add_loot and remove_loot.
+                    """)
+
+    def add_loot(self, item):
+        """Drop the item on the cell"""
+        self._grid.loot.setdefault(self._index, []).append(item)
+
+    def remove_loot(self, item):
+        """Pick up the item from the cell. Raises ValueError if it is not there."""
+        loot = self._grid.loot.get(self._index)
+        if not loot:
+            raise ValueError("{0!r} is not on the cell".format(item))
+        loot.remove(item)
+        if not loot:
+            del self._grid.loot[self._index]
+
+    def open(self):
+        """If the cell is a closed door, open it."""
+        grid, index = self._grid, self._index
+        if grid.glyph[index] == ord('+'):
+            grid.blocking[index] = 0
+            grid.block_light[index] = 0
+            grid.glyph[index] = ord("'")
+            return True
+        return False
+
+    def close(self):
+        """If the cell is an opened door, close it."""
+        grid, index = self._grid, self._index
+        if grid.glyph[index] == ord("'"):
+            grid.blocking[index] = 1
+            grid.block_light[index] = 1
+            grid.glyph[index] = ord('+')
+            return True
+        return False
+
+
+class CompactRow:
+    """
+    A row of a CompactGrid. Behaves like a list of Tiles for reading,
+    slicing, iterating and assigning.
+    """
+    __slots__ = ('_grid', '_offset')
+
+    def __init__(self, grid, y):
+        self._grid = grid
+        self._offset = y * grid.width
+
+    def __len__(self):
+        return self._grid.width
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [TileProxy(self._grid, self._offset + x)
+                    for x in range(*key.indices(self._grid.width))]
+        if key < 0:
+            key += self._grid.width
+        if not 0 <= key < self._grid.width:
+            raise IndexError
+        return TileProxy(self._grid, self._offset + key)
+
+    def __setitem__(self, x, tile):
+        if x < 0:
+            x += self._grid.width
+        if not 0 <= x < self._grid.width:
+            raise IndexError
+        self._grid.store(self._offset + x, tile)
+
+    def __iter__(self):
+        grid = self._grid
+        for index in range(self._offset, self._offset + grid.width):
+            yield TileProxy(grid, index)
+
+
+class CompactGrid:
+    """
+    Cell attributes stored in parallel planes of width * height bytes, in
+    row major order:
+    - glyph: the character code of the Tile value (latin-1)
+    - block_light, blocking, visible: 0 or 1
+    Monsters and loot are rare, so they live in dicts indexed by cell.
+    """
+    PLANES = ('glyph', 'block_light', 'blocking', 'visible')
+
+    def __init__(self, width, height):
+        size = width * height
+        self.width = width
+        self.height = height
+        self.glyph = bytearray(b' ') * size
+        self.block_light = bytearray(size)
+        self.blocking = bytearray(size)
+        self.visible = bytearray(size)
+        self.monsters = {}
+        self.loot = {}
+
+    @classmethod
+    def from_tiles(cls, rows):
+        """Build a CompactGrid from a list of rows of Tiles"""
+        grid = cls(len(rows[0]) if rows else 0, len(rows))
+        for y, row in enumerate(rows):
+            grid.put_row(y, row)
+        return grid
+
+    @classmethod
+    def from_planes(cls, width, height, glyph, block_light, blocking, visible):
+        """
+        Build a CompactGrid using the given planes without copying them.
+        Any writable buffer of width * height bytes fits: bytearray,
+        memoryview on a mmap...
+        """
+        grid = cls.__new__(cls)
+        grid.width, grid.height = width, height
+        for name, plane in zip(cls.PLANES, (glyph, block_light, blocking, visible)):
+            if len(plane) != width * height:
+                raise ValueError("Plane {0} should have {1} bytes".format(name, width * height))
+            setattr(grid, name, plane)
+        grid.monsters = {}
+        grid.loot = {}
+        return grid
+
+    @staticmethod
+    def encode_glyph(value):
+        """Return the byte stored in the glyph plane for the Tile value"""
+        code = ord(value)
+        if code > 0xff:
+            raise ValueError("Glyph '{0}' cannot be stored in a compact map".format(value))
+        return code
+
+    def store(self, index, tile):
+        """Copy the Tile attributes into the cell at the given plane index"""
+        self.store_planes(index, tile)
+        if tile.monster is not None:
+            self.monsters[index] = tile.monster
+        else:
+            self.monsters.pop(index, None)
+        if tile.loot:
+            self.loot[index] = list(tile.loot)
+        else:
+            self.loot.pop(index, None)
+
+    def store_planes(self, index, tile):
+        """Copy the Tile attributes kept in the planes, not its monster and loot"""
+        self.glyph[index] = self.encode_glyph(tile.value)
+        self.block_light[index] = 1 if tile.block_light else 0
+        self.blocking[index] = 1 if tile.blocking else 0
+        self.visible[index] = 1 if tile.visible else 0
+
+    def put_row(self, y, tiles):
+        """Copy a whole row of Tiles into the row y"""
+        offset = y * self.width
+        for x, tile in enumerate(tiles):
+            self.store(offset + x, tile)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, key):
+        """Return the row y, or a list of rows for a slice"""
+        if isinstance(key, slice):
+            return [CompactRow(self, y) for y in range(*key.indices(self.height))]
+        if key < 0:
+            key += self.height
+        if not 0 <= key < self.height:
+            raise IndexError
+        return CompactRow(self, key)
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield CompactRow(self, y)
+
+    def tile_at(self, x, y):
+        """Return a TileProxy on position (x, y)"""
+        return TileProxy(self, y * self.width + x)
+
+    def put(self, x, y, tile):
+        """Copy the Tile attributes at position (x, y)"""
+        self.store(y * self.width + x, tile)
+
+    def is_opaque(self, x, y):
+        """Check if the cell at (x, y) blocks the light"""
+        return self.block_light[y * self.width + x] != 0
+
+    def is_blocking(self, x, y):
+        """Check if the cell at (x, y) blocks movement"""
+        return self.blocking[y * self.width + x] != 0
+
+    def reveal_all(self):
+        """Turn on the visibility of every cell"""
+        self.visible[:] = b'\x01' * len(self.visible)
+
+    def plane(self, name):
+        """The plane name itself, without copy (see ChunkedGrid.plane)"""
+        return getattr(self, name)
+
+    @property
+    def nbytes(self):
+        """Memory used by the planes, in bytes"""
+        return sum(len(getattr(self, name)) for name in self.PLANES)
+
+    def as_array(self, name):
+        """
+        Return a (height, width) NumPy view sharing memory with the given
+        plane. Raises ImportError if NumPy is not installed.
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required to get an array view of the map")
+        plane = numpy.frombuffer(getattr(self, name), dtype=numpy.uint8)
+        return plane.reshape(self.height, self.width)
+
+
+class ChunkedTileProxy(TileProxy):
+    """
+    A TileProxy on one cell of a ChunkedGrid. The chunk of the cell is
+    looked up at each access, so the proxy stays valid after the chunk was
+    evicted. The monster and the loot are kept in the dicts of the
+    ChunkedGrid.
+    """
+    __slots__ = ('_owner', '_x', '_y')
+
+    def __init__(self, owner, x, y):
+        self._owner = owner
+        self._x = x
+        self._y = y
+
+    _grid = property(lambda self: self._owner._locate(self._x, self._y)[0])
+    _index = property(lambda self: self._owner._locate(self._x, self._y)[1])
+
+    def _items(self):
+        "A TileProxy on the monster and loot dicts of the ChunkedGrid for the cell"
+        return TileProxy(self._owner, self._y * self._owner.width + self._x)
+
+    monster = property(lambda self: self._items().monster,
+                       lambda self, monster: setattr(self._items(), 'monster', monster))
+    loot = property(lambda self: self._items().loot,
+                    lambda self, loot: setattr(self._items(), 'loot', loot))
+
+    def add_loot(self, item):
+        """Drop the item on the cell"""
+        self._items().add_loot(item)
+
+    def remove_loot(self, item):
+        """Pick up the item from the cell. Raises ValueError if it is not there."""
+        self._items().remove_loot(item)
+
+
+class ChunkedRow:
+    """
+    A row of a ChunkedGrid. Only the chunks of the accessed cells are loaded.
+    """
+    __slots__ = ('_grid', '_y')
+
+    def __init__(self, grid, y):
+        self._grid = grid
+        self._y = y
+
+    def __len__(self):
+        return self._grid.width
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._grid.tile_at(x, self._y)
+                    for x in range(*key.indices(self._grid.width))]
+        if key < 0:
+            key += self._grid.width
+        if not 0 <= key < self._grid.width:
+            raise IndexError
+        return self._grid.tile_at(key, self._y)
+
+    def __setitem__(self, x, tile):
+        if x < 0:
+            x += self._grid.width
+        if not 0 <= x < self._grid.width:
+            raise IndexError
+        self._grid.put(x, self._y, tile)
+
+    def __iter__(self):
+        for x in range(self._grid.width):
+            yield self._grid.tile_at(x, self._y)
+
+
+class ChunkedGrid:
+    """
+    A map stored in a buffer with the layout of the planes of a CompactGrid
+    (one plane after the other from offset, each plane in row major order),
+    and only loaded in memory by chunks of chunk_size x chunk_size cells.
+
+    A chunk is a small CompactGrid copied from the buffer the first time one
+    of its cells is accessed. At most max_chunks chunks stay loaded: the least
+    recently used one is evicted when another one is needed, and written back
+    to the buffer if its planes changed. Call flush to write back every chunk.
+
+    The cells are accessed through ChunkedTileProxy objects, which find the
+    chunk of their cell again at each access. Like in a CompactGrid,
+    monsters and loot are rare: they live in the monsters and loot dicts of
+    the grid, indexed by y * width + x, and are not written to the buffer.
+    """
+    PLANES = CompactGrid.PLANES
+
+    def __init__(self, width, height, buffer, offset=0, chunk_size=64, max_chunks=64):
+        if len(buffer) < offset + len(self.PLANES) * width * height:
+            raise ValueError("The buffer is too small for a {0}x{1} map".format(width, height))
+        self.width = width
+        self.height = height
+        self.buffer = buffer
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self._chunks = collections.OrderedDict()
+        self.monsters = {}
+        self.loot = {}
+        self._last = (None, None) # Key and chunk of the last access
+        self.loads = 0
+        self.evictions = 0
+        self.writes = 0
+
+    def _plane_offset(self, name):
+        "Offset of the plane in the buffer"
+        return self.offset + self.PLANES.index(name) * self.width * self.height
+
+    def _chunk_rows(self, chunk_x, chunk_y):
+        "Yield the chunk row offset, buffer row offset and width of the rows of a chunk"
+        left, top = chunk_x * self.chunk_size, chunk_y * self.chunk_size
+        width = min(self.chunk_size, self.width - left)
+        for y in range(top, min(top + self.chunk_size, self.height)):
+            yield (y - top) * width, y * self.width + left, width
+
+    def _chunk(self, chunk_x, chunk_y):
+        "Return the chunk of the given chunk coordinates, loading it if needed"
+        key = chunk_x, chunk_y
+        if self._last[0] == key:
+            return self._last[1]
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+        else:
+            chunk = self._chunks[key] = self._load(chunk_x, chunk_y)
+            if len(self._chunks) > self.max_chunks:
+                self._evict()
+        self._last = key, chunk
+        return chunk
+
+    def _load(self, chunk_x, chunk_y):
+        "Copy a chunk from the buffer"
+        left, top = chunk_x * self.chunk_size, chunk_y * self.chunk_size
+        chunk = CompactGrid(min(self.chunk_size, self.width - left),
+                            min(self.chunk_size, self.height - top))
+        for name in self.PLANES:
+            plane, base = getattr(chunk, name), self._plane_offset(name)
+            for chunk_offset, offset, width in self._chunk_rows(chunk_x, chunk_y):
+                plane[chunk_offset:chunk_offset + width] = self.buffer[base + offset:base + offset + width]
+        self.loads += 1
+        return chunk
+
+    def _write_back(self, key, chunk):
+        "Copy the rows of a chunk which changed to the buffer"
+        for name in self.PLANES:
+            plane, base = getattr(chunk, name), self._plane_offset(name)
+            for chunk_offset, offset, width in self._chunk_rows(*key):
+                row = plane[chunk_offset:chunk_offset + width]
+                if self.buffer[base + offset:base + offset + width] != row:
+                    self.buffer[base + offset:base + offset + width] = row
+                    self.writes += 1
+
+    def _evict(self):
+        "Evict the least recently used chunk"
+        key, chunk = self._chunks.popitem(last=False)
+        self._write_back(key, chunk)
+        self.evictions += 1
+        if self._last[0] == key:
+            self._last = (None, None)
+
+    def flush(self):
+        """Write back the chunks still in memory"""
+        for key, chunk in self._chunks.items():
+            self._write_back(key, chunk)
+        flush = getattr(self.buffer, 'flush', None)
+        if flush is not None:
+            flush()
+
+    @property
+    def loaded_chunks(self):
+        """Coordinates of the chunks loaded in memory, least recently used first"""
+        return list(self._chunks)
+
+    @property
+    def nbytes(self):
+        """Memory used by the planes of the loaded chunks, in bytes"""
+        return sum(chunk.nbytes for chunk in self._chunks.values())
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, key):
+        """Return the row y, or a list of rows for a slice"""
+        if isinstance(key, slice):
+            return [ChunkedRow(self, y) for y in range(*key.indices(self.height))]
+        if key < 0:
+            key += self.height
+        if not 0 <= key < self.height:
+            raise IndexError
+        return ChunkedRow(self, key)
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield ChunkedRow(self, y)
+
+    def _locate(self, x, y):
+        "Return the chunk and the index of the cell (x, y) in its planes"
+        size = self.chunk_size
+        chunk = self._chunk(x // size, y // size)
+        return chunk, (y % size) * chunk.width + x % size
+
+    def tile_at(self, x, y):
+        """Return a ChunkedTileProxy on position (x, y)"""
+        return ChunkedTileProxy(self, x, y)
+
+    def put(self, x, y, tile):
+        """Copy the Tile attributes at position (x, y)"""
+        chunk, index = self._locate(x, y)
+        chunk.store_planes(index, tile)
+        cell = TileProxy(self, y * self.width + x)
+        cell.monster = tile.monster
+        cell.loot = tile.loot
+
+    def is_opaque(self, x, y):
+        """Check if the cell at (x, y) blocks the light"""
+        chunk, index = self._locate(x, y)
+        return chunk.block_light[index] != 0
+
+    def is_blocking(self, x, y):
+        """Check if the cell at (x, y) blocks movement"""
+        chunk, index = self._locate(x, y)
+        return chunk.blocking[index] != 0
+
+    def reveal_all(self):
+        """Turn on the visibility of every cell, without loading the chunks"""
+        start = self._plane_offset('visible')
+        size = self.width * self.height
+        self.buffer[start:start + size] = b'\x01' * size
+        for chunk in self._chunks.values():
+            chunk.reveal_all()
+
+    def plane(self, name):
+        """
+        A copy of the whole plane name, read from the buffer without loading
+        the chunks, with the content of the loaded chunks.
+        """
+        start = self._plane_offset(name)
+        plane = bytearray(self.buffer[start:start + self.width * self.height])
+        for key, chunk in self._chunks.items():
+            rows = getattr(chunk, name)
+            for chunk_offset, offset, width in self._chunk_rows(*key):
+                plane[offset:offset + width] = rows[chunk_offset:chunk_offset + width]
+        return plane
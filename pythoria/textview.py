@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Text render backend for the dungeon, without pygame.
+
+TextView draws the same viewport as DungeonView into preallocated buffers:
+one byte per cell for the character, and one byte per cell of attribute
+flags. Each row of the character buffer ends with a newline, so the whole
+viewport is dumped as bytes or as a string in one go.
+"""
+
+from .library import viewport_origin
+
+__all__ = ['TextView', 'ScrollingTextView', 'VISIBLE', 'LIT', 'PLAYER']
+
+# Attribute flags
+VISIBLE = 1 # The tile has been seen
+LIT = 2     # In the player field of vision (tinted by DungeonView)
+PLAYER = 4  # The player stands there
+
+# Translation of the visible plane to a mask: 0x00 if hidden, 0xff if seen
+_SEEN_MASK = bytes([0]) + bytes([255]) * 255
+
+
+class TextView:
+    """
+    Draws a width x height part of the dungeon in the chars and attributes
+    buffers. With show_hidden, tiles are drawn even if not yet seen.
+    """
+    player_glyph = ord('@')
+
+    def __init__(self, dungeon, width, height, show_hidden=False):
+        self.dungeon = dungeon
+        self.width, self.height = width, height
+        self.show_hidden = show_hidden
+        self.chars = bytearray((b' ' * width + b'\n') * height)
+        self.attributes = bytearray(width * height)
+
+    def draw(self, left=0, top=0, width=None, height=None):
+        """
+        Draw the dungeon and the player.
+        left, top define where in the dungeon to start to draw and
+        width, height define how much to draw from the (left, top) position.
+        Cells of the view outside of the drawn area are blank.
+        """
+        width = max(0, min(self.width if width is None else width, self.width,
+                           self.dungeon.width - left))
+        height = max(0, min(self.height if height is None else height, self.height,
+                            self.dungeon.height - top))
+        chars, attributes = self.chars, self.attributes
+        stride = self.width + 1
+        attributes[:] = bytes(len(attributes))
+        for y in range(self.height):
+            chars[y * stride:y * stride + self.width] = b' ' * self.width
+
+        grid = self.dungeon._map
+        if hasattr(grid, 'glyph'):
+            self._draw_planes(grid, left, top, width, height)
+        else:
+            self._draw_tiles(grid, left, top, width, height)
+
+        player = self.dungeon.player
+        if player is None:
+            return
+        for light_x, light_y in player.fov:
+            x, y = light_x - left, light_y - top
+            if 0 <= x < width and 0 <= y < height and not grid.is_opaque(light_x, light_y):
+                attributes[y * self.width + x] |= LIT
+        x, y = player.x - left, player.y - top
+        if 0 <= x < width and 0 <= y < height:
+            chars[y * stride + x] = self.player_glyph
+            attributes[y * self.width + x] |= PLAYER
+
+    def _draw_planes(self, grid, left, top, width, height):
+        "Copy the rows of a CompactGrid"
+        stride = self.width + 1
+        spaces = int.from_bytes(b' ' * width, 'little')
+        for y in range(height):
+            offset = (top + y) * grid.width + left
+            glyphs = grid.glyph[offset:offset + width]
+            visible = grid.visible[offset:offset + width]
+            if not self.show_hidden:
+                # Blank the hidden cells on the whole row at once: the glyphs
+                # where the mask is 0xff, spaces elsewhere
+                mask = int.from_bytes(bytes(visible).translate(_SEEN_MASK), 'little')
+                glyphs = (int.from_bytes(glyphs, 'little') & mask |
+                          spaces & ~mask).to_bytes(width, 'little')
+            self.chars[y * stride:y * stride + width] = glyphs
+            self.attributes[y * self.width:y * self.width + width] = visible
+
+    def _draw_tiles(self, grid, left, top, width, height):
+        "Copy the Tiles of a TileGrid"
+        stride = self.width + 1
+        for y, line in enumerate(grid[top:top + height]):
+            for x, tile in enumerate(line[left:left + width]):
+                if tile.visible:
+                    self.attributes[y * self.width + x] = VISIBLE
+                if tile.visible or self.show_hidden:
+                    self.chars[y * stride + x] = ord(tile.value)
+
+    def to_bytes(self):
+        """The characters of the view, rows separated by newlines"""
+        return bytes(self.chars)
+
+    def to_string(self):
+        """The characters of the view, rows separated by newlines"""
+        return self.chars.decode('latin-1')
+
+    def rows(self):
+        """List of the rows of the view, as strings"""
+        return self.to_string().split('\n')[:-1]
+
+    __str__ = to_string
+
+
+class ScrollingTextView(TextView):
+    """
+    A TextView centred on the player, constrained in the limits of the
+    dungeon, like ScrollingView.
+    """
+    def __init__(self, dungeon, width=15, height=15):
+        super(ScrollingTextView, self).__init__(dungeon, width, height)
+
+    def draw(self):
+        player = self.dungeon.player
+        self.left, self.top = viewport_origin(player.x, player.y, self.width, self.height,
+                                              self.dungeon.width, self.dungeon.height)
+        super(ScrollingTextView, self).draw(self.left, self.top, self.width, self.height)
+
+
+def main():
+    """Render the big map around the player"""
+    import timeit
+    from .dungeon import Dungeon
+    from .player import Player
+
+    for compact in (False, True):
+        level = Dungeon.load_from_file('map/bigmap.txt', compact=compact)
+        level.add_player(Player(1, 1))
+        view = ScrollingTextView(level)
+        duration = timeit.timeit(view.draw, number=1000) / 1000
+        print('{0}: {1:.3f} ms per draw'.format('compact' if compact else 'tiles', duration * 1000))
+    print(view)
+    full_view = TextView(level, level.width, level.height, show_hidden=True)
+    full_view.draw()
+    print(full_view)
+
+if __name__ == '__main__':
+    main()
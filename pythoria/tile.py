@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-__all__ = ['Tile', 'Door']
+__all__ = ['Tile', 'Door', 'TILE_TYPES', 'PLAYER_GLYPH', 'register_glyph', 'make_tile']
 
 class Tile():
     """
@@ -29,6 +29,14 @@ class Tile():
     def __repr__(self):
         return '<Tile {0} {1}>'.format(self.value, 'visible' if self.visible else 'not visible')
     
+    def add_loot(self, item):
+        """Drop the item on the tile"""
+        self.loot.append(item)
+    
+    def remove_loot(self, item):
+        """Pick up the item from the tile. Raises ValueError if it is not there."""
+        self.loot.remove(item)
+    
     def open(self):
         """Cannot perform that action"""
         return False
@@ -61,3 +69,28 @@ class Door(Tile):
             self.value = "+"
             return True
         return False
+
+
+# Registry of the characters of a map file: glyph -> (Tile class, arguments)
+TILE_TYPES = {}
+PLAYER_GLYPH = 'P' # The player start position, on an empty Tile
+
+def register_glyph(glyph, tile_class=Tile, block_light=False, blocking=False):
+    """
+    Declare the Tile built for the glyph when reading a map. Tiles of a
+    compact map only keep the glyph, so a Tile class with a behaviour
+    depending on other data must also be handled by TileProxy.
+    """
+    TILE_TYPES[glyph] = (tile_class, block_light, blocking)
+
+def make_tile(glyph, visible=False):
+    """Return a new Tile for the glyph. Raises KeyError if it is unknown."""
+    if glyph == PLAYER_GLYPH:
+        return Tile(visible=visible)
+    tile_class, block_light, blocking = TILE_TYPES[glyph]
+    return tile_class(glyph, block_light, blocking, visible)
+
+register_glyph(' ')
+register_glyph('#', block_light=True, blocking=True)
+register_glyph('+', Door, block_light=True, blocking=True)
+register_glyph("'", Door)
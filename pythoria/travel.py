@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Commands moving the player many steps on their own: travel to a target and
+auto-explore.
+
+A command computes its route once with the Pathfinder of the dungeon, going
+only through the cells already seen, then follows it with Dungeon.walk_player
+a number of steps at a time: the controller calls step once per frame, and
+only the final position of the frame is drawn.
+"""
+
+__all__ = ['Travel', 'Explore']
+
+
+class Travel:
+    """
+    Walk the player to the goal, an (x, y) cell already seen.
+    The travel stops when new cells come into view. message tells why the
+    command ended, or is None.
+    """
+    def __init__(self, dungeon, goal):
+        self.dungeon = dungeon
+        self.goal = goal
+        self.message = None
+        pathfinder = dungeon.pathfinder
+        self.route = pathfinder.find_path(dungeon.player.pos, goal, pathfinder.known_cells())
+        if not self.route:
+            self.message = "Vous ne pouvez pas vous rendre à cet endroit."
+
+    def step(self, max_steps):
+        """Walk at most max_steps steps. Return False when the travel is over."""
+        if not self.route:
+            return False
+        steps, sighted = self.dungeon.walk_player(self.route, max_steps)
+        blocked = steps < min(max_steps, len(self.route)) and not sighted
+        del self.route[:steps]
+        if not self.route:
+            return False
+        if sighted:
+            self.message = "Vous découvrez de nouveaux lieux."
+        elif blocked:
+            self.message = "Le chemin est bloqué."
+        else:
+            return True
+        self.route = None
+        return False
+
+
+class Explore:
+    """
+    Walk the player to the closest place where something new can be seen,
+    again and again until everything reachable has been seen. The route is
+    computed again each time new cells come into view.
+    """
+    def __init__(self, dungeon):
+        self.dungeon = dungeon
+        self.message = None
+        self.route = None
+        self._reached = set() # Targets reached, to not go there in vain again
+
+    def step(self, max_steps):
+        """Walk at most max_steps steps. Return False when the exploration is over."""
+        while max_steps > 0:
+            if not self.route:
+                self.route = self.dungeon.pathfinder.explore_path(self.dungeon.player.pos)
+                if not self.route or self.route[-1] in self._reached:
+                    self.message = "Exploration terminée."
+                    return False
+            target = self.route[-1]
+            steps, sighted = self.dungeon.walk_player(self.route, max_steps)
+            if not steps:
+                self.message = "Le chemin est bloqué."
+                return False
+            del self.route[:steps]
+            if not self.route:
+                self._reached.add(target)
+            if sighted:
+                self.route = None
+            max_steps -= steps
+        return True
+
+
+def main():
+    """Time the auto-exploration of a big generated level"""
+    import time
+    from .dungeon import Dungeon
+    from .player import Player
+
+    for steps_per_frame in (1, 10, 50):
+        level = Dungeon.generate(200, 200, 200, seed=1, compact=True)
+        level.add_player(Player())
+        explore = Explore(level)
+        frames = 1
+        start = time.perf_counter()
+        while explore.step(steps_per_frame):
+            frames += 1
+        duration = time.perf_counter() - start
+        print('{0} steps per frame: {1} frames, {2:.2f} ms per frame'.format(
+              steps_per_frame, frames, duration * 1000 / frames))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os.path
+from pythoria import dungeon
+
+TEST_DIR = os.path.dirname(__file__)
+
+def load_test_map(name='map.txt', **options):
+    """Load a map of the test directory in a Dungeon"""
+    return dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, name), **options)
@@ -3,16 +3,19 @@
 
 import unittest
 import operator
+import os.path
 from pythoria import dungeon, tile
+from pythoria.player import Player
 
 EMPTY_SPACE = tile.Tile()
 WALL = tile.Tile('#', True, True, True)
 WALL_HIDDEN = tile.Tile('#', True, True)
+TEST_DIR = os.path.dirname(__file__)
         
 class TestDungeon(unittest.TestCase):
     
     def setUp(self):
-        self.test_map = dungeon.Dungeon.load_from_file('map.txt')
+        self.test_map = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'))
     
     def test_init_empty(self):
         test_map = dungeon.Dungeon(10, 12)
@@ -44,7 +47,7 @@ class TestDungeon(unittest.TestCase):
     def test_load_from_file(self):
         self.assertEqual(self.test_map.width, 10)
         self.assertEqual(self.test_map.height, 8)
-        self.assertRaises(ValueError, dungeon.Dungeon.load_from_file, 'map_wrong_char.txt')
+        self.assertRaises(ValueError, dungeon.Dungeon.load_from_file, os.path.join(TEST_DIR, 'map_wrong_char.txt'))
     
     def test_iter(self):
         height = 0
@@ -173,5 +176,55 @@ class TestDungeon(unittest.TestCase):
         self.assertTrue(door.blocking)
         self.assertTrue(door.block_light)
         
+    def test_walk_player(self):
+        self.test_map.add_player(Player(1, 4))
+        class Listener:
+            moves = 0
+            def on_move(self):
+                self.moves += 1
+        listener = Listener()
+        connection = self.test_map.bind("Player Moved", listener.on_move)
+        path = [(2, 4), (3, 4), (4, 4), (5, 4), (6, 4), (7, 4)]
+        self.assertEqual(self.test_map.walk_player(path, stop_on_sighting=False), (6, True))
+        self.assertEqual(self.test_map.player.pos, (7, 4))
+        self.assertFalse(self.test_map[6, 4].blocking) # The door was opened
+        self.assertTrue(self.test_map[8, 4].visible)
+        self.assertEqual(listener.moves, 1)
+        self.assertEqual(self.test_map.walk_player([(8, 4), (9, 4)]), (1, False))
+        self.assertEqual(self.test_map.player.pos, (8, 4))
+    
+    def test_walk_player_stops_on_sighting(self):
+        self.test_map.add_player(Player(1, 4))
+        path = [(2, 4), (3, 4), (4, 4), (5, 4), (6, 4), (7, 4)]
+        steps, sighted = self.test_map.walk_player(path)
+        self.assertTrue(sighted)
+        self.assertLess(steps, len(path))
+        self.assertEqual(self.test_map.player.pos, path[steps - 1])
+        self.assertEqual(self.test_map.walk_player([(1, 1)], max_steps=0), (0, False))
+    
+    def test_revision(self):
+        revision = self.test_map.revision
+        self.test_map.open_door(5, 4)
+        self.assertEqual(self.test_map.revision, revision)
+        self.test_map.open_door(6, 4)
+        self.assertGreater(self.test_map.revision, revision)
+        revision = self.test_map.revision
+        self.test_map.reveal([(1, 1)])
+        self.assertGreater(self.test_map.revision, revision)
+
+    def test_cells_revealed_event(self):
+        class Listener:
+            calls = 0
+            def on_revealed(self):
+                self.calls += 1
+        listener = Listener()
+        connection = self.test_map.bind("Cells Revealed", listener.on_revealed)
+        self.test_map.reveal([])
+        self.assertEqual(listener.calls, 0)
+        self.test_map.reveal([(1, 1), (2, 1)])
+        self.assertEqual(listener.calls, 1)
+        self.test_map.reveal_all()
+        self.assertEqual(listener.calls, 2)
+        
 if __name__ == '__main__':
     unittest.main()
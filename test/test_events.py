@@ -46,7 +46,139 @@ class TestEventDispatcher(unittest.TestCase):
         self.ed.remove(self.connection)
         self.ed.post('test_event', 2, b=3)
         self.assertFalse(self.observer.called)
-        
+
+
+class TestSlots(unittest.TestCase):
+    def setUp(self):
+        self.ed = events.EventDispatcher()
+        self.observers = [Observer() for number in range(10)]
+        self.connections = [self.ed.bind('test_event', observer.on_post)
+                            for observer in self.observers]
+
+    def test_remove_and_compact(self):
+        for connection in self.connections[:6]:
+            self.ed.remove(connection)
+        self.ed.remove(self.connections[0]) # Already removed
+        self.assertEqual(len(self.ed._listeners['test_event'].entries), 4)
+        self.ed.post('test_event', 1)
+        self.assertEqual([observer.called for observer in self.observers], [False] * 6 + [True] * 4)
+        # The handles still find their slots after the compaction
+        del self.connections[7]
+        self.observers[7].called = False
+        self.ed.post('test_event', 2)
+        self.assertFalse(self.observers[7].called)
+        self.assertEqual(self.observers[9].args, (2,))
+
+    def test_deleted_listeners(self):
+        del self.observers[:8]
+        self.ed.post('test_event', 1)
+        self.assertEqual(self.ed.delivered, 2)
+        self.assertEqual(len(self.ed._listeners['test_event'].entries), 2)
+        self.connections.clear()
+        self.assertEqual(self.ed._listeners['test_event'].entries, [])
+
+    def test_remove_while_posting(self):
+        ed = events.EventDispatcher()
+        connections = []
+        class Remover:
+            def on_post(remover, *args):
+                for connection in connections[2:]:
+                    ed.remove(connection)
+        remover = Remover()
+        connections.append(ed.bind('test_event', remover.on_post))
+        connections.extend(ed.bind('test_event', observer.on_post) for observer in self.observers)
+        ed.post('test_event')
+        self.assertEqual([observer.called for observer in self.observers], [True] + [False] * 9)
+        self.assertEqual(len(ed._listeners['test_event'].entries), 2)
+
+    def test_listener_raises(self):
+        class Failing:
+            def on_post(failing, *args):
+                raise RuntimeError(args)
+        failing = Failing()
+        connection = self.ed.bind('test_event', failing.on_post)
+        self.assertRaises(RuntimeError, self.ed.post, 'test_event', 1)
+        self.ed.deferred = True
+        self.ed.post('test_event', 2)
+        self.assertRaises(RuntimeError, self.ed.dispatch)
+        self.assertEqual(self.ed._delivering, 0)
+        # The slots are compacted again after the failed deliveries
+        del self.connections[:6]
+        self.assertEqual(len(self.ed._listeners['test_event'].entries), 5)
+
+class CoalescingDispatcher(events.EventDispatcher):
+    COALESCIBLE = frozenset(('cell',))
+
+class BatchObserver:
+    """Dummy class receiving the aggregated payloads"""
+    def __init__(self):
+        self.payloads = []
+
+    def on_post(self, payload):
+        self.payloads.append(payload)
+
+class CellObserver:
+    """Dummy class recording the arguments of each call"""
+    def __init__(self):
+        self.cells = []
+        self.others = []
+
+    def on_cell(self, *args):
+        self.cells.append(args)
+
+    def on_other(self, *args):
+        self.others.append(args)
+
+class TestDeferredDispatch(unittest.TestCase):
+    def setUp(self):
+        self.ed = CoalescingDispatcher()
+        self.ed.deferred = True
+        self.observer = CellObserver()
+        self.batch_observer = BatchObserver()
+        self.connections = [self.ed.bind('cell', self.observer.on_cell),
+                            self.ed.bind('other', self.observer.on_other),
+                            self.ed.bind('cell', self.batch_observer.on_post, batch=True)]
+
+    def test_deferred(self):
+        self.ed.post('other', 1)
+        self.assertEqual(self.observer.others, [])
+        self.assertTrue(self.ed.pending)
+        self.ed.dispatch()
+        self.assertEqual(self.observer.others, [(1,)])
+        self.assertFalse(self.ed.pending)
+        self.ed.dispatch()
+        self.assertEqual(self.observer.others, [(1,)])
+
+    def test_coalesce(self):
+        for args in ((1, 2), (3, 4), (1, 2), (5, 6)):
+            self.ed.post('cell', *args)
+        self.ed.post('other', 7)
+        self.ed.post('other', 7)
+        self.ed.dispatch()
+        self.assertEqual(self.batch_observer.payloads, [[(1, 2), (3, 4), (5, 6)]])
+        self.assertEqual(self.observer.cells, [(1, 2), (3, 4), (5, 6)])
+        self.assertEqual(self.observer.others, [(7,), (7,)])
+        self.assertEqual(self.ed.posted, 6)
+        self.assertEqual(self.ed.delivered, 1 + 3 + 2)
+
+    def test_batch_not_deferred(self):
+        self.ed.deferred = False
+        self.ed.post('cell', 1, 2)
+        self.ed.post('cell', 1, 2)
+        self.assertEqual(self.batch_observer.payloads, [[(1, 2)], [(1, 2)]])
+        self.assertEqual(self.ed.delivered, 4)
+
+    def test_post_while_dispatching(self):
+        class Reposter:
+            def on_other(self, ed):
+                ed.post('cell', 0, 0)
+        reposter = Reposter()
+        connection = self.ed.bind('other', reposter.on_other)
+        self.ed.post('other', self.ed)
+        self.ed.dispatch()
+        self.assertEqual(self.batch_observer.payloads, [])
+        self.ed.dispatch()
+        self.assertEqual(self.batch_observer.payloads, [[(0, 0)]])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import os.path
+from unittest.mock import patch
+from pythoria import dungeon, fov, tile
+from test.test_dungeon import TEST_DIR
+
+class TestAlgorithmSelection(unittest.TestCase):
+    def test_default(self):
+        test_map = dungeon.Dungeon(5, 5)
+        self.assertIs(test_map.fov_algorithm, fov.ALGORITHMS['raycast'])
+
+    def test_per_dungeon(self):
+        test_map = dungeon.Dungeon(5, 5, fov='shadowcast')
+        self.assertIsInstance(test_map.fov_algorithm, fov.ShadowcastFOV)
+        test_map.fov_algorithm = 'raycast'
+        self.assertIsInstance(test_map.fov_algorithm, fov.RaycastFOV)
+
+    def test_per_call(self):
+        class Blind:
+            def compute(self, dungeon, x, y, radius):
+                return {(x, y)}
+        test_map = dungeon.Dungeon(5, 5)
+        self.assertEqual(test_map.get_field_of_vision(2, 2, 3, Blind()), {(2, 2)})
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, dungeon.Dungeon, 5, 5, fov='telepathy')
+
+class TestShadowcastEquivalence(unittest.TestCase):
+    """
+    Shadowcasting and raycasting do not agree on every cell at the edge of
+    the shadows. They must give the same result in open space, and nearly the
+    same result in corridors.
+    """
+    radiuses = (3, 5, 8, 12)
+
+    def compare(self, test_map, min_jaccard, max_mismatch):
+        mismatch = total = 0
+        for radius in self.radiuses:
+            for y in range(test_map.height):
+                for x in range(test_map.width):
+                    if test_map.collide(x, y):
+                        continue
+                    reference = test_map.get_field_of_vision(x, y, radius, 'raycast')
+                    shadow = test_map.get_field_of_vision(x, y, radius, 'shadowcast')
+                    self.assertIn((x, y), shadow)
+                    self.assertGreaterEqual(len(reference & shadow) / len(reference | shadow),
+                                            min_jaccard, (x, y, radius))
+                    mismatch += len(reference ^ shadow)
+                    total += len(reference)
+        self.assertLessEqual(mismatch / total, max_mismatch)
+
+    def test_open_space(self):
+        test_map = dungeon.Dungeon(50, 50)
+        for radius in (1, 5, 12, 20):
+            self.assertEqual(test_map.get_field_of_vision(25, 25, radius, 'shadowcast'),
+                             test_map.get_field_of_vision(25, 25, radius, 'raycast'))
+
+    def test_map(self):
+        self.compare(dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt')),
+                     0.9, 0.01)
+
+    def test_bigmap(self):
+        self.compare(dungeon.Dungeon.load_from_file('map/bigmap.txt'), 0.7, 0.06)
+
+    def test_compact_storage(self):
+        objects = dungeon.Dungeon.load_from_file('map/bigmap.txt', fov='shadowcast')
+        compact = dungeon.Dungeon.load_from_file('map/bigmap.txt', compact=True, fov='shadowcast')
+        self.assertEqual(objects.get_field_of_vision(1, 1, 10),
+                         compact.get_field_of_vision(1, 1, 10))
+
+    def test_walls_stop_vision(self):
+        test_map = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'), fov='shadowcast')
+        fov_cells = test_map.get_field_of_vision(1, 1, 4)
+        self.assertIn((5, 0), fov_cells)
+        self.assertNotIn((6, 0), fov_cells)
+        self.assertNotIn((7, 4), test_map.get_field_of_vision(1, 1, 8)) # Behind the door
+
+class TestIncrementalUpdate(unittest.TestCase):
+    """Patching the field of vision after a door moved gives the full result."""
+    def check_doors(self, test_map, radius):
+        doors = [(x, y) for y in range(test_map.height) for x in range(test_map.width)
+                 if test_map[x, y].value == '+']
+        positions = [(x, y) for y in range(test_map.height) for x in range(test_map.width)
+                     if not test_map.collide(x, y)]
+        for door_x, door_y in doors:
+            for x, y in positions:
+                before = test_map.get_field_of_vision(x, y, radius)
+                test_map.open_door(door_x, door_y)
+                opened = test_map.update_field_of_vision(before, x, y, radius, door_x, door_y)
+                self.assertEqual(opened, test_map.get_field_of_vision(x, y, radius))
+                test_map.close_door(door_x, door_y)
+                closed = test_map.update_field_of_vision(opened, x, y, radius, door_x, door_y)
+                self.assertEqual(closed, before)
+
+    def test_map(self):
+        test_map = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'),
+                                                  fov='shadowcast')
+        self.check_doors(test_map, 5)
+
+    def test_bigmap(self):
+        test_map = dungeon.Dungeon.load_from_file('map/bigmap.txt', fov='shadowcast')
+        self.check_doors(test_map, 4)
+
+    def test_any_cell(self):
+        test_map = dungeon.Dungeon.load_from_file('map/bigmap.txt', fov='shadowcast')
+        positions = [(x, y) for y in range(test_map.height) for x in range(test_map.width)
+                     if not test_map.collide(x, y)]
+        for x, y in positions[::7]:
+            before = test_map.get_field_of_vision(x, y, 6)
+            for cell_x, cell_y in ((x - 2, y - 1), (x + 1, y + 3), (x + 4, y - 4), (x, y + 2)):
+                if not (0 <= cell_x < test_map.width and 0 <= cell_y < test_map.height):
+                    continue
+                cell = test_map[cell_x, cell_y]
+                test_map[cell_x, cell_y] = tile.Tile(cell.value, not cell.block_light,
+                                                     cell.blocking)
+                self.assertEqual(test_map.update_field_of_vision(before, x, y, 6, cell_x, cell_y),
+                                 test_map.get_field_of_vision(x, y, 6))
+                test_map[cell_x, cell_y] = cell
+
+    def test_far_door(self):
+        test_map = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'))
+        before = test_map.get_field_of_vision(1, 1, 2)
+        test_map.open_door(6, 4)
+        self.assertIs(test_map.update_field_of_vision(before, 1, 1, 2, 6, 4), before)
+
+    def test_fallback(self):
+        test_map = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'))
+        before = test_map.get_field_of_vision(5, 4, 4)
+        test_map.open_door(6, 4)
+        self.assertEqual(test_map.update_field_of_vision(before, 5, 4, 4, 6, 4),
+                         test_map.get_field_of_vision(5, 4, 4))
+
+    def test_event_position(self):
+        class Listener:
+            def on_door(self, x, y):
+                self.position = x, y
+        test_map = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'))
+        listener = Listener()
+        connection = test_map.bind("Door Open", listener.on_door)
+        test_map.open_door(6, 4)
+        self.assertEqual(listener.position, (6, 4))
+
+class TestBatchFieldsOfVision(unittest.TestCase):
+    def setUp(self):
+        self.test_map = dungeon.Dungeon.load_from_file('map/bigmap.txt', compact=True)
+        positions = [(x, y) for y in range(self.test_map.height) for x in range(self.test_map.width)
+                     if not self.test_map.collide(x, y)]
+        self.viewers = [positions[idx] + (2 + idx % 6,) for idx in range(0, len(positions), 11)]
+
+    def test_bitsets_open_space(self):
+        test_map = dungeon.Dungeon(30, 30)
+        masks = test_map.get_fields_of_vision([(15, 15, 6), (2, 3, 4)], use_numpy=False)
+        self.assertEqual(fov.mask_points(masks[0], 15, 15, 6),
+                         test_map.get_field_of_vision(15, 15, 6))
+        self.assertEqual(fov.mask_points(masks[1], 2, 3, 6),
+                         test_map.get_field_of_vision(2, 3, 4))
+
+    def test_bitsets_close_to_raycast(self):
+        masks = self.test_map.get_fields_of_vision(self.viewers, use_numpy=False)
+        mismatch = total = 0
+        for mask, (x, y, radius) in zip(masks, self.viewers):
+            reference = self.test_map.get_field_of_vision(x, y, radius)
+            mismatch += len(fov.mask_points(mask, x, y, 7) ^ reference)
+            total += len(reference)
+        self.assertLessEqual(mismatch / total, 0.05)
+
+    @unittest.skipIf(fov.numpy is None, "NumPy not installed")
+    def test_numpy_same_as_bitsets(self):
+        masks = self.test_map.get_fields_of_vision(self.viewers)
+        bitsets = self.test_map.get_fields_of_vision(self.viewers, use_numpy=False)
+        self.assertEqual(masks.shape, (len(self.viewers), 15, 15))
+        for mask, bits, (x, y, radius) in zip(masks, bitsets, self.viewers):
+            self.assertEqual(fov.mask_points(mask, x, y, 7), fov.mask_points(bits, x, y, 7))
+
+    @unittest.skipIf(fov.numpy is None, "NumPy not installed")
+    def test_numpy_chunks(self):
+        # Viewers far apart, processed a few at a time in their own windows
+        viewers = self.viewers[::-3]
+        radius = max(viewer[2] for viewer in viewers)
+        masks = fov._batch_numpy(self.test_map, viewers, radius, chunk_size=4)
+        self.assertTrue((masks == self.test_map.get_fields_of_vision(viewers)).all())
+        bitsets = self.test_map.get_fields_of_vision(viewers, use_numpy=False)
+        for mask, bits, (x, y, _) in zip(masks, bitsets, viewers):
+            self.assertEqual(fov.mask_points(mask, x, y, radius),
+                             fov.mask_points(bits, x, y, radius))
+
+    @unittest.skipIf(fov.numpy is None, "NumPy not installed")
+    def test_numpy_gather_size(self):
+        # With a tiny budget, the viewers are processed one at a time
+        viewers = self.viewers[:20]
+        with patch.object(fov, 'GATHER_SIZE', 1):
+            masks = self.test_map.get_fields_of_vision(viewers)
+        self.assertTrue((masks == self.test_map.get_fields_of_vision(viewers)).all())
+
+    @unittest.skipIf(fov.numpy is None, "NumPy not installed")
+    def test_numpy_object_storage(self):
+        test_map = dungeon.Dungeon.load_from_file('map/bigmap.txt')
+        viewers = self.viewers[:10]
+        self.assertTrue((test_map.get_fields_of_vision(viewers) ==
+                         self.test_map.get_fields_of_vision(viewers)).all())
+
+    def test_no_viewer(self):
+        self.assertEqual(len(self.test_map.get_fields_of_vision([], use_numpy=False)), 0)
+
+class TestFOVCache(unittest.TestCase):
+    def setUp(self):
+        self.test_map = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'),
+                                                       fov_cache_size=2)
+        self.cache = self.test_map.fov_cache
+
+    def test_hit_and_miss(self):
+        first = self.test_map.get_field_of_vision(1, 1, 4)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertIs(self.test_map.get_field_of_vision(1, 1, 4), first)
+        self.assertEqual(self.cache.hits, 1)
+        self.test_map.get_field_of_vision(1, 1, 4, 'shadowcast')
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_same_result(self):
+        uncached = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'))
+        self.assertEqual(self.test_map.get_field_of_vision(3, 2, 5),
+                         uncached.get_field_of_vision(3, 2, 5))
+
+    def test_eviction(self):
+        for x in (1, 2, 3):
+            self.test_map.get_field_of_vision(x, 1, 4)
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.evictions, 1)
+        self.test_map.get_field_of_vision(1, 1, 4)
+        self.assertEqual(self.cache.misses, 4)
+
+    def test_door_invalidates(self):
+        before = self.test_map.get_field_of_vision(5, 4, 4)
+        self.assertNotIn((7, 4), before)
+        self.test_map.open_door(6, 4)
+        self.assertEqual(self.cache.invalidations, 1)
+        self.assertIn((7, 4), self.test_map.get_field_of_vision(5, 4, 4))
+
+    def test_far_change_keeps_entry(self):
+        self.test_map.get_field_of_vision(1, 1, 2)
+        self.test_map.open_door(6, 4)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_setitem_invalidates_on_opacity_change(self):
+        self.test_map.get_field_of_vision(1, 1, 4)
+        self.test_map[2, 2] = dungeon.Tile()
+        self.assertEqual(len(self.cache), 1)
+        self.test_map[2, 2] = dungeon.Tile('#', True, True)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+    def test_invalidate_nearby_buckets(self):
+        cache = fov.FOVCache(1000)
+        keys = [(x, y, radius, 'raycast') for x in range(0, 200, 7) for y in range(0, 100, 9)
+                for radius in (2, 5)]
+        for key in keys:
+            cache.put(key, frozenset())
+        cache.invalidate_cell(60, 40)
+        expected = [key for key in keys if (60 - key[0])**2 + (40 - key[1])**2 > (key[2] + 1)**2]
+        self.assertEqual(list(cache._entries), expected)
+        self.assertEqual(sorted(key for keys in cache._buckets.values() for key in keys),
+                         sorted(expected))
+        self.assertEqual(cache.invalidations, len(keys) - len(expected))
+
+if __name__ == '__main__':
+    unittest.main()
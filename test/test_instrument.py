@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import types
+from pythoria import dungeon
+from pythoria.player import Player
+from pythoria.instrument import Profiler
+
+
+class FakeClock:
+    """Clock advancing by one millisecond at each reading"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.001
+        return self.now
+
+class FakeView:
+    def draw(self):
+        return True
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler(window=100, clock=FakeClock())
+
+    def test_percentiles(self):
+        for duration in range(1, 101):
+            self.profiler.record('draw', duration)
+        self.assertEqual(self.profiler.percentiles('draw'), (50, 95, 99))
+        self.assertEqual(self.profiler.percentiles('unknown'), (0.0, 0.0, 0.0))
+        self.profiler.record('draw', 1000) # The oldest sample is dropped
+        self.assertEqual(len(self.profiler.samples['draw']), 100)
+        self.assertEqual(self.profiler.percentiles('draw', (1, 100)), (2, 1000))
+
+    def test_enable_disable(self):
+        level = dungeon.Dungeon.load_from_file('map/bigmap.txt')
+        level.add_player(Player(1, 1))
+        view = FakeView()
+        controller = types.SimpleNamespace(
+            dungeon=level, process_event=lambda event: level.move_player(1, 0),
+            view=types.SimpleNamespace(views={view: (0, 0)},
+                                       win=types.SimpleNamespace(blittowindow=lambda: None)))
+        self.assertTrue(self.profiler.toggle(controller))
+        controller.process_event(None)
+        view.draw()
+        controller.view.win.blittowindow()
+        self.assertEqual(list(self.profiler.samples),
+                         ['process_event', 'move_player', 'field_of_vision',
+                          'FakeView', 'blittowindow'])
+        self.assertEqual(level.player.pos, (2, 1))
+        self.assertAlmostEqual(self.profiler.percentiles('FakeView')[0], 0.001)
+        self.assertEqual(len(self.profiler.report()), 5)
+        self.assertFalse(self.profiler.toggle(controller))
+        # No wrapper left: the methods of the classes are called directly
+        self.assertNotIn('move_player', vars(level))
+        self.assertNotIn('draw', vars(view))
+        # The instance attributes are restored, not deleted
+        self.assertEqual(controller.view.win.blittowindow(), None)
+        controller.process_event(None)
+        self.assertEqual(level.player.pos, (3, 1))
+        self.assertEqual(len(self.profiler.samples['move_player']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import itertools
+from pythoria import library
+
+class TestLines(unittest.TestCase):
+    def test_iter_line(self):
+        for x1, y1, x2, y2 in itertools.product((-3, 0, 4), (-2, 5), range(-8, 9), range(-7, 8)):
+            self.assertEqual(list(library.iter_line(x1, y1, x2, y2)),
+                             library.get_line(x1, y1, x2, y2))
+
+    def test_iter_line_is_lazy(self):
+        line = library.iter_line(0, 0, 10**9, 3)
+        self.assertEqual(next(line), (0, 0))
+        self.assertEqual(next(line), (1, 0))
+
+    def test_line_offsets(self):
+        self.assertEqual([(x + 7, y - 2) for x, y in library.line_offsets(-5, 3)],
+                         library.get_line(7, -2, 2, 1))
+
+class TestCircles(unittest.TestCase):
+    def test_circle_offsets(self):
+        for radius in range(0, 12):
+            offsets = library.circle_offsets(radius)
+            self.assertEqual(len(offsets), len(set(offsets)))
+            self.assertEqual(set(offsets), set(library.get_circle(0, 0, radius)))
+
+    def test_iter_circle(self):
+        self.assertEqual(set(library.iter_circle(3, -1, 6)), set(library.get_circle(3, -1, 6)))
+
+    def test_ray_table(self):
+        for offset, path in library.ray_table(5):
+            self.assertEqual(path[0], (0, 0))
+            self.assertEqual(path[-1], offset)
+        self.assertEqual(len(library.ray_table(5)), len(library.circle_offsets(5)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import os.path
+import tempfile
+from pythoria import dungeon, mapformat, tile
+from test.test_dungeon import TEST_DIR
+
+class TestMapFormat(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.grid, self.player_pos = mapformat.read_text(os.path.join(TEST_DIR, 'map.txt'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def assertSameGrid(self, grid, other):
+        self.assertEqual((grid.width, grid.height), (other.width, other.height))
+        for name in grid.PLANES:
+            self.assertEqual(bytes(getattr(grid, name)), bytes(getattr(other, name)), name)
+
+    def test_same_as_constructor(self):
+        with open(os.path.join(TEST_DIR, 'map.txt')) as f:
+            f.readline()
+            level = dungeon.Dungeon(10, 8, f.read().split('\n'))
+        for row_parsed, row_built in zip(mapformat.to_tiles(self.grid), level):
+            self.assertEqual(row_parsed, row_built)
+        self.assertIsInstance(mapformat.to_tiles(self.grid)[4][6], tile.Door)
+
+    def test_player_position(self):
+        grid, player_pos = mapformat.parse_text(b'####\n# P#\n####', 4, 3)
+        self.assertEqual(player_pos, (2, 1))
+        self.assertEqual(grid.glyph[6], ord(' '))
+        self.assertIsNone(self.player_pos)
+        lines = ['#P #', '# P#']
+        grid, player_pos = mapformat.parse_text('\n'.join(lines).encode('latin-1'), 4, 2)
+        self.assertEqual(player_pos, dungeon.Dungeon(4, 2, lines).player_pos)
+
+    def test_unknown_character(self):
+        with self.assertRaisesRegex(ValueError, 'row 1 col 2'):
+            mapformat.parse_text(b'####\n# %#\n####', 4, 3)
+        self.assertRaises(ValueError, mapformat.read_text,
+                          os.path.join(TEST_DIR, 'map_wrong_char.txt'))
+        filename = self.path('map_unicode.txt')
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write('4 3\n####\n#  #\n# \u2603#\n')
+        with self.assertRaisesRegex(ValueError, "Character '\u2603' unrecognized at row 2 col 2"):
+            mapformat.read_text(filename)
+        self.grid.glyph[3 * self.grid.width + 4] = ord('%') # From a binary map
+        with self.assertRaisesRegex(ValueError, "Character '%' unrecognized at row 3 col 4"):
+            mapformat.to_tiles(self.grid)
+
+    def test_registered_glyph(self):
+        self.addCleanup(tile.TILE_TYPES.pop, '~')
+        tile.register_glyph('~', blocking=True)
+        grid, _ = mapformat.parse_text(b'~ ', 2, 1)
+        self.assertEqual(bytes(grid.blocking), b'\x01\x00')
+        self.assertEqual(bytes(grid.block_light), b'\x00\x00')
+
+    def test_binary_round_trip(self):
+        self.grid.visible[12] = 1
+        mapformat.write_binary(self.path('map.pmap'), self.grid, (1, 2))
+        grid, player_pos = mapformat.read_binary(self.path('map.pmap'))
+        self.assertSameGrid(grid, self.grid)
+        self.assertEqual(player_pos, (1, 2))
+        grid.glyph[0] = ord(' ') # Copy on write, the file is unchanged
+        self.assertSameGrid(mapformat.read_binary(self.path('map.pmap'))[0], self.grid)
+
+    def test_bytes_round_trip(self):
+        data = mapformat.to_binary(self.grid, (3, 4))
+        grid, player_pos = mapformat.from_binary(data)
+        self.assertSameGrid(grid, self.grid)
+        self.assertEqual(player_pos, (3, 4))
+        self.assertRaises(ValueError, mapformat.from_binary, data[:-1])
+
+    def test_convert(self):
+        mapformat.convert(os.path.join(TEST_DIR, 'map.txt'), self.path('map.pmap'))
+        mapformat.convert(self.path('map.pmap'), self.path('map.txt'))
+        grid, _ = mapformat.read_text(self.path('map.txt'))
+        self.assertSameGrid(grid, self.grid)
+
+    def test_invalid_binary(self):
+        with open(self.path('bad.pmap'), 'wb') as f:
+            f.write(b'PMAP\x01')
+        self.assertRaises(ValueError, mapformat.read_binary, self.path('bad.pmap'))
+        mapformat.write_binary(self.path('map.pmap'), self.grid)
+        with open(self.path('map.pmap'), 'r+b') as f:
+            f.truncate(40)
+        self.assertRaises(ValueError, mapformat.read_binary, self.path('map.pmap'))
+
+    def test_dungeon_save(self):
+        level = dungeon.Dungeon.load_from_file('map/bigmap.txt')
+        level.save(self.path('bigmap.pmap'))
+        for compact in (False, True):
+            loaded = dungeon.Dungeon.load_from_file(self.path('bigmap.pmap'), compact=compact)
+            self.assertEqual((loaded.width, loaded.height), (level.width, level.height))
+            self.assertEqual(loaded.player_pos, level.player_pos)
+            for row_loaded, row_level in zip(loaded, level):
+                self.assertEqual(list(row_loaded), row_level)
+        self.assertTrue(loaded.open_door(56, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+import datetime
+import os.path
+import tempfile
 from unittest.mock import Mock, patch
-from pythoria.messagebox import MessageBox
+from pythoria.messagebox import MessageBox, Message
 
 class TestMessageBox(unittest.TestCase):
     def setUp(self):
@@ -26,6 +29,86 @@ class TestMessageBox(unittest.TestCase):
             mock_now.return_value = datetime.datetime(2014, 1, 1, 8, 9, 10)
             self.msg_box.add('message3')
             self.assertEqual(self.msg_box, ['message1', 'message2', '[08:09:10] message3'])
+    
+    def test_message_added_event(self):
+        class Listener:
+            count = 0
+            def on_message(self):
+                self.count += 1
+        listener = Listener()
+        connection = self.msg_box.bind("Message Added", listener.on_message)
+        self.msg_box.add('message3')
+        self.msg_box.append('message4')
+        self.assertEqual(listener.count, 2)
+
+    def test_sequence(self):
+        self.msg_box.append('message3')
+        self.assertEqual(len(self.msg_box), 3)
+        self.assertEqual(self.msg_box[-1], 'message3')
+        self.assertEqual(self.msg_box[-2:], ['message2', 'message3'])
+        self.assertEqual(list(self.msg_box), ['message1', 'message2', 'message3'])
+
+    def test_remove_connection(self):
+        class Listener:
+            count = 0
+            def on_message(self):
+                self.count += 1
+        listener = Listener()
+        connection = self.msg_box.bind("Message Added", listener.on_message)
+        self.msg_box.remove(connection)
+        self.msg_box.add('message3')
+        self.assertEqual(listener.count, 0)
+
+class TestRingMessageBox(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp_dir.name, 'messages.log')
+        self.msg_box = MessageBox(maxlen=3, log_path=self.log_path, spill_batch=2)
+        patcher = patch.object(self.msg_box, '_now',
+                               return_value=datetime.datetime(2014, 1, 1, 8, 9, 10))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_lazy_format(self):
+        self.msg_box.add('message1')
+        msg = self.msg_box[0]
+        self.assertIsInstance(msg, Message)
+        self.assertEqual(msg.time, datetime.datetime(2014, 1, 1, 8, 9, 10))
+        self.assertEqual(msg, '[08:09:10] message1')
+        self.assertEqual(str(self.msg_box), '[08:09:10] message1')
+
+    def test_bounded(self):
+        for idx in range(10):
+            self.msg_box.add('message{0}'.format(idx))
+        self.assertEqual(self.msg_box, ['[08:09:10] message7', '[08:09:10] message8',
+                                        '[08:09:10] message9'])
+
+    def test_spill_in_batches(self):
+        for idx in range(4):
+            self.msg_box.add('message{0}'.format(idx))
+        self.assertFalse(os.path.exists(self.log_path))
+        self.msg_box.add('message4')
+        self.assertEqual(list(self.msg_box.read_log()),
+                         ['[08:09:10] message0', '[08:09:10] message1'])
+
+    def test_history(self):
+        self.msg_box.append('no date\nsecond \\line\r\\r')
+        for idx in range(5):
+            self.msg_box.add('message{0}'.format(idx))
+        history = list(self.msg_box.history())
+        self.assertEqual(history[0], 'no date\nsecond \\line\r\\r')
+        self.assertEqual(history[1:], ['[08:09:10] message{0}'.format(idx) for idx in range(5)])
+        self.msg_box.flush()
+        self.assertEqual(list(self.msg_box.history()), history)
+
+    def test_without_log(self):
+        msg_box = MessageBox(maxlen=2)
+        for idx in range(5):
+            msg_box.append(str(idx))
+        self.assertEqual(msg_box, ['3', '4'])
+        self.assertEqual(list(msg_box.history()), ['3', '4'])
+        self.assertRaises(ValueError, MessageBox, maxlen=0)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import os.path
+import tempfile
+from pythoria import dungeon, tile
+from pythoria.pathfinding import Pathfinder, UNREACHABLE
+from test import load_test_map
+
+class TestPathfinder(unittest.TestCase):
+
+    def setUp(self):
+        self.level = load_test_map()
+
+    def test_costs(self):
+        for compact in (False, True):
+            level = load_test_map(compact=compact)
+            pathfinder = Pathfinder(level)
+            self.assertEqual(pathfinder.cost(1, 1), 1)
+            self.assertEqual(pathfinder.cost(0, 0), 0)
+            self.assertEqual(pathfinder.cost(6, 4), 2)
+            self.assertEqual(Pathfinder(level, door_cost=None).cost(6, 4), 0)
+
+    def test_costs_of_chunked_map(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        filename = os.path.join(directory.name, 'bigmap.pmap')
+        objects = dungeon.Dungeon.load_from_file('map/bigmap.txt')
+        objects.reveal([(1, 1), (2, 1)])
+        objects.save(filename)
+        chunked = dungeon.Dungeon.open_chunked(filename, chunk_size=8, max_chunks=4)
+        chunked.open_door(56, 1)
+        objects.open_door(56, 1)
+        pathfinder = Pathfinder(chunked)
+        self.assertEqual(pathfinder.costs, Pathfinder(objects).costs)
+        self.assertEqual(pathfinder.known_cells(), Pathfinder(objects).known_cells())
+        self.assertEqual(chunked._map.loads, 1) # Only the chunk of the door
+
+    def test_find_path(self):
+        pathfinder = Pathfinder(self.level)
+        path = pathfinder.find_path((1, 4), (7, 4))
+        self.assertEqual(path[-1], (7, 4))
+        self.assertIn((6, 4), path)
+        self.assertEqual(len(path), 6)
+        self.assertEqual(pathfinder.find_path((1, 1), (1, 1)), [])
+        self.assertIsNone(pathfinder.find_path((1, 1), (0, 0)))
+        self.assertIsNone(Pathfinder(self.level, door_cost=None).find_path((1, 4), (7, 4)))
+
+    def test_path_is_shortest(self):
+        level = dungeon.Dungeon.load_from_file('map/bigmap.txt')
+        pathfinder = Pathfinder(level)
+        start, goal = (1, 1), (63, 21)
+        path = pathfinder.find_path(start, goal)
+        field = pathfinder.distance_field([goal])
+        self.assertEqual(sum(pathfinder.cost(x, y) for x, y in path), field.distance(*start))
+        for (x0, y0), (x1, y1) in zip([start] + path, path):
+            self.assertEqual(abs(x1 - x0) + abs(y1 - y0), 1)
+
+    def test_distance_field(self):
+        pathfinder = Pathfinder(self.level)
+        field = pathfinder.distance_field([(7, 4)])
+        self.assertEqual(field.distance(7, 4), 0)
+        self.assertEqual(field.distance(6, 4), 2)
+        self.assertEqual(field.distance(5, 4), 3)
+        self.assertIsNone(field.distance(0, 0))
+        self.assertEqual(field.next_step(5, 4), (6, 4))
+        self.assertIsNone(field.next_step(7, 4))
+        self.assertEqual(field.path(4, 4), [(5, 4), (6, 4), (7, 4)])
+        self.assertEqual(field.distances.typecode, 'i')
+
+    def test_cache(self):
+        pathfinder = Pathfinder(self.level, cache_size=2)
+        field = pathfinder.distance_field([(1, 1)])
+        self.assertIs(pathfinder.distance_field([(1, 1)]), field)
+        self.assertEqual((pathfinder.hits, pathfinder.misses), (1, 1))
+        pathfinder.distance_field([(2, 1)])
+        pathfinder.distance_field([(3, 1)])
+        self.assertIsNot(pathfinder.distance_field([(1, 1)]), field)
+        self.assertEqual((pathfinder.hits, pathfinder.misses), (1, 4))
+
+    def assertFieldsUpToDate(self, level, pathfinder, sources):
+        fresh = Pathfinder(level, door_cost=pathfinder.door_cost, cache_size=0)
+        self.assertEqual(pathfinder.costs, fresh.costs)
+        for source in sources:
+            self.assertEqual(pathfinder.distance_field([source]).distances,
+                             fresh.distance_field([source]).distances)
+
+    def test_incremental_doors(self):
+        for compact, door_cost in ((False, None), (True, None), (False, 2), (True, 2)):
+            level = dungeon.Dungeon.generate(80, 50, 25, seed=3, compact=compact)
+            pathfinder = Pathfinder(level, door_cost=door_cost)
+            doors = [(x, y) for y, row in enumerate(level) for x, cell in enumerate(row)
+                     if cell.value == '+']
+            sources = [doors[0], doors[-1], (level.width // 2, level.height // 2)]
+            for source in sources:
+                pathfinder.distance_field([source])
+            for x, y in doors[:10]:
+                level.open_door(x, y)
+            self.assertFieldsUpToDate(level, pathfinder, sources)
+            for x, y in doors[:10:2]:
+                level.close_door(x, y)
+            self.assertFieldsUpToDate(level, pathfinder, sources)
+            self.assertGreater(pathfinder.updates, 0)
+            self.assertEqual(pathfinder.misses, len(sources))
+
+    def test_deferred_doors(self):
+        level = dungeon.Dungeon.generate(80, 50, 25, seed=3, compact=True)
+        pathfinder = Pathfinder(level, door_cost=None)
+        doors = [(x, y) for y, row in enumerate(level) for x, cell in enumerate(row)
+                 if cell.value == '+']
+        pathfinder.distance_field([doors[0]])
+        level.deferred = True
+        for x, y in doors[:10]:
+            level.open_door(x, y)
+            level.close_door(x, y)
+            level.open_door(x, y)
+        self.assertEqual(pathfinder.updates, 0)
+        delivered = level.delivered
+        level.dispatch()
+        self.assertFieldsUpToDate(level, pathfinder, [doors[0]])
+        # One call for the opened doors, one for the closed doors
+        self.assertEqual(level.delivered - delivered, 2)
+
+    def test_tile_changed(self):
+        pathfinder = Pathfinder(self.level)
+        field = pathfinder.distance_field([(1, 1)])
+        self.level[3, 2] = tile.Tile('#', True, True)
+        self.level[4, 1] = tile.Tile('#', True, True)
+        self.assertFieldsUpToDate(self.level, pathfinder, [(1, 1)])
+        self.assertEqual(field.distances[1 * self.level.width + 4], UNREACHABLE)
+        self.level[4, 1] = tile.Tile()
+        self.assertFieldsUpToDate(self.level, pathfinder, [(1, 1)])
+
+    def test_dungeon_pathfinder(self):
+        self.assertIs(self.level.pathfinder, self.level.pathfinder)
+        self.assertEqual(len(self.level.pathfinder.find_path((1, 1), (7, 4))), 9)
+
+    def test_dungeon_pathfinder_not_deferred(self):
+        pathfinder = self.level.pathfinder
+        pathfinder.distance_field([(1, 1)])
+        self.level.deferred = True
+        self.level.open_door(6, 4)
+        self.assertEqual(pathfinder.cost(6, 4), 1)
+        self.level[4, 1] = tile.Tile('#', True, True)
+        self.assertEqual(pathfinder.cost(4, 1), 0)
+        self.assertEqual(pathfinder.updates, 2)
+        self.level.dispatch()
+        self.assertEqual(pathfinder.updates, 2)
+        self.assertEqual(pathfinder.costs, Pathfinder(self.level).costs)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import concurrent.futures
+from pythoria.prefetch import LevelPrefetcher
+
+
+def glyphs(level):
+    return [[cell.value for cell in row] for row in level]
+
+class TestLevelPrefetcher(unittest.TestCase):
+
+    def levels(self, count, **options):
+        with LevelPrefetcher(40, 30, 6, seed=4, **options) as prefetcher:
+            levels = [prefetcher.next_level() for number in range(count)]
+        return prefetcher, levels
+
+    def test_same_levels(self):
+        synchronous, expected = self.levels(3, ahead=0)
+        self.assertEqual((synchronous.ready, synchronous.synchronous), (0, 3))
+        for options in ({'use_threads': True}, {'use_threads': False}):
+            prefetcher, levels = self.levels(3, **options)
+            self.assertEqual(prefetcher.ready + prefetcher.synchronous, 3)
+            self.assertEqual(list(map(glyphs, levels)), list(map(glyphs, expected)))
+            self.assertEqual([level.player_pos for level in levels],
+                             [level.player_pos for level in expected])
+
+    def test_prefetched(self):
+        with LevelPrefetcher(40, 30, 6, ahead=2, use_threads=True, compact=True) as prefetcher:
+            for seed, future in list(prefetcher._queue):
+                future.result()
+            level = prefetcher.next_level()
+            self.assertEqual(prefetcher.ready, 1)
+            self.assertEqual(len(prefetcher._queue), 2)
+        self.assertTrue(level.compact)
+        self.assertEqual((level.width, level.height), (40, 30))
+        self.assertFalse(level.collide(*level.player_pos))
+        self.assertEqual(len(prefetcher._queue), 0)
+
+    def test_broken_pool(self):
+        synchronous, expected = self.levels(3, ahead=0)
+        with LevelPrefetcher(40, 30, 6, seed=4) as prefetcher:
+            for process in list(prefetcher._executor._processes.values()):
+                process.kill()
+            levels = [prefetcher.next_level() for number in range(3)]
+        self.assertEqual(list(map(glyphs, levels)), list(map(glyphs, expected)))
+        self.assertGreaterEqual(prefetcher.synchronous, 1)
+
+    def test_worker_raises(self):
+        with LevelPrefetcher(40, 30, 6, ahead=1, use_threads=True) as prefetcher:
+            failed = concurrent.futures.Future()
+            failed.set_exception(ValueError("bug in the generator"))
+            prefetcher._queue[0] = prefetcher._queue[0][0], failed
+            self.assertRaises(ValueError, prefetcher.next_level)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import contextlib
+import io
+import random
+from pythoria import dungeon, mapformat, random_dungeon
+from pythoria.random_dungeon import Room, RoomIndex, DungeonGenerator, \
+                                    nearest_neighbours, spanning_tree
+
+class LinearDungeonGenerator(DungeonGenerator):
+    """Reference implementation: every room is checked and tried each time."""
+    def room_collides_with_others(self, room):
+        return any(other is not room and other.collide(room) for other in self.rooms)
+
+    def move_rooms_apart(self):
+        cx, cy = self.max_width // 2, self.max_height // 2
+        for room in self.rooms:
+            old_x, old_y = room.x, room.y
+            room.x += -1 if room.x - cx <= 0 else 1
+            room.y += -1 if room.y - cy <= 0 else 1
+            self.constrain_room_in_dungeon(room)
+            if self.room_collides_with_others(room):
+                room.x, room.y = old_x, old_y
+
+class TestRoomIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = RoomIndex(cell_size=4)
+        self.rooms = [Room(1, 1, 3, 3), Room(10, 1, 3, 3), Room(1, 10, 5, 5)]
+        for room in self.rooms:
+            self.index.add(room)
+
+    def test_colliding(self):
+        self.assertEqual(self.index.colliding(Room(4, 4, 3, 3)), [self.rooms[0]])
+        self.assertEqual(self.index.colliding(Room(5, 5, 3, 3)), [])
+        self.assertEqual(self.index.colliding(self.rooms[1]), [])
+
+    def test_update_and_remove(self):
+        room = self.rooms[0]
+        room.x, room.y = 20, 20
+        self.index.update(room)
+        self.assertEqual(self.index.colliding(Room(2, 2, 3, 3)), [])
+        self.assertEqual(self.index.colliding(Room(22, 22, 3, 3)), [room])
+        self.index.remove(room)
+        self.assertNotIn(room, self.index)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.colliding(Room(22, 22, 3, 3)), [])
+
+class TestDungeonGenerator(unittest.TestCase):
+    def place_rooms(self, generator_class, seed, size, rooms_amount):
+        dg = generator_class(seed=seed)
+        dg.reset(size, size)
+        dg.create_rooms(rooms_amount)
+        return dg
+
+    def test_same_rooms_as_linear_scan(self):
+        for seed in range(5):
+            rooms = [[(room.x, room.y, room.width, room.height) for room in
+                      self.place_rooms(generator_class, seed, 60, 30).rooms]
+                     for generator_class in (LinearDungeonGenerator, DungeonGenerator)]
+            self.assertEqual(rooms[0], rooms[1])
+
+    def test_rooms_do_not_collide(self):
+        dg = self.place_rooms(DungeonGenerator, 3, 100, 80)
+        for room in dg.rooms:
+            self.assertFalse(any(other is not room and other.collide(room) for other in dg.rooms))
+            self.assertIn(room, dg.room_index)
+
+    def test_seed(self):
+        maps = []
+        for seed in (5, 5, 6):
+            dg = DungeonGenerator(seed=seed)
+            dg.generate_dungeon(60, 40, 12)
+            maps.append(([[cell.value for cell in row] for row in dg.dungeon], dg.place_player()))
+        self.assertEqual(maps[0], maps[1])
+        self.assertNotEqual(maps[0], maps[2])
+
+    def test_cells_same_as_tiles(self):
+        for seed in range(10):
+            tiles = DungeonGenerator(seed=seed)
+            tiles.generate_dungeon(70, 50, 20)
+            cells = DungeonGenerator(seed=seed)
+            cells.generate_cells(70, 50, 20)
+            self.assertEqual(list(map(list, cells.to_tiles())), tiles.dungeon)
+            self.assertEqual(set(map(repr, cells.corridors)), set(map(repr, tiles.corridors)))
+
+    def test_floor_connected(self):
+        for seed in range(10):
+            dg = DungeonGenerator(seed=seed)
+            dg.generate_cells(80, 50, 25)
+            cells, width = dg.cells, dg.max_width
+            floor = {index for index, cell in enumerate(cells) if cell != random_dungeon.WALL}
+            reached, todo = set(), [min(floor)]
+            while todo:
+                index = todo.pop()
+                if index in floor and index not in reached:
+                    reached.add(index)
+                    todo.extend((index - 1, index + 1, index - width, index + width))
+            self.assertEqual(reached, floor)
+
+    def test_show_map(self):
+        tiles = DungeonGenerator(seed=2)
+        tiles.generate_dungeon(30, 20, 5)
+        cells = DungeonGenerator(seed=2)
+        cells.generate_cells(30, 20, 5)
+        outputs = []
+        for generator in (tiles, cells):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                generator.show_map()
+            outputs.append(output.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(len(outputs[0].splitlines()), 21)
+
+    @unittest.skipIf(random_dungeon.numpy is None, "NumPy not installed")
+    def test_lonely_doors_without_numpy(self):
+        with_numpy = DungeonGenerator(seed=8)
+        with_numpy.generate_cells(70, 50, 20)
+        self.addCleanup(setattr, random_dungeon, 'numpy', random_dungeon.numpy)
+        random_dungeon.numpy = None
+        without_numpy = DungeonGenerator(seed=8)
+        without_numpy.generate_cells(70, 50, 20)
+        self.assertEqual(with_numpy.cells, without_numpy.cells)
+
+    def test_carve_corridor(self):
+        dg = DungeonGenerator()
+        dg.reset(10, 6, tiles=False)
+        for y in (1, 2):
+            dg.cells[y * 10 + 1:y * 10 + 3] = b'  ' # Room at (1, 1)
+        dg.cells[4 * 10 + 6:4 * 10 + 9] = b'   ' # Room at (6, 4)
+        self.assertEqual(dg.carve_corridor(1, 1, 7, 4), [13, 37])
+        self.assertEqual(bytes(dg.cells).decode(), '##########'
+                                                   '#       ##'
+                                                   '#  #### ##'
+                                                   '####### ##'
+                                                   '######   #'
+                                                   '##########')
+
+    def test_generate_levels(self):
+        sequential = random_dungeon.generate_levels(range(4), 40, 30, 6, workers=1)
+        parallel = random_dungeon.generate_levels(range(4), 40, 30, 6, workers=2)
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(random_dungeon.generate_level(2, 40, 30, 6), sequential[2])
+        level = dungeon.Dungeon.from_grid(*mapformat.from_binary(sequential[0]), compact=True)
+        self.assertEqual((level.width, level.height), (40, 30))
+        self.assertFalse(level.collide(*level.player_pos))
+
+    def test_generate_dungeon(self):
+        dg = DungeonGenerator()
+        dg.generate_dungeon(35, 40, 10)
+        self.assertEqual(len(dg.rooms), 10)
+        self.assertEqual(len(dg.corridors), 9)
+
+class TestCorridorGraph(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(4)
+        self.points = [(rand.randint(0, 200), rand.randint(0, 50)) for _ in range(300)]
+        self.points += [(1000, 1000), (1001, 1003)] # A far away group
+
+    def test_nearest_neighbours(self):
+        edges = nearest_neighbours(self.points, 3)
+        for idx, (x, y) in enumerate(self.points):
+            dists = sorted((x - other_x)**2 + (y - other_y)**2
+                           for other, (other_x, other_y) in enumerate(self.points) if other != idx)
+            mine = sorted(dist for dist, i, j in edges if idx in (i, j))
+            self.assertEqual(mine[:3], dists[:3])
+        self.assertEqual(nearest_neighbours([(1, 1)], 3), [])
+
+    def test_spanning_tree(self):
+        edges = [(1, 0, 1), (2, 1, 2), (3, 0, 2), (5, 3, 4)]
+        self.assertEqual(spanning_tree(5, edges), ([(1, 0, 1), (2, 1, 2), (5, 3, 4)], [(3, 0, 2)]))
+
+    def test_all_rooms_connected(self):
+        dg = DungeonGenerator(neighbours=1)
+        dg.rooms = [Room(x, y, 3, 3) for x, y in self.points]
+        pairs = dg.connect_rooms()
+        self.assertEqual(len(pairs), len(dg.rooms) - 1)
+        reached, todo = set(), [dg.rooms[0]]
+        while todo:
+            room = todo.pop()
+            reached.add(room)
+            todo.extend(other for pair in pairs if room in pair
+                        for other in pair if other not in reached)
+        self.assertEqual(len(reached), len(dg.rooms))
+
+    def test_loops(self):
+        dg = DungeonGenerator(loop_ratio=0.1)
+        dg.rooms = [Room(x, y, 3, 3) for x, y in self.points]
+        self.assertEqual(len(dg.connect_rooms()), len(dg.rooms) - 1 + len(dg.rooms) // 10)
+
+if __name__ == '__main__':
+    unittest.main()
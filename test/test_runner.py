@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import asyncio
+import selectors
+import time
+import types
+from pygame.locals import QUIT, KEYDOWN
+from pythoria.runner import AsyncRunner
+
+
+class VirtualClock:
+    """Time of a VirtualTimeLoop, which can be made to jump forward"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class VirtualSelector(selectors.DefaultSelector):
+    """Selector moving the virtual clock forward instead of waiting"""
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        if timeout is not None and timeout > 0:
+            self.clock.now += timeout
+            timeout = 0
+        return super().select(timeout)
+
+def virtual_time_loop(clock):
+    "An asyncio event loop where sleeping takes no time, but moves the clock"
+    loop = asyncio.SelectorEventLoop(VirtualSelector(clock))
+    loop.time = clock
+    return loop
+
+class FakeView:
+    def __init__(self, clock, draw_time=0.0):
+        self.clock = clock
+        self.draw_time = draw_time
+        self.draws = 0
+        self.dirty = True
+
+    def draw(self):
+        if not self.dirty:
+            return False
+        self.draws += 1
+        self.clock.now += self.draw_time
+        return True
+
+class FakeController:
+    def __init__(self, view):
+        self.view = view
+        self.busy = False
+        self.updates = 0
+        self.events = []
+        self.messages = []
+        self.flushes = 0
+        self.msgbox = types.SimpleNamespace(add=self.messages.append, flush=self.flush)
+
+    def flush(self):
+        self.flushes += 1
+
+    def update(self):
+        self.updates += 1
+
+    @property
+    def idle(self):
+        return not self.busy and not self.view.dirty
+
+    def process_event(self, event):
+        self.events.append(event)
+
+
+class TestAsyncRunner(unittest.TestCase):
+    def setUp(self):
+        self.clock = VirtualClock()
+        self.view = FakeView(self.clock)
+        self.controller = FakeController(self.view)
+        self.pending = []
+        self.runner = AsyncRunner(self.controller, tick_rate=64, fps=32, poll=self.poll,
+                                  wait=self.wait, present=lambda: None)
+        self.waits = []
+
+    def poll(self):
+        events, self.pending[:] = list(self.pending), []
+        return events
+
+    def wait(self, timeout):
+        self.waits.append((self.clock(), timeout))
+        self.clock.now += timeout
+        return [types.SimpleNamespace(type=QUIT)]
+
+    def run_for(self, duration):
+        "Run the game loop for duration seconds of real time"
+        self.runner.call_every(duration, self.runner.stop)
+        self.runner.run()
+
+    def run_virtual(self, until=None, **timers):
+        """
+        Run the game loop in virtual time until the clock reaches until, or
+        until it stops. timers maps the functions of the test case to call
+        to the time when to call them.
+        """
+        loop = virtual_time_loop(self.clock)
+        self.addCleanup(loop.close)
+        if until is not None:
+            loop.call_at(until, self.runner.stop)
+        for name, when in timers.items():
+            loop.call_at(when, getattr(self, name))
+        loop.run_until_complete(self.runner.main())
+
+    def test_input(self):
+        self.pending.extend([types.SimpleNamespace(type=KEYDOWN),
+                             types.SimpleNamespace(type=QUIT),
+                             types.SimpleNamespace(type=KEYDOWN)])
+        self.runner.run()
+        self.assertEqual(len(self.controller.events), 1)
+        self.assertFalse(self.runner.running)
+        self.assertEqual(self.controller.flushes, 1)
+
+    def test_controller_raises(self):
+        def update():
+            raise RuntimeError("plantage")
+        self.controller.update = update
+        self.runner.call_every(5.0, self.runner.stop) # Fails the test instead of hanging
+        start = time.monotonic()
+        self.assertRaisesRegex(RuntimeError, "plantage", self.runner.run)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertFalse(self.runner.running)
+
+    def test_present_wrapped(self):
+        presented = []
+        win = types.SimpleNamespace(blittowindow=lambda: None)
+        runner = AsyncRunner(self.controller, win, poll=self.poll)
+        win.blittowindow = lambda: presented.append(True) # Set by the profiler
+        runner.present()
+        self.assertEqual(presented, [True])
+
+    def test_fixed_timestep(self):
+        self.run_virtual(0.51)
+        # 64 ticks and 32 frames per second, from 0 to 0.5 s
+        self.assertEqual(self.runner.ticks, 33)
+        self.assertEqual(self.controller.updates, self.runner.ticks)
+        self.assertEqual(self.runner.frames, 17)
+        self.assertEqual(self.runner.dropped_frames, 0)
+
+    def suspend(self):
+        self.clock.now += 10.0 # As if the process was suspended 10 s
+
+    def test_catch_up(self):
+        self.run_virtual(10.38, suspend=0.26)
+        # 17 ticks before the suspension, max_catch_up ticks late, then 8 ticks
+        self.assertEqual(self.runner.ticks, 17 + self.runner.max_catch_up + 8)
+
+    def test_drop_frames(self):
+        self.view.draw_time = 0.078125 # 2.5 frames long
+        self.run_virtual(0.51)
+        # A frame is drawn every 3 frames, the 2 others are dropped
+        self.assertEqual(self.runner.frames, 6)
+        self.assertEqual(self.runner.dropped_frames, 12)
+        self.assertEqual(self.runner.frames, self.view.draws)
+
+    def test_idle(self):
+        self.view.dirty = False
+        self.run_virtual()
+        self.assertEqual(self.waits, [(0.0, self.runner.idle_timeout)])
+        self.assertEqual(self.runner.frames, 0)
+        self.assertEqual(self.runner.dropped_frames, 0)
+
+    def test_not_idle(self):
+        self.controller.busy = True
+        self.view.dirty = False
+        self.run_virtual(0.51)
+        self.assertEqual(self.waits, [])
+
+    def test_background(self):
+        results = []
+        async def prefetch():
+            results.append(await self.runner.offload(sum, [1, 2, 3]))
+        async def failing():
+            raise ValueError("disque plein")
+        self.runner.schedule(prefetch())
+        self.runner.schedule(failing())
+        self.run_for(0.1)
+        self.assertEqual(results, [6])
+        self.assertEqual(len(self.controller.messages), 1)
+        self.assertIn("disque plein", self.controller.messages[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import os.path
+import tempfile
+from pythoria import dungeon, snapshot
+from pythoria.player import Player
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.level = dungeon.Dungeon.load_from_file('map/bigmap.txt')
+        self.level.add_player(Player())
+        self.level.move_player(1, 0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def assertSameGame(self, restored, level):
+        self.assertEqual((restored.width, restored.height), (level.width, level.height))
+        self.assertEqual(restored.revision, level.revision)
+        for row_restored, row_level in zip(restored, level):
+            self.assertEqual(list(row_restored), list(row_level))
+        self.assertEqual(restored.player.pos, level.player.pos)
+        self.assertEqual(restored.player.fov, set(level.player.fov))
+
+    def test_full(self):
+        for compress in (False, True):
+            snapshot.save(self.level, self.path('full.psav'), compress)
+            for compact in (False, True):
+                restored = snapshot.load(self.path('full.psav'), compact=compact)
+                self.assertSameGame(restored, self.level)
+
+    def test_door_state(self):
+        self.level.open_door(56, 1)
+        snapshot.save(self.level, self.path('full.psav'))
+        restored = snapshot.load(self.path('full.psav'), compact=True)
+        self.assertFalse(restored.collide(56, 1))
+        self.assertTrue(restored.close_door(56, 1))
+
+    def test_delta(self):
+        level = dungeon.Dungeon.load_from_file('map/bigmap.txt', compact=True)
+        level.add_player(Player())
+        snapshots = snapshot.Snapshotter(level)
+        self.assertRaises(ValueError, snapshots.save, self.path('delta.psav'), True)
+        snapshots.save(self.path('full.psav'))
+        for step in range(3):
+            level.move_player(0, 1)
+        level.open_door(56, 1)
+        for compress in (False, True):
+            self.assertEqual(snapshots.save(self.path('delta.psav'), True, compress),
+                             snapshot.DELTA)
+            self.assertLess(os.path.getsize(self.path('delta.psav')),
+                            os.path.getsize(self.path('full.psav')))
+            restored = snapshot.load(self.path('delta.psav'), self.path('full.psav'))
+            self.assertSameGame(restored, level)
+        self.assertRaises(ValueError, snapshot.load, self.path('delta.psav'))
+
+    def test_wrong_base(self):
+        snapshots = snapshot.Snapshotter(self.level)
+        snapshots.save(self.path('full.psav'))
+        snapshots.save(self.path('delta.psav'), delta=True)
+        self.level.reveal_all()
+        snapshot.save(self.level, self.path('other.psav'))
+        self.assertRaises(ValueError, snapshot.load, self.path('delta.psav'),
+                          self.path('other.psav'))
+
+    def test_without_player(self):
+        level = dungeon.Dungeon.load_from_file('map/bigmap.txt')
+        snapshot.save(level, self.path('full.psav'))
+        self.assertIsNone(snapshot.load(self.path('full.psav')).player)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import operator
+import os.path
+import tempfile
+from pythoria import dungeon, storage, tile, mapformat
+from pythoria.player import Player
+from test import test_dungeon
+from test.test_dungeon import TEST_DIR
+
+class TestCompactDungeon(test_dungeon.TestDungeon):
+    """Run the Dungeon test suite on the compact storage."""
+    def setUp(self):
+        self.test_map = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'),
+                                                       compact=True)
+
+    def test_setitem(self):
+        new_tile = tile.Tile('#', True, False, True)
+        self.test_map[2, 3] = new_tile
+        self.assertIsInstance(self.test_map[2, 3], storage.TileProxy)
+        self.assertEqual(self.test_map[2, 3], new_tile)
+        self.assertRaises(TypeError, operator.setitem, self.test_map, (2, 3), object())
+        self.assertRaises(IndexError, operator.setitem, self.test_map, (10, 0), new_tile)
+
+class TestCompactGrid(unittest.TestCase):
+    def setUp(self):
+        self.objects = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'))
+        self.compact = dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'),
+                                                      compact=True)
+
+    def test_same_content(self):
+        for row_objects, row_compact in zip(self.objects, self.compact):
+            self.assertEqual(list(row_compact), row_objects)
+
+    def test_memory(self):
+        grid = self.compact._map
+        self.assertEqual(grid.nbytes, 4 * grid.width * grid.height)
+
+    def test_proxies_share_cell(self):
+        self.compact[3, 3].visible = True
+        self.assertTrue(self.compact[3, 3].visible)
+        self.assertFalse(self.compact[4, 3].visible)
+
+    def test_monster_and_loot(self):
+        cell = self.compact[2, 2]
+        self.assertIsNone(cell.monster)
+        cell.monster = 'rat'
+        cell.add_loot('gold')
+        self.assertEqual(self.compact[2, 2].monster, 'rat')
+        self.assertEqual(self.compact[2, 2].loot, ['gold'])
+        cell.monster = None
+        self.assertNotIn(2 * self.compact.width + 2, self.compact._map.monsters)
+        cell.remove_loot('gold')
+        self.assertRaises(ValueError, cell.remove_loot, 'gold')
+
+    def test_reading_loot(self):
+        for row in self.compact:
+            for tile in row:
+                self.assertFalse(tile.loot)
+        self.assertEqual(self.compact._map.loot, {})
+
+    def test_door(self):
+        self.assertTrue(self.compact.open_door(6, 4))
+        self.assertEqual(self.compact[6, 4].value, "'")
+        self.assertFalse(self.compact.collide(6, 4))
+        self.assertTrue(self.compact.close_door(6, 4))
+        self.assertTrue(self.compact[6, 4].block_light)
+
+    def test_reveal_all(self):
+        self.compact.reveal_all()
+        self.assertTrue(all(cell.visible for row in self.compact for cell in row))
+
+    def test_unsupported_glyph(self):
+        self.assertRaises(ValueError, operator.setitem, self.compact, (1, 1),
+                          tile.Tile('\N{WHITE SMILING FACE}'))
+
+    @unittest.skipIf(storage.numpy is None, "NumPy not installed")
+    def test_as_array(self):
+        array = self.compact._map.as_array('block_light')
+        self.assertEqual(array.shape, (self.compact.height, self.compact.width))
+        self.assertEqual(array[0, 0], 1)
+        array[1, 1] = 1
+        self.assertTrue(self.compact[1, 1].block_light)
+
+class TestChunkedDungeon(TestCompactDungeon):
+    """Run the Dungeon test suite on chunks of 4x4 cells, 2 chunks in memory."""
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        filename = os.path.join(directory.name, 'map.pmap')
+        mapformat.convert(os.path.join(TEST_DIR, 'map.txt'), filename)
+        self.test_map = dungeon.Dungeon.open_chunked(filename, writable=True, chunk_size=4,
+                                                     max_chunks=2)
+
+class TestChunkedGrid(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'bigmap.pmap')
+        self.objects = dungeon.Dungeon.load_from_file('map/bigmap.txt')
+        self.objects.save(self.filename)
+        self.chunked = dungeon.Dungeon.open_chunked(self.filename, writable=True, chunk_size=8,
+                                                    max_chunks=4)
+
+    def test_same_content(self):
+        for row_objects, row_chunked in zip(self.objects, self.chunked):
+            self.assertEqual(list(row_chunked), row_objects)
+        self.assertEqual(len(self.chunked._map.loaded_chunks), 4)
+
+    def test_lazy_loading(self):
+        grid = self.chunked._map
+        self.assertEqual(grid.loads, 0)
+        self.chunked.add_player(Player())
+        self.assertEqual(grid.loaded_chunks, [(0, 0)])
+        self.assertEqual(grid.nbytes, 4 * 8 * 8)
+
+    def test_same_field_of_vision(self):
+        for x, y in ((1, 1), (20, 3), (60, 20), (33, 12)):
+            self.assertEqual(self.chunked.get_field_of_vision(x, y, 6),
+                             self.objects.get_field_of_vision(x, y, 6))
+
+    def test_write_back(self):
+        self.chunked.open_door(56, 1)
+        self.chunked[2, 2].visible = True
+        for row in self.chunked: # Evicts every chunk
+            [tile.value for tile in row]
+        self.assertGreater(self.chunked._map.evictions, 0)
+        self.assertFalse(self.chunked.collide(56, 1))
+        self.chunked._map.flush()
+        reopened = dungeon.Dungeon.open_chunked(self.filename, writable=False)
+        self.assertEqual(reopened[56, 1].value, "'")
+        self.assertTrue(reopened[2, 2].visible)
+        self.assertFalse(reopened[3, 2].visible)
+
+    def test_read_only(self):
+        level = dungeon.Dungeon.open_chunked(self.filename, writable=False, chunk_size=8,
+                                             max_chunks=1)
+        level.reveal_all()
+        self.assertTrue(level[40, 20].visible)
+        level._map.flush()
+        self.assertFalse(dungeon.Dungeon.open_chunked(self.filename)[40, 20].visible)
+
+    def test_proxy_of_evicted_chunk(self):
+        cell = self.chunked[1, 1]
+        for row in self.chunked:
+            [tile.value for tile in row]
+        cell.visible = True
+        self.assertTrue(self.chunked[1, 1].visible)
+
+    def test_written_back_once(self):
+        grid = self.chunked._map
+        cell = self.chunked[1, 1]
+        cell.visible = True
+        for row in self.chunked:
+            [tile.value for tile in row]
+        self.assertEqual(grid.writes, 1)
+        del cell
+        grid.flush()
+        self.assertEqual(grid.writes, 1)
+        reopened = dungeon.Dungeon.open_chunked(self.filename)
+        self.assertTrue(reopened[1, 1].visible)
+
+    def test_monster_and_loot(self):
+        self.chunked[1, 1].loot = ['sword']
+        self.chunked[1, 1].monster = 'orc'
+        self.chunked[2, 1].add_loot('gold')
+        bat = tile.Tile()
+        bat.monster = 'bat'
+        self.chunked[3, 1] = bat
+        for row in self.chunked:
+            [tile.value for tile in row]
+        self.assertEqual(self.chunked[1, 1].loot, ['sword'])
+        self.assertEqual(self.chunked[1, 1].monster, 'orc')
+        self.assertEqual(self.chunked[2, 1].loot, ['gold'])
+        self.assertEqual(self.chunked[3, 1].monster, 'bat')
+        self.assertEqual(self.chunked._map.loot, {self.chunked.width + 1: ['sword'],
+                                                 self.chunked.width + 2: ['gold']})
+
+    def test_plane(self):
+        grid = self.chunked._map
+        self.chunked.open_door(56, 1)
+        self.chunked[2, 2].visible = True
+        blocking = grid.plane('blocking')
+        self.assertEqual(blocking[grid.width + 56], 0)
+        self.assertEqual(grid.plane('visible')[2 * grid.width + 2], 1)
+        self.assertEqual(bytes(blocking), bytes(1 if tile.blocking else 0
+                                                for row in self.chunked for tile in row))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import os.path
+from pythoria import dungeon, textview
+from pythoria.player import Player
+from test.test_dungeon import TEST_DIR
+
+MAP = ['##########',
+       '#       # ',
+       '#       # ',
+       '#     ####',
+       '#     +  #',
+       '##########']
+
+class TestTextView(unittest.TestCase):
+    def load(self, compact=False):
+        return dungeon.Dungeon.load_from_file(os.path.join(TEST_DIR, 'map.txt'),
+                                              compact=compact)
+
+    def test_show_hidden(self):
+        view = textview.TextView(self.load(), 10, 6, show_hidden=True)
+        view.draw()
+        self.assertEqual(view.rows(), MAP)
+        self.assertEqual(view.to_bytes(), ''.join(row + '\n' for row in MAP).encode())
+
+    def test_hidden_tiles_are_blank(self):
+        view = textview.TextView(self.load(), 10, 6)
+        view.draw()
+        self.assertEqual(str(view), (' ' * 10 + '\n') * 6)
+        self.assertFalse(any(view.attributes))
+
+    def test_player_and_attributes(self):
+        level = self.load()
+        level.add_player(Player(2, 2))
+        view = textview.TextView(level, 10, 6)
+        view.draw()
+        self.assertEqual(view.rows()[2][2], '@')
+        flags = view.attributes[2 * 10 + 2]
+        self.assertEqual(flags, textview.VISIBLE | textview.LIT | textview.PLAYER)
+        self.assertEqual(view.attributes[0], textview.VISIBLE)
+
+    def test_compact_same_output(self):
+        views = []
+        for compact in (False, True):
+            level = self.load(compact)
+            level.add_player(Player(3, 2))
+            view = textview.TextView(level, 8, 4)
+            view.draw(1, 1)
+            views.append(view)
+        self.assertEqual(views[0].to_bytes(), views[1].to_bytes())
+        self.assertEqual(views[0].attributes, views[1].attributes)
+
+    def test_scrolling(self):
+        level = self.load()
+        level.add_player(Player(7, 4))
+        level.reveal_all()
+        view = textview.ScrollingTextView(level, 5, 3)
+        view.draw()
+        self.assertEqual((view.left, view.top), (5, 3))
+        self.assertEqual(view.rows(), [' ####', ' +@ #', '#####'])
+
+if __name__ == '__main__':
+    unittest.main()
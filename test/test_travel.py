@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from pythoria import dungeon
+from pythoria.player import Player
+from pythoria.travel import Travel, Explore
+from pythoria.pathfinding import UNREACHABLE
+from test import load_test_map
+
+class TestTravel(unittest.TestCase):
+
+    def setUp(self):
+        self.level = load_test_map()
+        self.level.add_player(Player(1, 1))
+
+    def test_travel(self):
+        self.level.reveal_all()
+        travel = Travel(self.level, (8, 4))
+        route = list(travel.route)
+        self.assertEqual(len(route), 10)
+        self.assertTrue(travel.step(4))
+        self.assertEqual(self.level.player.pos, route[3])
+        self.assertEqual(travel.route, route[4:])
+        self.assertFalse(travel.step(10))
+        self.assertEqual(self.level.player.pos, (8, 4))
+        self.assertIsNone(travel.message)
+
+    def test_travel_through_unknown_cells(self):
+        travel = Travel(self.level, (8, 4))
+        self.assertIsNone(travel.route)
+        self.assertFalse(travel.step(10))
+        self.assertIsNotNone(travel.message)
+        self.assertEqual(self.level.player.pos, (1, 1))
+
+    def test_travel_stops_on_sighting(self):
+        travel = Travel(self.level, (5, 4))
+        self.assertFalse(travel.step(20))
+        self.assertEqual(travel.message, "Vous découvrez de nouveaux lieux.")
+        self.assertNotEqual(self.level.player.pos, (5, 4))
+
+    def test_explore(self):
+        for compact in (False, True):
+            level = dungeon.Dungeon.generate(60, 40, 12, seed=2, compact=compact)
+            level.add_player(Player())
+            explore = Explore(level)
+            frames = 1
+            while explore.step(10):
+                frames += 1
+            self.assertEqual(explore.message, "Exploration terminée.")
+            self.assertGreater(frames, 1)
+            pathfinder = level.pathfinder
+            field = pathfinder.distance_field([level.player.pos])
+            known = pathfinder.known_cells()
+            for index, distance in enumerate(field.distances):
+                if distance != UNREACHABLE:
+                    self.assertTrue(known[index])
+
+if __name__ == '__main__':
+    unittest.main()